@@ -0,0 +1,72 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.hv_bridge import HVBridge
+from core.logging_util import setup_logger
+from benchmarks.stub_agent import FileStubAgent
+
+
+def _run(bridge_watcher: str, agent_watcher: str, fn):
+    with tempfile.TemporaryDirectory() as tmp:
+        inbox = os.path.join(tmp, 'inbox')
+        outbox = os.path.join(tmp, 'outbox')
+        bridge = HVBridge(inbox, outbox, timeout=30, watcher=bridge_watcher)
+        agent = FileStubAgent(inbox, outbox, watcher=agent_watcher)
+        agent.start()
+        try:
+            return fn(bridge)
+        finally:
+            agent.stop()
+            bridge.close()
+
+
+def bench_latency(watcher: str, rounds: int) -> list:
+    def fn(bridge):
+        samples = []
+        for _ in range(rounds):
+            t0 = time.perf_counter()
+            result = bridge.send_job('ping')
+            samples.append((time.perf_counter() - t0) * 1000)
+            assert result.get('success'), result
+        return samples
+    return _run(watcher, 'auto', fn)
+
+
+def bench_pipeline(jobs: int, pipelined: bool) -> float:
+    def fn(bridge):
+        t0 = time.perf_counter()
+        if pipelined:
+            futures = [bridge.send_job_async('ping') for _ in range(jobs)]
+            results = [f.result() for f in futures]
+        else:
+            results = [bridge.send_job('ping') for _ in range(jobs)]
+        assert all(r.get('success') for r in results)
+        return time.perf_counter() - t0
+    # agent 端按 500 ms 轮询，与生成的 Tcl agent 一致
+    return _run('auto', 'poll', fn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HVBridge 往返延迟基准 (使用 Python 替身 agent)")
+    parser.add_argument('--rounds', type=int, default=50)
+    parser.add_argument('--jobs', type=int, default=10)
+    args = parser.parse_args()
+    setup_logger(tempfile.mkdtemp(), name="bench")
+    print("round-trip latency, agent reacts immediately:")
+    for watcher in ('poll', 'auto'):
+        samples = bench_latency(watcher, args.rounds)
+        print(f"  {watcher:>6}: median {statistics.median(samples):7.2f} ms  "
+              f"p95 {sorted(samples)[int(len(samples) * 0.95) - 1]:7.2f} ms  "
+              f"max {max(samples):7.2f} ms")
+    print(f"{args.jobs} jobs, agent polls inbox every 500 ms:")
+    for pipelined in (False, True):
+        elapsed = bench_pipeline(args.jobs, pipelined)
+        print(f"  {'send_job_async' if pipelined else 'send_job':>14}: {elapsed:6.2f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+import multiprocessing
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.db_store import DBStore
+
+
+def populate(db: DBStore, parts: int):
+    for i in range(parts):
+        db.add_part(f"P{i:04d}", 100.0 + i, 1.5)
+        db.add_mapping('part', f"V{i:04d}", f"P{i:04d}")
+
+
+def write_runs(db: DBStore, prefix: str, count: int, errors: list):
+    for i in range(count):
+        part_no = f"P{i % 100:04d}"
+        result = {'part_no': part_no, 'passed': i % 7 != 0, 'ratio': (i % 100) / 80.0, 'tags': {'part': 'x'}}
+        try:
+            db.save_run(f"{prefix}/{i:06d}", 'model.h3d', 'result.h3d', {'peak': {'value': i}},
+                        [('part', f"V{i % 100:04d}")], [part_no], result['passed'], [result],
+                        {'model': 'fp'}, {'hv_seconds': 0.1})
+        except Exception as e:
+            errors.append(f"{prefix}/{i}: {e}")
+
+
+def read_loop(db_path: str, stop, queue):
+    # 读进程：不断查询标准和历史，WAL 模式下不应被写操作阻塞
+    db = DBStore(db_path)
+    tags = [{'part': f"V{i:04d}"} for i in range(100)]
+    reads, errors = 0, []
+    while not stop.is_set():
+        try:
+            db._invalidate_index()
+            db.find_parts_by_tags(tags)
+            db.query_results(passed=False, limit=20)
+            reads += 1
+        except Exception as e:
+            errors.append(f"read: {e}")
+    db.close()
+    queue.put((reads, errors))
+
+
+def process_writer(db_path: str, index: int, count: int, queue):
+    db = DBStore(db_path)
+    errors = []
+    write_runs(db, f"proc{index}", count, errors)
+    db.close()
+    queue.put(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并发写入压力测试：多线程 + 多进程同时写运行记录，多个读进程同时查询，检查无丢失写入")
+    parser.add_argument('--threads', type=int, default=8, help='写线程数')
+    parser.add_argument('--processes', type=int, default=2, help='写进程数')
+    parser.add_argument('--readers', type=int, default=2, help='读进程数')
+    parser.add_argument('--writes', type=int, default=500, help='每个线程/进程写入的运行数')
+    args = parser.parse_args()
+    # 本进程已有写线程，fork 可能复制到被持有的锁；子进程用 spawn 启动
+    mp = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'standards.db')
+        db = DBStore(db_path)
+        populate(db, 100)
+        errors: list = []
+        stop = mp.Event()
+        read_queue = mp.Queue()
+        readers = [mp.Process(target=read_loop, args=(db_path, stop, read_queue))
+                   for _ in range(args.readers)]
+        writers = [threading.Thread(target=write_runs, args=(db, f"thread{i}", args.writes, errors))
+                   for i in range(args.threads)]
+        queue = mp.Queue()
+        procs = [mp.Process(target=process_writer, args=(db_path, i, args.writes, queue))
+                 for i in range(args.processes)]
+        for p in readers:
+            p.start()
+        t0 = time.perf_counter()
+        for t in writers:
+            t.start()
+        for p in procs:
+            p.start()
+        for t in writers:
+            t.join()
+        for _ in procs:
+            errors.extend(queue.get())
+        for p in procs:
+            p.join()
+        elapsed = time.perf_counter() - t0
+        stop.set()
+        reads = 0
+        for _ in readers:
+            count, read_errors = read_queue.get()
+            reads += count
+            errors.extend(read_errors)
+        for p in readers:
+            p.join()
+        expected = (args.threads + args.processes) * args.writes
+        conn = db._get_conn()
+        runs = conn.execute('SELECT COUNT(*) FROM runs').fetchone()[0]
+        results = conn.execute('SELECT COUNT(*) FROM run_results').fetchone()[0]
+        db.close()
+    print(f"{args.threads} writer threads + {args.processes} writer processes x {args.writes} runs, "
+          f"{args.readers} reader processes")
+    print(f"  runs written:   {runs} / {expected} expected, {results} result rows")
+    print(f"  write rate:     {expected / elapsed:,.0f} runs/s ({elapsed:.2f} s)")
+    print(f"  reader batches: {reads:,} during the writes (index reload + lookups + history page)")
+    print(f"  errors:         {len(errors)}" + (f" (first: {errors[0]})" if errors else ""))
+    if runs != expected or results != expected or errors:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
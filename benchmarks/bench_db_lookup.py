@@ -0,0 +1,82 @@
+import os
+import sys
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.db_store import DBStore, MAP_TYPES
+
+
+def legacy_lookup(db_path: str, tags: dict):
+    """改动前的实现：每次查询新建连接，按优先级最多执行三次 JOIN 查询"""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    with conn:
+        for map_type in MAP_TYPES:
+            if tags.get(map_type):
+                row = conn.execute('''
+                    SELECT p.* FROM parts p JOIN mapping m ON p.part_no =m.part_no
+                    WHERE m.map_type=? AND m.map_value=?
+                ''', (map_type, tags[map_type])).fetchone()
+                if row:
+                    return dict(row)
+    return None
+
+
+def populate(db: DBStore, parts: int, mappings: int):
+    for i in range(parts):
+        db.add_part(f"P{i:05d}", 100.0 + i, 1.5)
+    for i in range(mappings):
+        db.add_mapping(MAP_TYPES[i % 3], f"V{i:06d}", f"P{i % parts:05d}")
+
+
+def make_tags(count: int, mappings: int, hit_rate: float) -> list:
+    rng = random.Random(0)
+    tags = []
+    for _ in range(count):
+        # 命中时标签值来自已有映射，否则是不存在的值，需要依次查完三种映射类型
+        i = rng.randrange(mappings) if rng.random() < hit_rate else mappings + rng.randrange(mappings)
+        tags.append({t: f"V{i:06d}" for t in MAP_TYPES})
+    return tags
+
+
+def rate(fn, items: list) -> float:
+    t0 = time.perf_counter()
+    for item in items:
+        fn(item)
+    return len(items) / (time.perf_counter() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="零件标准查询吞吐量：每次新建连接的 JOIN 查询 vs 内存映射索引")
+    parser.add_argument('--parts', type=int, default=2000)
+    parser.add_argument('--mappings', type=int, default=20000)
+    parser.add_argument('--lookups', type=int, default=20000)
+    parser.add_argument('--hit-rate', type=float, default=0.8)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'standards.db')
+        db = DBStore(db_path)
+        populate(db, args.parts, args.mappings)
+        tags = make_tags(args.lookups, args.mappings, args.hit_rate)
+        legacy_tags = tags[:max(1, args.lookups // 10)]
+        legacy = rate(lambda t: legacy_lookup(db_path, t), legacy_tags)
+        t0 = time.perf_counter()
+        db.find_part_by_tags({})
+        load_ms = (time.perf_counter() - t0) * 1000
+        indexed = rate(db.find_part_by_tags, tags)
+        t0 = time.perf_counter()
+        db.find_parts_by_tags(tags)
+        batch = len(tags) / (time.perf_counter() - t0)
+        assert [legacy_lookup(db_path, t) for t in legacy_tags[:200]] == [db.find_part_by_tags(t) for t in legacy_tags[:200]]
+        db.close()
+    print(f"{args.parts} parts, {args.mappings} mappings, hit rate {args.hit_rate:.0%}")
+    print(f"  legacy (connect + JOIN): {legacy:12,.0f} lookups/s")
+    print(f"  indexed single lookup:   {indexed:12,.0f} lookups/s  (index load {load_ms:.1f} ms)")
+    print(f"  indexed batch lookup:    {batch:12,.0f} lookups/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.hv_bridge import HVBridge
+from core.logging_util import setup_logger
+from benchmarks.stub_agent import FileStubAgent, SocketStubAgent
+
+
+def bench(transport: str, rounds: int, jobs: int) -> tuple:
+    with tempfile.TemporaryDirectory() as tmp:
+        inbox = os.path.join(tmp, 'inbox')
+        outbox = os.path.join(tmp, 'outbox')
+        if transport == 'socket':
+            agent = SocketStubAgent()
+            port = agent.port
+        else:
+            # 与生成的 Tcl agent 一致：每 500 ms 扫描一次 inbox
+            agent = FileStubAgent(inbox, outbox, watcher='poll', poll_interval=0.5)
+            port = 0
+        agent.start()
+        bridge = HVBridge(inbox, outbox, timeout=30, transport=transport, port=port)
+        try:
+            samples = []
+            for _ in range(rounds):
+                t0 = time.perf_counter()
+                assert bridge.send_job('ping').get('success')
+                samples.append((time.perf_counter() - t0) * 1000)
+            t0 = time.perf_counter()
+            results = bridge.send_batch([('ping', {})] * jobs)
+            assert all(r.get('success') for r in results)
+            return samples, time.perf_counter() - t0
+        finally:
+            bridge.close()
+            agent.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="file 与 socket 传输的往返延迟基准 (使用 Python 替身 agent)")
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--jobs', type=int, default=100)
+    args = parser.parse_args()
+    setup_logger(tempfile.mkdtemp(), name="bench")
+    for transport in ('file', 'socket'):
+        samples, batch = bench(transport, args.rounds, args.jobs)
+        print(f"{transport:>6}: ping median {statistics.median(samples):8.2f} ms  max {max(samples):8.2f} ms  "
+              f"batch of {args.jobs}: {batch * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+import os
+import sys
+import json
+import threading
+import socketserver
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.hv_watcher import create_dir_watcher
+
+
+class StubAgent:
+    """不依赖 HyperView 的 agent 替身，用于基准测试"""
+
+    def handle(self, job: dict) -> dict:
+        if job.get('cmd') == 'ping':
+            return {'success': True, 'message': 'pong'}
+        return {'success': True, 'peak': {'value': 100.0, 'entity_id': 1, 'coords': [0, 0, 0], 'tags': {}}}
+
+
+class FileStubAgent(StubAgent):
+    """inbox/outbox 文件协议替身"""
+
+    def __init__(self, inbox_dir: str, outbox_dir: str, watcher: str = 'auto', poll_interval: float = 0.5):
+        self.inbox_dir = inbox_dir
+        self.outbox_dir = outbox_dir
+        # watcher='poll' 时按 poll_interval 扫描 inbox，模拟 Tcl agent 的 after 500 listen
+        self.poll_interval = poll_interval
+        self.watcher = create_dir_watcher(inbox_dir, watcher, poll_interval)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=2)
+        self.watcher.stop()
+
+    def _write_result(self, job_id: str, result: dict):
+        result_file = os.path.join(self.outbox_dir, f"job_{job_id}.result.json")
+        with open(result_file + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(result, f)
+        os.replace(result_file + '.tmp', result_file)
+
+    def _write_batch(self, job_id: str, jobs: list):
+        result_file = os.path.join(self.outbox_dir, f"job_{job_id}.result.jsonl")
+        with open(result_file + '.part', 'w', encoding='utf-8') as f:
+            for index, job in enumerate(jobs):
+                f.write(json.dumps(dict(self.handle(job), id=job['id'], index=index)) + '\n')
+        os.replace(result_file + '.part', result_file)
+
+    def _run(self):
+        while not self._stop.is_set():
+            seq = self.watcher.sequence
+            for name in sorted(os.listdir(self.inbox_dir)):
+                if not (name.startswith('job_') and name.endswith('.json')):
+                    continue
+                path = os.path.join(self.inbox_dir, name)
+                processing = path + '.processing'
+                try:
+                    os.rename(path, processing)
+                except OSError:
+                    continue
+                with open(processing, 'r', encoding='utf-8') as f:
+                    lines = f.read().splitlines()
+                header = json.loads(lines[0]) if lines[0].strip() != '{' else None
+                if header and header.get('cmd') == 'batch':
+                    self._write_batch(header['id'], [json.loads(line) for line in lines[1:] if line.strip()])
+                else:
+                    job = json.loads('\n'.join(lines))
+                    self._write_result(job['id'], self.handle(job))
+                os.remove(processing)
+            self.watcher.wait_event(seq, self.poll_interval)
+
+
+class SocketStubAgent(StubAgent):
+    """localhost socket 协议替身：每行一个 JSON 任务，按行写回带 id 的结果"""
+
+    def __init__(self, port: int = 0):
+        agent = self
+
+        class _Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    if not line.strip():
+                        continue
+                    job = json.loads(line)
+                    result = dict(agent.handle(job), id=job['id'])
+                    self.wfile.write((json.dumps(result) + '\n').encode('utf-8'))
+                    self.wfile.flush()
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self.server = socketserver.ThreadingTCPServer(('127.0.0.1', port), _Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
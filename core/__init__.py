@@ -1,15 +1,27 @@
-from .orchestrator import Orchestrator, State
-from .db_store import DBStore
-from .analysis import Analyzer, AnalysisResult
-from .report_html import HTMLReporter
-from .hv_bridge import HVBridge, ReadySignal
-from .hv_process import HVProcess
-
-__all__ = [
-    'Orchestrator', 'State',
-    'DBStore',
-    'Analyzer', 'AnalysisResult',
-    'HTMLReporter',
-    'HVBridge', 'ReadySignal',
-    'HVProcess'
-]
+import importlib
+
+# 按需导入：命令行只加载子命令用到的模块 (例如标准导入导出不需要加载编排器)
+_EXPORTS = {
+    'Orchestrator': 'orchestrator', 'State': 'orchestrator',
+    'DBStore': 'db_store',
+    'Analyzer': 'analysis', 'AnalysisResult': 'analysis',
+    'HTMLReporter': 'report_html',
+    'HVBridge': 'hv_bridge', 'ReadySignal': 'hv_bridge',
+    'HVProcess': 'hv_process',
+    'HVPool': 'hv_pool', 'HVWorker': 'hv_pool',
+    'ResultCache': 'result_cache',
+    'RequestQueue': 'request_queue',
+    'RequestCoalescer': 'request_coalescer',
+    'TagRuleMatcher': 'tag_rules',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
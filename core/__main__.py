@@ -0,0 +1,256 @@
+"""无界面命令行入口：python -m core <子命令>
+
+stdout 每行输出一个 JSON 事件 (startup/state/progress/result/error)，日志写到 stderr 和日志文件。
+"""
+import time
+
+_T0 = time.perf_counter()
+
+import os
+import sys
+import json
+import argparse
+from typing import Dict, Any, Optional
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def emit(event: str, **fields):
+    fields = {'event': event, **fields}
+    sys.stdout.write(json.dumps(fields, ensure_ascii=False, default=str) + '\n')
+    sys.stdout.flush()
+
+
+def _analysis_json(output: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if output is None:
+        return None
+    from dataclasses import asdict
+    data = {k: v for k, v in output.items() if k not in ('analysis', 'analyses')}
+    data['analysis'] = asdict(output['analysis'])
+    data['analyses'] = [asdict(a) for a in output['analyses']]
+    return data
+
+
+def _orchestrator(args):
+    from core.orchestrator import Orchestrator
+    orchestrator = Orchestrator(args.base_dir)
+    orchestrator.on_state_change = lambda state: emit('state', state=state.name)
+    emit('startup', seconds=round(time.perf_counter() - _T0, 3), component='orchestrator')
+    return orchestrator
+
+
+def _ensure_started(orchestrator, cold: bool = False) -> bool:
+    from core.orchestrator import State
+    if orchestrator.state == State.AGENT_READY:
+        return True
+    t = time.perf_counter()
+    ok = orchestrator.start_hyperview(cold=cold)
+    emit('hyperview', ready=ok, seconds=round(time.perf_counter() - t, 3), timings=orchestrator.startup_timings)
+    return ok
+
+
+def cmd_start(args) -> int:
+    orchestrator = _orchestrator(args)
+    try:
+        return 0 if _ensure_started(orchestrator, args.cold) else 1
+    finally:
+        # HyperView 保持运行，供后续命令复用
+        orchestrator.bridge.close()
+
+
+def cmd_analyse(args) -> int:
+    orchestrator = _orchestrator(args)
+    try:
+        if not _ensure_started(orchestrator):
+            emit('error', message='HyperView not ready')
+            return 1
+        kwargs = {'use_cache': not args.no_cache, 'top_k': args.top_k, 'group_by': args.group_by,
+                  'capture': args.capture}
+        if args.sweep:
+            output = orchestrator.run_sweep(args.model, args.result, simulations=args.sweep,
+                                            use_cache=kwargs['use_cache'], capture=args.capture,
+                                            on_step=lambda step: emit('progress', **step))
+        else:
+            output = orchestrator.run_analysis(args.model, args.result, **kwargs)
+        emit('result', success=output is not None, result=_analysis_json(output))
+        return 0 if output is not None else 1
+    finally:
+        orchestrator.bridge.close()
+
+
+def cmd_manifest(args) -> int:
+    orchestrator = _orchestrator(args)
+
+    def progress(event: Dict):
+        event = {k: v for k, v in event.items() if k != 'result'}
+        emit('progress', **event)
+
+    try:
+        summary = orchestrator.run_batch(args.manifest, concurrency=args.concurrency, retries=args.retries,
+                                         on_progress=progress, use_cache=not args.no_cache, top_k=args.top_k,
+                                         group_by=args.group_by, capture=args.capture)
+        if summary is None:
+            emit('error', message='Invalid manifest')
+            return 1
+        emit('result', success=summary['failed'] == 0, summary={k: v for k, v in summary.items() if k != 'items'})
+        return 0 if summary['failed'] == 0 else 1
+    finally:
+        orchestrator.bridge.close()
+        orchestrator.stop_pool()
+
+
+def cmd_watch(args) -> int:
+    orchestrator = _orchestrator(args)
+    hot_folder = orchestrator.start_hot_folder(args.dirs or None, on_event=lambda e: emit(**e))
+    if hot_folder is None:
+        emit('error', message='No hot folder directories configured')
+        orchestrator.bridge.close()
+        return 1
+    emit('watching', dirs=hot_folder.dirs)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        emit('stopped', pending=hot_folder.pending())
+        return 0
+    finally:
+        orchestrator.bridge.close()
+        orchestrator.stop_hot_folder()
+        orchestrator.stop_pool()
+
+
+def cmd_standards(args) -> int:
+    # 标准库操作只需要数据库模块，不加载编排器和 HyperView 相关模块
+    from core.db_store import DBStore
+    with open(os.path.join(args.base_dir, 'config.json'), 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    db = DBStore(os.path.join(args.base_dir, config['database']['path']))
+    emit('startup', seconds=round(time.perf_counter() - _T0, 3), component='standards')
+    try:
+        if args.action == 'import':
+            importer = db.import_mappings_bulk if args.kind == 'mappings' else db.import_parts_bulk
+            report = importer(args.file, args.mode)
+            for error in report['errors']:
+                emit('error', line=error['line'], message=error['error'])
+            emit('result', success=not report['aborted'], action='import', kind=args.kind, file=args.file,
+                 mode=args.mode, imported=report['inserted'] + report['updated'], inserted=report['inserted'],
+                 updated=report['updated'], skipped=report['skipped'], errors=len(report['errors']),
+                 orphans_removed=report.get('orphans_removed', 0))
+            if report['aborted']:
+                return 1
+        else:
+            db.export_parts_csv(args.file)
+            emit('result', success=True, action='export', file=args.file, parts=len(db.get_all_parts()))
+    except (OSError, KeyError, ValueError) as e:
+        emit('error', message=str(e))
+        return 1
+    return 0
+
+
+def cmd_history(args) -> int:
+    # 历史查询只读数据库，不加载编排器
+    from core.db_store import DBStore
+    with open(os.path.join(args.base_dir, 'config.json'), 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    db = DBStore(os.path.join(args.base_dir, config['database']['path']))
+    passed = True if args.passed else False if args.failed else None
+    query = db.query_results if args.results else db.query_runs
+    kwargs = {'order_by': args.order_by} if args.results else {}
+    page = query(part_no=args.part, passed=passed, since=args.since, until=args.until, min_ratio=args.min_ratio,
+                 limit=args.limit, offset=args.offset, **kwargs)
+    for item in page['items']:
+        emit('result' if args.results else 'run', **item)
+    emit('page', total=page['total'], limit=page['limit'], offset=page['offset'], count=len(page['items']))
+    db.close()
+    return 0
+
+
+def cmd_reevaluate(args) -> int:
+    # 只用保存的峰值重新判定，不启动 HyperView
+    orchestrator = _orchestrator(args)
+    try:
+        summary = orchestrator.reevaluate([os.path.abspath(d) for d in args.run_dirs] or None,
+                                          regenerate_reports=not args.no_reports)
+        emit('result', success=True, runs=summary['runs'], changed=summary['changed'],
+             reports=len(summary['reports']))
+        return 0
+    finally:
+        orchestrator.shutdown()
+
+
+def _add_analysis_options(p: argparse.ArgumentParser):
+    p.add_argument('--top-k', type=int, default=1, help='返回前 K 个热点')
+    p.add_argument('--group-by', default='', choices=['', 'component', 'property'], help='按分组返回峰值')
+    p.add_argument('--capture', default=None, choices=['full', 'reduced', 'none', 'on_fail'], help='截图模式')
+    p.add_argument('--no-cache', action='store_true', help='忽略结果缓存')
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m core', description='HyperView post-processing (headless)')
+    parser.add_argument('--base-dir', default=BASE_DIR, help='包含 config.json 的目录')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('start', help='连接已运行的 agent，没有时启动 HyperView 并等待就绪')
+    p.add_argument('--cold', action='store_true', help='不尝试连接，直接冷启动')
+    p.set_defaults(func=cmd_start)
+
+    p = sub.add_parser('analyse', aliases=['analyze'], help='分析一组模型/结果文件')
+    p.add_argument('model')
+    p.add_argument('result', nargs='?', default='')
+    p.add_argument('--sweep', nargs='?', const='all', default=None, choices=['all', 'last'],
+                   help='遍历全部 subcase (all: 全部时间步, last: 每个 subcase 最后一步)')
+    _add_analysis_options(p)
+    p.set_defaults(func=cmd_analyse)
+
+    p = sub.add_parser('manifest', help='按清单 (CSV: model_path,result_path) 批量分析')
+    p.add_argument('manifest')
+    p.add_argument('--concurrency', type=int, default=None)
+    p.add_argument('--retries', type=int, default=2)
+    _add_analysis_options(p)
+    p.set_defaults(func=cmd_manifest)
+
+    p = sub.add_parser('watch', help='热文件夹模式：自动分析写入监视目录的结果文件')
+    p.add_argument('dirs', nargs='*', help='监视目录，缺省使用 config.json 的 hot_folder.dirs')
+    p.set_defaults(func=cmd_watch)
+
+    p = sub.add_parser('reevaluate', help='标准变更后按保存的峰值重新判定受影响的运行并重写报告')
+    p.add_argument('run_dirs', nargs='*', help='指定运行目录，缺省根据标准变更日志查找')
+    p.add_argument('--no-reports', action='store_true', help='只更新判定结果，不重写报告')
+    p.set_defaults(func=cmd_reevaluate)
+
+    p = sub.add_parser('history', help='分页查询分析历史 (默认按运行，--results 按判定结果)')
+    p.add_argument('--part', default=None, help='零件编号')
+    g = p.add_mutually_exclusive_group()
+    g.add_argument('--failed', action='store_true', help='只看不通过的结果')
+    g.add_argument('--passed', action='store_true', help='只看通过的结果')
+    p.add_argument('--since', default=None, help='起始时间 (含)，ISO 格式，如 2024-05-01')
+    p.add_argument('--until', default=None, help='截止时间 (不含)，ISO 格式')
+    p.add_argument('--min-ratio', type=float, default=None, help='最小应力比')
+    p.add_argument('--results', action='store_true', help='按判定结果逐行输出')
+    p.add_argument('--order-by', default='date', choices=['date', 'ratio'], help='--results 的排序方式')
+    p.add_argument('--limit', type=int, default=50)
+    p.add_argument('--offset', type=int, default=0)
+    p.set_defaults(func=cmd_history)
+
+    p = sub.add_parser('standards', help='导入/导出零件标准 CSV')
+    p.add_argument('action', choices=['import', 'export'])
+    p.add_argument('file')
+    p.add_argument('--kind', default='parts', choices=['parts', 'mappings'],
+                   help='导入零件标准 (part_no,allowable_vm,...) 或映射 (map_type,map_value,part_no)')
+    p.add_argument('--mode', default='insert', choices=['insert', 'upsert', 'replace'],
+                   help='insert: 跳过已存在的记录, upsert: 更新已存在的记录, replace: 清空后导入')
+    p.set_defaults(func=cmd_standards)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except KeyboardInterrupt:
+        emit('error', message='interrupted')
+        return 130
+
+
+if __name__ == '__main__':
+    sys.exit(main())
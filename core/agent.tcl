@@ -0,0 +1,929 @@
+set AGENT_T0 [clock milliseconds]
+package require Tk
+set READY_FILE "@READY_FILE@"
+set INBOX_DIR "@INBOX_DIR@"
+set OUTBOX_DIR "@OUTBOX_DIR@"
+set SOCKET_PORT @SOCKET_PORT@
+set MAX_MODELS @MAX_MODELS@
+set MAX_MODEL_BYTES @MAX_MODEL_BYTES@
+set TK_LOADED [clock milliseconds]
+set AGENT_VERSION "@AGENT_VERSION@"
+set LISTENING 1
+set SERVER_SOCK ""
+set MAX_VALUE 0.0
+set MAX_ID 0
+set READY_ATTEMPTS 0
+proc write_ready {} {
+    global READY_FILE AGENT_T0 TK_LOADED READY_ATTEMPTS
+    incr READY_ATTEMPTS
+    if { [catch {
+        hwi OpenStack
+        hwi GetSessionHandle sess
+        sess ReleaseHandle
+        hwi CloseStack
+    } err] } {
+        # HyperView 会话尚未初始化完成，短间隔重试
+        after 100 write_ready
+        return
+    }
+
+    # 先写临时文件再改名，Python 端看到文件时内容已完整
+    set f [open "$READY_FILE.tmp" w]
+    puts $f [format {{"pid":%d,"tcl_loaded":%s,"tk_loaded":%s,"hwi_ready":%s,"attempts":%d}} \
+        [pid] $AGENT_T0 $TK_LOADED [clock milliseconds] $READY_ATTEMPTS]
+    close $f
+    file rename -force "$READY_FILE.tmp" $READY_FILE
+    puts "Agent Ready"
+}
+
+# 截图设置，由每个任务的 capture/capture_width/capture_height/capture_format 字段覆盖
+set CAPTURE_MODE "full"
+set CAPTURE_W 1920
+set CAPTURE_H 1080
+set CAPTURE_FMT "png"
+proc capture_image {win output_dir} {
+    global CAPTURE_MODE CAPTURE_W CAPTURE_H CAPTURE_FMT
+    if {$CAPTURE_MODE eq "none"} {
+        return ""
+    }
+    file mkdir $output_dir
+    set image_path [file join $output_dir "vonmises.$CAPTURE_FMT"]
+    $win CaptureImage $image_path 0 0 $CAPTURE_W $CAPTURE_H
+    return $image_path
+}
+
+proc images_json {image_path} {
+    if {$image_path eq ""} {
+        return {[]}
+    }
+    return [format {["%s"]} $image_path]
+}
+
+proc escape_json_string {str} {
+    set bs [format %c 92]
+    set q [format %c 34]
+    return [string map [list $bs "$bs$bs" $q "$bs$q" [format %c 10] "${bs}n" [format %c 13] "${bs}r" [format %c 9] "${bs}t"] $str]
+}
+
+proc write_result {job_id result_json} {
+    global OUTBOX_DIR
+    set result_file [file join $OUTBOX_DIR "job_${job_id}.result.json"]
+    set tmp_file "${result_file}.tmp"
+    puts "Writing result to: $result_file"
+    set f [open $tmp_file w]
+    puts $f $result_json
+    close $f
+    # 先写临时文件再重命名，Python端收到rename事件时文件已完整
+    file rename -force $tmp_file $result_file
+    puts "Result written successfully"
+}
+
+# 常驻模型表：键为 "模型路径|结果路径"，值为 HyperView 模型 id；MODEL_LRU 按最近使用排序
+array set MODEL_TABLE {}
+set MODEL_LRU {}
+
+proc model_key {model_path result_path} {
+    return "$model_path|$result_path"
+}
+
+proc is_result_file {path} {
+    set ext [string tolower [file extension $path]]
+    return [expr {$ext in {.h3d .op2 .pch .rst .d3plot}}]
+}
+
+proc resident_bytes {} {
+    global MODEL_LRU
+    set total 0
+    foreach key $MODEL_LRU {
+        foreach path [split $key "|"] {
+            if {$path ne "" && [file exists $path]} {
+                incr total [file size $path]
+            }
+        }
+    }
+    return $total
+}
+
+proc forget_model {key} {
+    global MODEL_TABLE MODEL_LRU
+    catch { unset MODEL_TABLE($key) }
+    set idx [lsearch -exact $MODEL_LRU $key]
+    if {$idx >= 0} {
+        set MODEL_LRU [lreplace $MODEL_LRU $idx $idx]
+    }
+}
+
+# 超过模型数量或文件体积上限时按 LRU 卸载最久未用的模型，为新模型腾出位置
+proc evict_models {post incoming_bytes} {
+    global MODEL_TABLE MODEL_LRU MAX_MODELS MAX_MODEL_BYTES
+    while {[llength $MODEL_LRU] > 0} {
+        set over_count [expr {[llength $MODEL_LRU] >= $MAX_MODELS}]
+        set over_bytes [expr {$MAX_MODEL_BYTES > 0 && [resident_bytes] + $incoming_bytes > $MAX_MODEL_BYTES}]
+        if {!$over_count && !$over_bytes} {
+            break
+        }
+        set key [lindex $MODEL_LRU 0]
+        set id $MODEL_TABLE($key)
+        puts "Evicting model $id: $key"
+        catch { $post RemoveModel $id }
+        forget_model $key
+    }
+}
+
+proc show_only_model {post id} {
+    global MODEL_TABLE MODEL_LRU
+    foreach key $MODEL_LRU {
+        set mid $MODEL_TABLE($key)
+        catch {
+            $post GetModelHandle vis_model $mid
+            vis_model SetVisibility [expr {$mid == $id}]
+            vis_model ReleaseHandle
+        }
+    }
+}
+
+# 返回 (模型, 结果) 对应的常驻模型 id：已加载则切换为活动模型，否则加载新模型
+proc ensure_model {post model_path result_path} {
+    global MODEL_TABLE MODEL_LRU
+    set key [model_key $model_path $result_path]
+    if {[info exists MODEL_TABLE($key)]} {
+        set id $MODEL_TABLE($key)
+        if {[catch { $post SetActiveModel $id }] == 0} {
+            forget_model $key
+            set MODEL_TABLE($key) $id
+            lappend MODEL_LRU $key
+            show_only_model $post $id
+            puts "Reusing resident model $id: $key"
+            return $id
+        }
+        # 模型已被用户在界面中关闭
+        forget_model $key
+    }
+
+    set incoming 0
+    foreach path [list $model_path $result_path] {
+        if {$path ne "" && [file exists $path]} {
+            incr incoming [file size $path]
+        }
+    }
+    evict_models $post $incoming
+
+    set id [$post AddModel $model_path]
+    catch { $post SetActiveModel $id }
+    if {$result_path ne ""} {
+        if {[is_result_file $result_path]} {
+            puts "Loading result file: $result_path"
+            if { [catch {
+                $post GetModelHandle new_model $id
+                new_model AddResult $result_path
+                new_model ReleaseHandle
+            } addResultErr] } {
+                catch { new_model ReleaseHandle }
+                puts "Warning: Could not load result file: $addResultErr"
+            }
+        } else {
+            puts "Note: Result file type '[file extension $result_path]' is not directly supported."
+        }
+    }
+    set MODEL_TABLE($key) $id
+    lappend MODEL_LRU $key
+    show_only_model $post $id
+    puts "Loaded model $id: $key"
+    return $id
+}
+
+# 在指定模型上启用 von Mises 应力云图
+proc setup_vm_contour {post id} {
+    if { [catch {
+        $post GetModelHandle model1 $id
+        model1 GetResultCtrlHandle resultCtrl
+        resultCtrl GetContourCtrlHandle contourCtrl
+
+        # 设置数据类型为应力(Stress) von Mises
+        if { [catch {
+            contourCtrl SetDataType "Stress"
+            contourCtrl SetDataComponent "vonMises"
+        } setErr] } {
+            puts "SetDataType/Component warning: $setErr"
+        }
+
+        # 启用云图显示
+        if { [catch {
+            contourCtrl SetEnableState true
+        } enableErr] } {
+            puts "SetEnableState warning: $enableErr"
+        }
+
+        # 应用更改
+        if { [catch {
+            resultCtrl Apply
+        } applyErr] } {
+            puts "Apply warning: $applyErr"
+        }
+
+        contourCtrl ReleaseHandle
+        resultCtrl ReleaseHandle
+        model1 ReleaseHandle
+    } resultErr] } {
+        puts "Result/Contour ctrl warning: $resultErr"
+        catch { model1 ReleaseHandle }
+    }
+}
+
+proc cmd_export_contour_and_peak_vm {model_path result_path output_dir } {
+    global MAX_VALUE MAX_ID
+    set MAX_VALUE 0.0
+    set MAX_ID 0
+    set image_path ""
+    set row {}
+
+    if { [catch {
+        hwi OpenStack
+        hwi GetSessionHandle sess
+        sess GetProjectHandle proj
+        set pageId [proj GetActivePage]
+        proj GetPageHandle page1 $pageId
+        set winId [page1 GetActiveWindow]
+        page1 GetWindowHandle win1 $winId
+        win1 SetClientType animation
+        win1 GetClientHandle my_post
+
+        set modelId [ensure_model my_post $model_path $result_path]
+        setup_vm_contour my_post $modelId
+
+        # 刷新显示
+        my_post Draw
+
+        # 获取最大值
+        if { [catch {
+            my_post GetQueryCtrlHandle qc
+            set MAX_VALUE [qc GetContourMaxValue]
+            set MAX_ID [qc GetContourMaxID]
+            qc ReleaseHandle
+        } qerr] } {
+            puts "Query error (using defaults): $qerr"
+            set MAX_VALUE 0.0
+            set MAX_ID 0
+        }
+        set row [element_row my_post $MAX_VALUE $MAX_ID]
+
+        set image_path [capture_image win1 $output_dir]
+
+        my_post ReleaseHandle
+        win1 ReleaseHandle
+        page1 ReleaseHandle
+        proj ReleaseHandle
+        sess ReleaseHandle
+        hwi CloseStack
+    } err] } {
+        puts "cmd_export_contour_and_peak_vm error: $err"
+        catch { hwi CloseStack }
+        # 返回默认值而不是抛出错误，避免错误传播问题
+        return [list 0.0 0 "" {}]
+    }
+
+    return [list $MAX_VALUE $MAX_ID $image_path $row]
+}
+
+# 遍历当前云图的单元 (selection 为 "all" 或 "id <n>")，对每个单元调用 callback {value id x y z component property}
+# 结果文件不带零件号，单元只能给出 component/property 标签；part 映射由用户按组件名配置
+proc query_elements {post callback {selection "all"}} {
+    $post GetQueryCtrlHandle qc
+    if { [catch {
+        set setId [$post AddSelectionSet element]
+        $post GetSelectionSetHandle elemSet $setId
+        elemSet Add $selection
+        qc SetSelectionSet $setId
+        qc SetQuery "element.id contour.value element.centroid component.name property.name"
+        qc GetIteratorHandle iter
+        for {iter First} {[iter Valid]} {iter Next} {
+            lassign [iter GetDataList] eid value centroid comp prop
+            if {![string is double -strict $value]} {
+                continue
+            }
+            lassign $centroid x y z
+            {*}$callback [list $value $eid $x $y $z $comp $prop]
+        }
+        iter ReleaseHandle
+        elemSet ReleaseHandle
+        catch { $post RemoveSelectionSet $setId }
+    } err] } {
+        puts "Element query warning: $err"
+        catch { iter ReleaseHandle }
+        catch { elemSet ReleaseHandle }
+    }
+    qc ReleaseHandle
+}
+
+# 流式维护按数值降序的前 K 个单元，避免把全部单元读入内存后再排序
+set TOPK {}
+proc topk_add {k row} {
+    global TOPK
+    set v [lindex $row 0]
+    if {[llength $TOPK] >= $k && $v <= [lindex $TOPK end 0]} {
+        return
+    }
+    set i 0
+    foreach r $TOPK {
+        if {$v > [lindex $r 0]} {
+            break
+        }
+        incr i
+    }
+    set TOPK [lrange [linsert $TOPK $i $row] 0 [expr {$k - 1}]]
+}
+
+proc hotspot_json {row} {
+    lassign $row value eid x y z comp prop
+    foreach c {x y z} {
+        if {![string is double -strict [set $c]]} {
+            set $c 0
+        }
+    }
+    return [format {{"value":%s,"entity_id":%s,"coords":[%s,%s,%s],"tags":{"component":"%s","property":"%s"}}} \
+        $value $eid $x $y $z [escape_json_string $comp] [escape_json_string $prop]]
+}
+
+# 峰值单元的质心和标签：只查询这一个单元；查询失败时坐标为 0、标签为空
+set ELEMENT_ROW {}
+proc element_row {post value eid} {
+    global ELEMENT_ROW
+    set ELEMENT_ROW [list $value $eid 0 0 0 "" ""]
+    query_elements $post [list element_row_set $value] "id $eid"
+    return $ELEMENT_ROW
+}
+
+proc element_row_set {value row} {
+    global ELEMENT_ROW
+    # 峰值取 GetContourMaxValue 的结果，与不合格判定使用同一个数
+    set ELEMENT_ROW [lreplace $row 0 0 $value]
+}
+
+# 加载模型并设置云图后逐单元调用 callback，最后截图；成功返回图片路径，失败抛出错误
+proc contour_query {model_path result_path output_dir callback} {
+    if { [catch {
+        hwi OpenStack
+        hwi GetSessionHandle sess
+        sess GetProjectHandle proj
+        set pageId [proj GetActivePage]
+        proj GetPageHandle page1 $pageId
+        set winId [page1 GetActiveWindow]
+        page1 GetWindowHandle win1 $winId
+        win1 SetClientType animation
+        win1 GetClientHandle my_post
+
+        set modelId [ensure_model my_post $model_path $result_path]
+        setup_vm_contour my_post $modelId
+        my_post Draw
+
+        query_elements my_post $callback
+
+        set image_path [capture_image win1 $output_dir]
+
+        my_post ReleaseHandle
+        win1 ReleaseHandle
+        page1 ReleaseHandle
+        proj ReleaseHandle
+        sess ReleaseHandle
+        hwi CloseStack
+    } err] } {
+        catch { hwi CloseStack }
+        error $err
+    }
+    return $image_path
+}
+
+proc cmd_export_hotspots {model_path result_path output_dir top_k} {
+    global TOPK
+    set TOPK {}
+    if { [catch {
+        set image_path [contour_query $model_path $result_path $output_dir [list topk_add $top_k]]
+    } err] } {
+        puts "cmd_export_hotspots error: $err"
+        return [format {{"success":false,"error":"%s"}} [escape_json_string $err]]
+    }
+    if {[llength $TOPK] == 0} {
+        return {{"success":false,"error":"Analysis failed - no valid results"}}
+    }
+    set items {}
+    foreach row $TOPK {
+        lappend items [hotspot_json $row]
+    }
+    set hotspots [join $items ","]
+    return [format {{"success":true,"images":%s,"peak":%s,"hotspots":[%s]}} [images_json $image_path] [lindex $items 0] $hotspots]
+}
+
+# 按分组 (component/property) 保留每组最大值单元，单次遍历完成
+array set GROUP_MAX {}
+proc group_add {index row} {
+    global GROUP_MAX
+    set name [lindex $row $index]
+    if {![info exists GROUP_MAX($name)] || [lindex $row 0] > [lindex $GROUP_MAX($name) 0]} {
+        set GROUP_MAX($name) $row
+    }
+}
+
+proc cmd_export_group_peaks {model_path result_path output_dir group_by} {
+    global GROUP_MAX
+    array unset GROUP_MAX
+    array set GROUP_MAX {}
+    switch -- $group_by {
+        "property" { set index 6 }
+        "" - "component" { set group_by "component"; set index 5 }
+        default {
+            return [format {{"success":false,"error":"unsupported group_by: %s"}} [escape_json_string $group_by]]
+        }
+    }
+    if { [catch {
+        set image_path [contour_query $model_path $result_path $output_dir [list group_add $index]]
+    } err] } {
+        puts "cmd_export_group_peaks error: $err"
+        return [format {{"success":false,"error":"%s"}} [escape_json_string $err]]
+    }
+    set rows {}
+    foreach name [array names GROUP_MAX] {
+        lappend rows $GROUP_MAX($name)
+    }
+    if {[llength $rows] == 0} {
+        return {{"success":false,"error":"Analysis failed - no valid results"}}
+    }
+    set items {}
+    foreach row [lsort -real -decreasing -index 0 $rows] {
+        lappend items [hotspot_json $row]
+    }
+    puts "Group peaks by $group_by: [llength $items] groups"
+    return [format {{"success":true,"images":%s,"group_by":"%s","peak":%s,"groups":[%s]}} \
+        [images_json $image_path] $group_by [lindex $items 0] [join $items ","]]
+}
+
+# 流式中间结果：socket 模式写回当前连接，文件模式追加到 outbox 的 progress 文件
+set PROGRESS_JOB ""
+set PROGRESS_CHAN ""
+proc emit_progress {json} {
+    global PROGRESS_JOB PROGRESS_CHAN OUTBOX_DIR
+    if {$PROGRESS_JOB eq ""} {
+        return
+    }
+    set line [format {%c"id":"%s","progress":true,%s} 123 $PROGRESS_JOB [string range $json 1 end]]
+    if {$PROGRESS_CHAN ne ""} {
+        catch { puts $PROGRESS_CHAN $line }
+        return
+    }
+    set f [open [file join $OUTBOX_DIR "job_${PROGRESS_JOB}.progress.jsonl"] a]
+    fconfigure $f -encoding utf-8
+    puts $f $line
+    close $f
+}
+
+# 在一次任务内遍历全部 subcase/simulation，逐个上报峰值并记录包络最大值，最后在包络工况截图
+proc cmd_export_sweep {model_path result_path output_dir subcases simulations} {
+    set items {}
+    set env_value ""
+    if { [catch {
+        hwi OpenStack
+        hwi GetSessionHandle sess
+        sess GetProjectHandle proj
+        set pageId [proj GetActivePage]
+        proj GetPageHandle page1 $pageId
+        set winId [page1 GetActiveWindow]
+        page1 GetWindowHandle win1 $winId
+        win1 SetClientType animation
+        win1 GetClientHandle my_post
+
+        set modelId [ensure_model my_post $model_path $result_path]
+        setup_vm_contour my_post $modelId
+        my_post GetModelHandle sweep_model $modelId
+        sweep_model GetResultCtrlHandle sweep_ctrl
+
+        set ids [sweep_ctrl GetSubcaseList]
+        if {[llength $subcases] > 0} {
+            set selected {}
+            foreach sc $ids {
+                if {$sc in $subcases} {
+                    lappend selected $sc
+                }
+            }
+            set ids $selected
+        }
+        foreach sc $ids {
+            sweep_ctrl SetCurrentSubcase $sc
+            set sc_label ""
+            catch { set sc_label [sweep_ctrl GetSubcaseLabel $sc] }
+            set sims [sweep_ctrl GetSimulationList $sc]
+            if {$simulations eq "last"} {
+                set sims [lrange $sims end end]
+            }
+            foreach sim $sims {
+                sweep_ctrl SetCurrentSimulation $sim
+                catch { sweep_ctrl Apply }
+                my_post Draw
+                set value 0.0
+                set eid 0
+                if { [catch {
+                    my_post GetQueryCtrlHandle qc
+                    set value [qc GetContourMaxValue]
+                    set eid [qc GetContourMaxID]
+                    qc ReleaseHandle
+                } qerr] } {
+                    puts "Sweep query warning ($sc/$sim): $qerr"
+                    catch { qc ReleaseHandle }
+                    continue
+                }
+                set sim_label ""
+                catch { set sim_label [sweep_ctrl GetSimulationLabel $sc $sim] }
+                set row [format {{"subcase":%s,"subcase_label":"%s","simulation":%s,"simulation_label":"%s","value":%s,"entity_id":%s}} \
+                    $sc [escape_json_string $sc_label] $sim [escape_json_string $sim_label] $value $eid]
+                emit_progress $row
+                lappend items $row
+                if {$env_value eq "" || $value > $env_value} {
+                    set env_value $value
+                    set env [list $sc $sim $eid $row]
+                }
+            }
+        }
+
+        set image_path ""
+        if {$env_value ne ""} {
+            lassign $env env_sc env_sim
+            sweep_ctrl SetCurrentSubcase $env_sc
+            sweep_ctrl SetCurrentSimulation $env_sim
+            catch { sweep_ctrl Apply }
+            my_post Draw
+            set env_row [element_row my_post $env_value [lindex $env 2]]
+            set image_path [capture_image win1 $output_dir]
+        }
+
+        sweep_ctrl ReleaseHandle
+        sweep_model ReleaseHandle
+        my_post ReleaseHandle
+        win1 ReleaseHandle
+        page1 ReleaseHandle
+        proj ReleaseHandle
+        sess ReleaseHandle
+        hwi CloseStack
+    } err] } {
+        puts "cmd_export_sweep error: $err"
+        catch { sweep_ctrl ReleaseHandle }
+        catch { sweep_model ReleaseHandle }
+        catch { hwi CloseStack }
+        return [format {{"success":false,"error":"%s"}} [escape_json_string $err]]
+    }
+    if {$env_value eq ""} {
+        return {{"success":false,"error":"Analysis failed - no valid results"}}
+    }
+    lassign $env env_sc env_sim env_eid env_step
+    puts "Sweep completed: [llength $items] steps, envelope $env_value at $env_sc/$env_sim"
+    # 包络峰值：包络工况下峰值单元的质心和标签，再附上 subcase/simulation
+    set peak [format {%s,"subcase":%s,"simulation":%s%c} \
+        [string range [hotspot_json $env_row] 0 end-1] $env_sc $env_sim 125]
+    return [format {{"success":true,"images":%s,"peak":%s,"envelope":%s,"steps":[%s]}} \
+        [images_json $image_path] $peak $env_step [join $items ","]]
+}
+
+# 延迟截图：判定不合格后再对常驻模型截图；sweep 结果可指定包络所在的 subcase/simulation
+proc cmd_capture {model_path result_path output_dir subcase simulation} {
+    if { [catch {
+        hwi OpenStack
+        hwi GetSessionHandle sess
+        sess GetProjectHandle proj
+        set pageId [proj GetActivePage]
+        proj GetPageHandle page1 $pageId
+        set winId [page1 GetActiveWindow]
+        page1 GetWindowHandle win1 $winId
+        win1 SetClientType animation
+        win1 GetClientHandle my_post
+
+        set modelId [ensure_model my_post $model_path $result_path]
+        setup_vm_contour my_post $modelId
+        if {$subcase ne ""} {
+            my_post GetModelHandle cap_model $modelId
+            cap_model GetResultCtrlHandle cap_ctrl
+            cap_ctrl SetCurrentSubcase $subcase
+            if {$simulation ne ""} {
+                cap_ctrl SetCurrentSimulation $simulation
+            }
+            catch { cap_ctrl Apply }
+            cap_ctrl ReleaseHandle
+            cap_model ReleaseHandle
+        }
+        my_post Draw
+        set image_path [capture_image win1 $output_dir]
+
+        my_post ReleaseHandle
+        win1 ReleaseHandle
+        page1 ReleaseHandle
+        proj ReleaseHandle
+        sess ReleaseHandle
+        hwi CloseStack
+    } err] } {
+        puts "cmd_capture error: $err"
+        catch { cap_ctrl ReleaseHandle }
+        catch { cap_model ReleaseHandle }
+        catch { hwi CloseStack }
+        return [format {{"success":false,"error":"%s"}} [escape_json_string $err]]
+    }
+    return [format {{"success":true,"images":%s}} [images_json $image_path]]
+}
+
+proc cmd_display_contour {model_path result_path} {
+    if { [catch {
+        hwi OpenStack
+        hwi GetSessionHandle sess
+        sess GetProjectHandle proj
+        set pageId [proj GetActivePage]
+        proj GetPageHandle page1 $pageId
+        set winId [page1 GetActiveWindow]
+        page1 GetWindowHandle win1 $winId
+        win1 SetClientType animation
+        win1 GetClientHandle my_post
+
+        set modelId [ensure_model my_post $model_path $result_path]
+        setup_vm_contour my_post $modelId
+
+        # 刷新显示
+        my_post Draw
+
+        my_post ReleaseHandle
+        win1 ReleaseHandle
+        page1 ReleaseHandle
+        proj ReleaseHandle
+        sess ReleaseHandle
+        hwi CloseStack
+    } err] } {
+        puts "cmd_display_contour error: $err"
+        catch { hwi CloseStack }
+        return 0
+    }
+
+    return 1
+}
+
+proc cmd_load_model {model_path result_path} {
+    puts "Executing load_model command"
+    puts "Model path: $model_path"
+    puts "Result path: $result_path"
+    if { [catch {
+        hwi OpenStack
+        hwi GetSessionHandle sess
+        sess GetProjectHandle proj
+        set pageId [proj GetActivePage]
+        proj GetPageHandle page1 $pageId
+        set winId [page1 GetActiveWindow]
+        page1 GetWindowHandle win1 $winId
+        win1 SetClientType animation
+        win1 GetClientHandle my_post
+
+        set modelId [ensure_model my_post $model_path $result_path]
+        if {$result_path ne "" && [is_result_file $result_path]} {
+            setup_vm_contour my_post $modelId
+        }
+        my_post Draw
+
+        my_post ReleaseHandle
+        win1 ReleaseHandle
+        page1 ReleaseHandle
+        proj ReleaseHandle
+        sess ReleaseHandle
+        hwi CloseStack
+    } err] } {
+        puts "load_model error: $err"
+        catch { hwi CloseStack }
+        return $err
+    }
+    puts "load_model completed successfully"
+    return ""
+}
+
+# 从单个 JSON 对象文本中取字符串字段 (任务由 Python 端生成，结构固定)
+proc json_get {content key} {
+    set idx [string first [format {"%s"} $key] $content]
+    if {$idx < 0} {
+        return ""
+    }
+    set start [string first {"} $content [expr {$idx + [string length $key] + 2}]]
+    set end [string first {"} $content [expr {$start + 1}]]
+    if {$start >= 0 && $end > $start} {
+        return [string range $content [expr {$start + 1}] [expr {$end - 1}]]
+    }
+    return ""
+}
+
+# 取数值字段，缺省或非数字时返回 default
+proc json_get_number {content key default} {
+    if {[regexp -- [format {"%s"[[:space:]]*:[[:space:]]*(-?[0-9.eE+-]+)} $key] $content -> value]} {
+        if {[string is double -strict $value]} {
+            return $value
+        }
+    }
+    return $default
+}
+
+# 执行一个任务对象，返回结果 JSON 文本
+proc run_job {content} {
+    global PROGRESS_JOB CAPTURE_MODE CAPTURE_W CAPTURE_H CAPTURE_FMT AGENT_VERSION LISTENING SERVER_SOCK READY_FILE
+    set job_id [json_get $content "id"]
+    set cmd [json_get $content "cmd"]
+    set model_path [json_get $content "model_path"]
+    set result_path [json_get $content "result_path"]
+    set output_dir [json_get $content "output_dir"]
+
+    puts "DEBUG: job_id=$job_id cmd=$cmd"
+    puts "DEBUG: model_path=$model_path"
+    puts "Processing: $job_id $cmd"
+    # 任务请求了中间结果上报时记录 job id，供 emit_progress 使用
+    set PROGRESS_JOB [expr {[json_get_number $content "progress" 0] ? $job_id : ""}]
+    set CAPTURE_MODE [expr {[json_get $content "capture"] eq "none" ? "none" : "full"}]
+    set CAPTURE_W [expr {int([json_get_number $content "capture_width" 1920])}]
+    set CAPTURE_H [expr {int([json_get_number $content "capture_height" 1080])}]
+    set CAPTURE_FMT [json_get $content "capture_format"]
+    if {$CAPTURE_FMT eq ""} {
+        set CAPTURE_FMT "png"
+    }
+
+    if { [catch {
+        switch $cmd {
+            "export_contour_and_peak_vm" {
+                set res [cmd_export_contour_and_peak_vm $model_path $result_path $output_dir]
+                set pv [lindex $res 0]
+                set pi [lindex $res 1]
+                set ip [lindex $res 2]
+                set row [lindex $res 3]
+                # 检查结果是否有效
+                # 结果无效：查询失败，或要求截图却没有得到图片
+                if {$pv == 0.0 || ($ip eq "" && $CAPTURE_MODE ne "none")} {
+                    set json {{"success":false,"error":"Analysis failed - no valid results"}}
+                } else {
+                    set json [format {{"success":true,"images":%s,"peak":%s}} [images_json $ip] [hotspot_json $row]]
+                }
+            }
+            "export_hotspots" {
+                set top_k [expr {max(1, int([json_get_number $content "top_k" 5]))}]
+                set json [cmd_export_hotspots $model_path $result_path $output_dir $top_k]
+            }
+            "export_group_peaks" {
+                set json [cmd_export_group_peaks $model_path $result_path $output_dir [json_get $content "group_by"]]
+            }
+            "export_sweep" {
+                set subcases [split [json_get $content "subcases"] ","]
+                set json [cmd_export_sweep $model_path $result_path $output_dir $subcases [json_get $content "simulations"]]
+            }
+            "capture" {
+                set json [cmd_capture $model_path $result_path $output_dir [json_get $content "subcase"] [json_get $content "simulation"]]
+            }
+            "ping" {
+                set json [format {{"success":true,"message":"pong","agent":"%s"}} $AGENT_VERSION]
+            }
+            "detach" {
+                # 停止监听，让新版本 agent 接管 inbox/端口；HyperView 本身保持运行
+                set LISTENING 0
+                if {$SERVER_SOCK ne ""} {
+                    catch { close $SERVER_SOCK }
+                    set SERVER_SOCK ""
+                }
+                catch { file delete $READY_FILE }
+                set json {{"success":true,"message":"detached"}}
+            }
+            "shutdown" {
+                # 实例池关闭实例：停止监听，回复写出后退出 HyperView，之后该实例目录才能复用
+                set LISTENING 0
+                if {$SERVER_SOCK ne ""} {
+                    catch { close $SERVER_SOCK }
+                    set SERVER_SOCK ""
+                }
+                catch { file delete $READY_FILE }
+                after 500 exit
+                set json {{"success":true,"message":"exiting"}}
+            }
+            "display_contour" {
+                puts "Executing display_contour command"
+                set res [cmd_display_contour $model_path $result_path]
+                if {$res == 1} {
+                    set json {{"success":true,"message":"Contour displayed"}}
+                } else {
+                    set json {{"success":false,"error":"Failed to display contour"}}
+                }
+            }
+            "load_model" {
+                set err [cmd_load_model $model_path $result_path]
+                if {$err eq ""} {
+                    set json {{"success":true}}
+                } else {
+                    set json [format {{"success":false,"error":"%s"}} [escape_json_string $err]]
+                }
+            }
+            default {
+                set json [format {{"success":false,"error":"Unknown cmd: %s"}} [escape_json_string $cmd]]
+            }
+        }
+    } err] } {
+        puts "run_job error: $err"
+        set json [format {{"success":false,"error":"%s"}} [escape_json_string $err]]
+    }
+    return $json
+}
+
+# 批量任务：首行为信封，其后每行一个子任务；每完成一个子任务追加一行结果
+proc process_batch {job_id content} {
+    global OUTBOX_DIR
+    set result_file [file join $OUTBOX_DIR "job_${job_id}.result.jsonl"]
+    set part_file "${result_file}.part"
+    set out [open $part_file w]
+    fconfigure $out -encoding utf-8
+    set index 0
+    foreach line [lrange [split $content "\n"] 1 end] {
+        if {[string trim $line] eq ""} {continue}
+        set sub_id [json_get $line "id"]
+        set json [run_job $line]
+        # 在结果对象开头插入子任务 id/index，左花括号用 %c 123 生成以保持 Tcl 花括号配对
+        puts $out [format {%c"id":"%s","index":%d,%s} 123 $sub_id $index [string range $json 1 end]]
+        flush $out
+        incr index
+    }
+    close $out
+    file rename -force $part_file $result_file
+    puts "Batch $job_id completed: $index jobs"
+}
+
+proc process_job {job_file} {
+    set f [open $job_file r]
+    fconfigure $f -encoding utf-8
+    set content [read $f]
+    close $f
+
+    set job_id [json_get $content "id"]
+    if {[json_get $content "cmd"] eq "batch"} {
+        if { [catch { process_batch $job_id $content } err] } {
+            puts "process_batch error: $err"
+            write_result $job_id [format {{"success":false,"error":"%s"}} [escape_json_string $err]]
+        }
+    } else {
+        write_result $job_id [run_job $content]
+    }
+    catch { file delete $job_file }
+}
+
+proc listen {} {
+    global INBOX_DIR LISTENING
+    if {!$LISTENING} {
+        puts "Agent detached"
+        return
+    }
+    if { [catch {
+        # job id 以毫秒时间戳开头，排序后按提交顺序处理同一轮中排队的多个任务
+        set files [lsort [glob -nocomplain -directory $INBOX_DIR "job_*.json"]]
+        foreach f $files {
+            if {[string match "*.tmp" $f]} {continue}
+            if {[string match "*.processing" $f]} {continue}
+            # 重命名文件防止重复处理
+            set processing_file "${f}.processing"
+            if {[catch {file rename -force $f $processing_file}]} {
+                continue
+            }
+            process_job $processing_file
+        }
+    } err] } {
+        puts "Listen error : $err"
+    }
+    after 500 listen
+}
+# socket 传输：每行一个 JSON 任务，结果带 id 按行写回，由事件循环驱动无需轮询
+proc agent_accept {chan addr port} {
+    fconfigure $chan -blocking 0 -buffering line -encoding utf-8 -translation lf
+    fileevent $chan readable [list agent_read $chan]
+    puts "Client connected: $addr $port"
+}
+
+proc agent_read {chan} {
+    if { [catch {gets $chan line} n] || [eof $chan] } {
+        catch { close $chan }
+        puts "Client disconnected"
+        return
+    }
+    if {$n < 0 || [string trim $line] eq ""} {
+        return
+    }
+    global PROGRESS_CHAN
+    set job_id [json_get $line "id"]
+    set PROGRESS_CHAN $chan
+    set json [run_job $line]
+    set PROGRESS_CHAN ""
+    if { [catch {
+        puts $chan [format {%c"id":"%s",%s} 123 $job_id [string range $json 1 end]]
+    } err] } {
+        puts "Socket write error: $err"
+    }
+}
+
+puts "Starting Agent"
+# 不再固定等待：事件循环空闲后立即探测 hwi，并开始监听
+after idle write_ready
+if {$SOCKET_PORT > 0} {
+    if { [catch { set SERVER_SOCK [socket -server agent_accept -myaddr 127.0.0.1 $SOCKET_PORT] } err] } {
+        puts "Socket server error: $err"
+        after idle listen
+    } else {
+        puts "Listening on 127.0.0.1:$SOCKET_PORT"
+    }
+} else {
+    after idle listen
+}
@@ -1,4 +1,4 @@
-from typing import Dict, Optional, Any
+from typing import Dict, Optional, Any, List
 from dataclasses import dataclass
 from .db_store import DBStore
 
@@ -28,11 +28,13 @@ class Analyzer:
         self.db = db
 
     def analyze(self, peak_data: Dict[str, Any]) -> AnalysisResult:
+        return self._judge(peak_data, self.db.find_part_by_tags(peak_data.get('tags', {})))
+
+    def _judge(self, peak_data: Dict[str, Any], part: Optional[Dict]) -> AnalysisResult:
         peak_value = peak_data.get('value', 0)
         entity_id = peak_data.get('entity_id', 0)
         coords = tuple(peak_data.get('coords', [0, 0, 0]))
         tags = peak_data.get('tags', {})
-        part = self.db.find_part_by_tags(tags)
         if part is None:
             return AnalysisResult(
                 peak_value=peak_value,
@@ -75,3 +77,8 @@ class Analyzer:
             ratio=ratio,
             message=messages
         )
+
+    def analyze_many(self, peaks: List[Dict[str, Any]]) -> List[AnalysisResult]:
+        """多个热点/分组峰值各自按标签匹配标准后判定，标准查询一次批量完成"""
+        parts = self.db.find_parts_by_tags([p.get('tags', {}) for p in peaks])
+        return [self._judge(p, part) for p, part in zip(peaks, parts)]
@@ -1,42 +1,322 @@
 import sqlite3
 import os
-from typing import Optional, List, Dict
+import re
+import csv
+import json
+import time
+import weakref
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Optional, List, Dict, Tuple, Iterable, Set, Any, Callable, Iterator
+from .tag_rules import RULE_KINDS, TagRuleMatcher, rule_regex
+
+MAP_TYPES = ('component', 'part', 'property')
+IMPORT_MODES = ('insert', 'upsert', 'replace')
 
 
 class DBStore:
-    def __init__(self, db_path: str = "data/standards.db"):
+    """零件标准与分析运行记录
+
+    数据库使用 WAL 日志：读操作在各线程自己的连接上并发执行，不会被写操作阻塞；
+    所有写操作交给一个写线程，排队的写操作合并到一个事务中提交。"""
+
+    def __init__(self, db_path: str = "data/standards.db", index_check_interval: float = 1.0,
+                 busy_timeout: float = 10.0, write_batch_size: int = 500):
         self.db_path = db_path
-        os.makedirs(os.path.dirname(db_path), exist_ok=True)
-        self._init_db()
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        # 其他进程持有写锁时等待的秒数，超时才报 database is locked
+        self.busy_timeout = busy_timeout
+        self.write_batch_size = max(1, write_batch_size)
+        self._write_queue: List[Tuple[Callable[[sqlite3.Connection], Any], Future]] = []
+        self._write_cond = threading.Condition()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_conn: Optional[sqlite3.Connection] = None
+        self._writer_stop = False
+        # 每个线程复用一个读连接；记录 (线程弱引用, 连接) 以便线程结束后回收
+        self._local = threading.local()
+        self._conns: List[Tuple[weakref.ref, sqlite3.Connection]] = []
+        self._conns_lock = threading.Lock()
+        # ((map_type, map_value) -> 零件标准, map_type -> 规则匹配器)，首次查询时整表载入，本对象的写操作使其失效
+        self._index: Optional[Tuple[Dict[Tuple[str, str], Dict], Dict[str, TagRuleMatcher]]] = None
+        self._index_gen = 0
+        self._index_lock = threading.Lock()
+        # 其他进程 (如命令行导入) 对标准的修改通过变更日志的最新序号发现，最多每隔该秒数检查一次
+        self.index_check_interval = index_check_interval
+        self._index_seq = 0
+        self._write(self._init_db)
 
     def _get_conn(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(self.db_path)
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            return conn
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, check_same_thread=False)
         conn.row_factory = sqlite3.Row
+        self._local.conn = conn
+        self._local.checked = 0.0
+        with self._conns_lock:
+            alive = []
+            for thread_ref, c in self._conns:
+                thread = thread_ref()
+                if thread is not None and thread.is_alive():
+                    alive.append((thread_ref, c))
+                else:
+                    c.close()
+            alive.append((weakref.ref(threading.current_thread()), conn))
+            self._conns = alive
         return conn
 
-    def _init_db(self):
+    def close(self):
+        """等待排队的写操作提交后关闭写线程和所有线程的连接；之后的调用会重新建立连接"""
+        with self._write_cond:
+            writer = self._writer
+            self._writer_stop = True
+            self._write_cond.notify_all()
+        if writer is not None and writer is not threading.current_thread():
+            writer.join()
+        with self._conns_lock:
+            conns, self._conns = self._conns, []
+        for _, conn in conns:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
+    def _write(self, fn: Callable[[sqlite3.Connection], Any], wait: bool = True) -> Any:
+        """在写线程中执行 fn(conn) 并等待提交，返回 fn 的返回值或抛出其异常；wait=False 时返回 Future
+
+        fn 不能自行 commit：同一批的写操作共用一个事务，各自包在 SAVEPOINT 中，一个失败不影响其他。"""
+        future: Future = Future()
+        with self._write_cond:
+            if self._writer is threading.current_thread():
+                # 写线程内的嵌套写操作直接并入当前事务
+                return fn(self._writer_conn)
+            self._write_queue.append((fn, future))
+            if self._writer is None:
+                self._writer_stop = False
+                self._writer = threading.Thread(target=self._writer_loop, name="db-writer", daemon=True)
+                self._writer.start()
+            self._write_cond.notify()
+        return future.result() if wait else future
+
+    def _writer_loop(self):
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        # WAL 模式写入数据库文件，对之后所有连接生效；synchronous=NORMAL 在 WAL 下不会损坏数据库
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        self._writer_conn = conn
+        try:
+            while True:
+                with self._write_cond:
+                    while not self._write_queue and not self._writer_stop:
+                        self._write_cond.wait()
+                    if not self._write_queue:
+                        self._writer = None
+                        return
+                    batch = self._write_queue[:self.write_batch_size]
+                    del self._write_queue[:len(batch)]
+                self._commit_batch(conn, batch)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _commit_batch(conn: sqlite3.Connection, batch: List[Tuple[Callable[[sqlite3.Connection], Any], Future]]):
+        """一个事务提交一批写操作；提交成功后才通知各调用方"""
+        batch = [(fn, future) for fn, future in batch if future.set_running_or_notify_cancel()]
+        outcomes = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for fn, future in batch:
+                conn.execute('SAVEPOINT write_op')
+                try:
+                    outcomes.append((future, fn(conn), None))
+                except Exception as e:
+                    conn.execute('ROLLBACK TO write_op')
+                    outcomes.append((future, None, e))
+                conn.execute('RELEASE write_op')
+            conn.execute('COMMIT')
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for future, value, error in outcomes:
+            if error is None:
+                future.set_result(value)
+            else:
+                future.set_exception(error)
+
+    def _invalidate_index(self):
+        with self._index_lock:
+            self._index = None
+            self._index_gen += 1
+
+    def _check_external_writes(self, conn: sqlite3.Connection):
+        # 运行记录的写入很频繁，不能用 data_version (任何提交都会改变)；只看标准变更日志
+        now = time.monotonic()
+        if now - self._local.checked < self.index_check_interval:
+            return
+        self._local.checked = now
+        if self._index is not None and self._change_seq(conn) != self._index_seq:
+            self._invalidate_index()
+
+    def _mapping_index(self) -> Tuple[Dict[Tuple[str, str], Dict], Dict[str, TagRuleMatcher]]:
+        conn = self._get_conn()
+        self._check_external_writes(conn)
+        index = self._index
+        if index is not None:
+            return index
+        with self._index_lock:
+            gen = self._index_gen
+        seq = self._change_seq(conn)
+        rows = conn.execute('''
+            SELECT m.map_type AS _map_type, m.map_value AS _map_value, p.* FROM mapping m
+            JOIN parts p ON p.part_no = m.part_no
+        ''').fetchall()
+        exact = {}
+        for row in rows:
+            part = dict(row)
+            exact[(part.pop('_map_type'), part.pop('_map_value'))] = part
+        rules: Dict[str, List[Dict[str, Any]]] = {}
+        for row in conn.execute('''
+            SELECT r.id AS _id, r.map_type AS _map_type, r.kind AS _kind, r.pattern AS _pattern,
+                   r.priority AS _priority, p.* FROM mapping_rules r
+            JOIN parts p ON p.part_no = r.part_no
+        ''').fetchall():
+            part = dict(row)
+            rule = {k[1:]: part.pop(k) for k in ('_id', '_map_type', '_kind', '_pattern', '_priority')}
+            rule['part'] = part
+            rules.setdefault(rule['map_type'], []).append(rule)
+        index = exact, {map_type: TagRuleMatcher(type_rules) for map_type, type_rules in rules.items()}
+        with self._index_lock:
+            # 载入期间发生写操作时不缓存，下次查询重新载入
+            if self._index_gen == gen:
+                self._index = index
+                self._index_seq = seq
+        return index
+
+    def _init_db(self, conn: sqlite3.Connection):
         """初始化数据库表"""
-        with self._get_conn() as conn:
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS parts (
-                    part_no TEXT PRIMARY KEY,
-                    allowable_vm REAL NOT NULL,
-                    safety_factor REAL DEFAULT 1.0,
-                    units TEXT DEFAULT 'MPa',
-                    name TEXT,
-                    notes TEXT
-                )
-            ''')
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS mapping(
-                    map_type TEXT NOT NULL,
-                    map_value TEXT NOT NULL,
-                    part_no TEXT NOT NULL,
-                    PRIMARY KEY (map_type,map_value),
-                    FOREIGN KEY (part_no) REFERENCES parts(part_no)
-                )
-            ''')
-            conn.commit()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS parts (
+                part_no TEXT PRIMARY KEY,
+                allowable_vm REAL NOT NULL,
+                safety_factor REAL DEFAULT 1.0,
+                units TEXT DEFAULT 'MPa',
+                name TEXT,
+                notes TEXT
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS mapping(
+                map_type TEXT NOT NULL,
+                map_value TEXT NOT NULL,
+                part_no TEXT NOT NULL,
+                PRIMARY KEY (map_type,map_value),
+                FOREIGN KEY (part_no) REFERENCES parts(part_no)
+            )
+        ''')
+        # 每次分析保存 agent 返回的原始峰值，标准变更后可直接重新判定，无需再跑 HyperView
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS runs(
+                run_dir TEXT PRIMARY KEY,
+                model_path TEXT,
+                result_path TEXT,
+                payload TEXT NOT NULL,
+                passed INTEGER,
+                created_at TEXT,
+                evaluated_at TEXT
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS run_tags(
+                run_dir TEXT NOT NULL,
+                map_type TEXT NOT NULL,
+                map_value TEXT NOT NULL,
+                PRIMARY KEY (run_dir, map_type, map_value)
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_run_tags_value ON run_tags(map_type, map_value)')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS run_parts(
+                run_dir TEXT NOT NULL,
+                part_no TEXT NOT NULL,
+                PRIMARY KEY (run_dir, part_no)
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_run_parts_part ON run_parts(part_no)')
+        # 标准变更日志：零件 (part_no) 或映射 (map_type, map_value) 每次修改追加一行
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS standard_changes(
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                part_no TEXT,
+                map_type TEXT,
+                map_value TEXT,
+                changed_at TEXT
+            )
+        ''')
+        conn.execute('CREATE TABLE IF NOT EXISTS meta(key TEXT PRIMARY KEY, value TEXT)')
+        # 前缀/通配/正则映射规则，精确映射都未命中时才使用；rule 列记录变更的规则 (kind:pattern)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS mapping_rules(
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                map_type TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                pattern TEXT NOT NULL,
+                part_no TEXT NOT NULL,
+                priority INTEGER NOT NULL DEFAULT 100,
+                UNIQUE (map_type, kind, pattern),
+                FOREIGN KEY (part_no) REFERENCES parts(part_no)
+            )
+        ''')
+        self._add_columns(conn, 'standard_changes', {'rule': 'TEXT'})
+        # 分析历史：每次运行的输入文件指纹和耗时记在 runs 上，每个判定结果 (热点/分组) 一行
+        self._add_columns(conn, 'runs', {'fingerprints': 'TEXT', 'timings': 'TEXT'})
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_runs_created ON runs(created_at)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_runs_passed ON runs(passed, created_at)')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS run_results(
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                run_dir TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                part_no TEXT,
+                part_name TEXT,
+                passed INTEGER NOT NULL,
+                ratio REAL,
+                margin REAL,
+                peak_value REAL,
+                peak_entity_id INTEGER,
+                allowable REAL,
+                tags TEXT,
+                message TEXT
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_run_results_run ON run_results(run_dir)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_run_results_part ON run_results(part_no, passed, created_at)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_run_results_passed ON run_results(passed, created_at)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_run_results_ratio ON run_results(ratio)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_run_results_created ON run_results(created_at)')
+
+    @staticmethod
+    def _add_columns(conn: sqlite3.Connection, table: str, columns: Dict[str, str]):
+        """旧数据库升级：补上表中缺少的列"""
+        existing = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+        for name, decl in columns.items():
+            if name not in existing:
+                conn.execute(f'ALTER TABLE {table} ADD COLUMN {name} {decl}')
+
+    @staticmethod
+    def _change_seq(conn: sqlite3.Connection) -> int:
+        return conn.execute('SELECT COALESCE(MAX(seq), 0) FROM standard_changes').fetchone()[0]
+
+    @staticmethod
+    def _record_change(conn: sqlite3.Connection, part_no: Optional[str] = None,
+                       map_type: Optional[str] = None, map_value: Optional[str] = None, rule: Optional[str] = None):
+        conn.execute('INSERT INTO standard_changes (part_no, map_type, map_value, changed_at, rule) VALUES (?,?,?,?,?)',
+                     (part_no, map_type, map_value, datetime.now().isoformat(timespec='seconds'), rule))
 
     def get_all_parts(self) -> List[Dict]:
         """获取所有零件标准"""
@@ -52,12 +332,15 @@ class DBStore:
 
     def add_part(self, part_no: str, allowable_vm: float, safety_factor: float = 1.0, units: str = 'MPa', name: str = '', notes: str = ''):
         """添加零件标准"""
+        def write(conn: sqlite3.Connection):
+            conn.execute('''
+                INSERT INTO parts (part_no, allowable_vm, safety_factor, units, name, notes) VALUES (?,?,?,?,?,?)
+            ''', (part_no, allowable_vm, safety_factor, units, name, notes))
+            self._record_change(conn, part_no=part_no)
         try:
-            with self._get_conn() as conn:
-                conn.execute('''
-                    INSERT INTO parts (part_no, allowable_vm, safety_factor, units, name, notes) VALUES (?,?,?,?,?,?)
-                ''', (part_no, allowable_vm, safety_factor, units, name, notes))
-                conn.commit()
+            self._write(write)
+            # 已有映射可能指向此前不存在的零件
+            self._invalidate_index()
             return True
         except sqlite3.IntegrityError:
             return False
@@ -70,16 +353,28 @@ class DBStore:
             return False
         set_clause = ','.join(f'{k}=?' for k in updates)
         values = list(updates.values()) + [part_no]
-        with self._get_conn() as conn:
+
+        def write(conn: sqlite3.Connection):
             conn.execute(f'UPDATE parts SET {set_clause} WHERE part_no=?', values)
-            conn.commit()
+            # 名称/单位也会写进报告，并且其他进程靠变更日志发现索引过期，所以任何修改都记录
+            self._record_change(conn, part_no=part_no)
+        self._write(write)
+        self._invalidate_index()
         return True
 
     def delete_part(self, part_no: str) -> bool:
-        with self._get_conn() as conn:
+        def write(conn: sqlite3.Connection):
+            for row in conn.execute('SELECT map_type, map_value FROM mapping WHERE part_no=?', (part_no,)).fetchall():
+                self._record_change(conn, part_no, row['map_type'], row['map_value'])
             conn.execute('DELETE FROM mapping WHERE part_no=?', (part_no,))
+            for row in conn.execute('SELECT map_type, kind, pattern FROM mapping_rules WHERE part_no=?',
+                                    (part_no,)).fetchall():
+                self._record_change(conn, part_no, row['map_type'], rule=f"{row['kind']}:{row['pattern']}")
+            conn.execute('DELETE FROM mapping_rules WHERE part_no=?', (part_no,))
             conn.execute('DELETE FROM parts WHERE part_no=?', (part_no,))
-            conn.commit()
+            self._record_change(conn, part_no=part_no)
+        self._write(write)
+        self._invalidate_index()
         return True
 
     """Mapping操作"""
@@ -92,35 +387,301 @@ class DBStore:
     def add_mapping(self, map_type: str, map_value: str, part_no: str) -> bool:
         if map_type not in ('component', 'part', 'property'):
             return False
+        def write(conn: sqlite3.Connection):
+            conn.execute('INSERT INTO mapping VALUES (?,?,?)', (map_type, map_value, part_no))
+            self._record_change(conn, part_no, map_type, map_value)
         try:
-            with self._get_conn() as conn:
-                conn.execute('INSERT INTO mapping VALUES (?,?,?)', (map_type, map_value, part_no))
-                conn.commit()
+            self._write(write)
+            self._invalidate_index()
             return True
         except sqlite3.IntegrityError:
             return False
 
     def delete_mapping(self, map_type: str, map_value: str) -> bool:
-        with self._get_conn() as conn:
+        def write(conn: sqlite3.Connection):
             conn.execute('DELETE FROM mapping WHERE map_type=? AND map_value=?', (map_type, map_value))
-            conn.commit()
+            self._record_change(conn, map_type=map_type, map_value=map_value)
+        self._write(write)
+        self._invalidate_index()
         return True
 
     def find_part_by_tags(self, tags: Dict[str, str]) -> Optional[Dict]:
-        priority = ['component', 'part', 'property']
-        with self._get_conn() as conn:
-            for map_type in priority:
-                if map_type in tags and tags[map_type]:
-                    row = conn.execute('''
-                        SELECT p.* FROM parts p JOIN mapping m ON p.part_no =m.part_no
-                        WHERE m.map_type=? AND m.map_value=?
-                    ''', (map_type, tags[map_type])).fetchone()
-                    if row:
-                        return dict(row)
+        """按 component > part > property 的优先级匹配零件标准，查内存索引
+
+        先查精确映射 (哈希)，都未命中时再按同样的类型顺序查前缀/通配/正则规则。"""
+        exact, matchers = self._mapping_index()
+        return self._lookup(exact, matchers, tags)
+
+    def find_parts_by_tags(self, tags_list: List[Dict[str, str]]) -> List[Optional[Dict]]:
+        """批量版 find_part_by_tags，整批共用一次索引检查"""
+        exact, matchers = self._mapping_index()
+        return [self._lookup(exact, matchers, tags) for tags in tags_list]
+
+    @staticmethod
+    def _lookup(exact: Dict[Tuple[str, str], Dict], matchers: Dict[str, TagRuleMatcher],
+                tags: Dict[str, str]) -> Optional[Dict]:
+        for map_type in MAP_TYPES:
+            value = tags.get(map_type)
+            if value:
+                part = exact.get((map_type, str(value)))
+                if part is not None:
+                    return dict(part)
+        if not matchers:
+            return None
+        for map_type in MAP_TYPES:
+            value = tags.get(map_type)
+            matcher = matchers.get(map_type)
+            if value and matcher is not None:
+                rule = matcher.match(str(value))
+                if rule is not None:
+                    return dict(rule['part'])
         return None
 
+    """映射规则"""
+
+    def get_mapping_rules(self) -> List[Dict]:
+        with self._get_conn() as conn:
+            rows = conn.execute('SELECT * FROM mapping_rules ORDER BY map_type, priority, kind, pattern').fetchall()
+            return [dict(r) for r in rows]
+
+    def add_mapping_rule(self, map_type: str, kind: str, pattern: str, part_no: str, priority: int = 100) -> bool:
+        """添加前缀 (prefix)、通配 (glob，如 BRKT_*) 或正则 (regex，整串匹配) 映射规则
+
+        同一值命中多条规则时 priority 小者优先，相同时 prefix > glob > regex，前缀长者优先。
+        类型非法、正则无法编译或规则已存在时返回 False。"""
+        if map_type not in MAP_TYPES or kind not in RULE_KINDS or not pattern:
+            return False
+        try:
+            rule_regex(kind, pattern)
+        except re.error:
+            return False
+
+        def write(conn: sqlite3.Connection):
+            conn.execute('INSERT INTO mapping_rules (map_type, kind, pattern, part_no, priority) VALUES (?,?,?,?,?)',
+                         (map_type, kind, pattern, part_no, int(priority)))
+            self._record_change(conn, part_no, map_type, rule=f"{kind}:{pattern}")
+        try:
+            self._write(write)
+            self._invalidate_index()
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+    def delete_mapping_rule(self, rule_id: int) -> bool:
+        def write(conn: sqlite3.Connection) -> bool:
+            row = conn.execute('SELECT * FROM mapping_rules WHERE id=?', (rule_id,)).fetchone()
+            if row is None:
+                return False
+            conn.execute('DELETE FROM mapping_rules WHERE id=?', (rule_id,))
+            self._record_change(conn, row['part_no'], row['map_type'], rule=f"{row['kind']}:{row['pattern']}")
+            return True
+        deleted = self._write(write)
+        self._invalidate_index()
+        return deleted
+
+    """分析运行记录"""
+
+    def save_run(self, run_dir: str, model_path: str, result_path: str, payload: Dict[str, Any],
+                 tags: Iterable[Tuple[str, str]], part_nos: Iterable[str], passed: bool,
+                 results: Iterable[Dict[str, Any]] = (), fingerprints: Optional[Dict[str, str]] = None,
+                 timings: Optional[Dict[str, Any]] = None):
+        """保存一次分析的原始峰值、涉及的标签/零件和各判定结果，重复保存同一运行目录时覆盖
+
+        results 为 AnalysisResult 的字典形式；fingerprints/timings 为输入文件指纹和各阶段耗时。"""
+        now = datetime.now().isoformat(timespec='seconds')
+        row = (run_dir, model_path, result_path, json.dumps(payload, ensure_ascii=False), int(passed), now, now,
+               json.dumps(fingerprints or {}), json.dumps(timings or {}))
+        tags, part_nos, results = list(tags), list(part_nos), list(results)
+
+        def write(conn: sqlite3.Connection):
+            conn.execute('''
+                INSERT OR REPLACE INTO runs (run_dir, model_path, result_path, payload, passed, created_at, evaluated_at,
+                                             fingerprints, timings)
+                VALUES (?,?,?,?,?,?,?,?,?)
+            ''', row)
+            self._save_run_links(conn, run_dir, tags, part_nos)
+            self._save_run_results(conn, run_dir, now, results)
+        self._write(write)
+
+    @staticmethod
+    def _save_run_links(conn: sqlite3.Connection, run_dir: str, tags: Iterable[Tuple[str, str]],
+                        part_nos: Iterable[str]):
+        conn.execute('DELETE FROM run_tags WHERE run_dir=?', (run_dir,))
+        conn.execute('DELETE FROM run_parts WHERE run_dir=?', (run_dir,))
+        conn.executemany('INSERT OR IGNORE INTO run_tags VALUES (?,?,?)', [(run_dir, t, v) for t, v in tags])
+        conn.executemany('INSERT OR IGNORE INTO run_parts VALUES (?,?)', [(run_dir, p) for p in part_nos if p])
+
+    @staticmethod
+    def _save_run_results(conn: sqlite3.Connection, run_dir: str, created_at: str, results: Iterable[Dict[str, Any]]):
+        conn.execute('DELETE FROM run_results WHERE run_dir=?', (run_dir,))
+        conn.executemany('''
+            INSERT INTO run_results (run_dir, created_at, part_no, part_name, passed, ratio, margin, peak_value,
+                                     peak_entity_id, allowable, tags, message)
+            VALUES (?,?,?,?,?,?,?,?,?,?,?,?)
+        ''', [(run_dir, created_at, r.get('part_no'), r.get('part_name'), int(bool(r.get('passed'))), r.get('ratio'),
+               r.get('margin'), r.get('peak_value'), r.get('peak_entity_id'), r.get('allowable'),
+               json.dumps(r.get('tags') or {}, ensure_ascii=False), r.get('message')) for r in results])
+
+    def update_run_verdicts(self, verdicts: List[Tuple[str, bool, List[Dict[str, Any]]]]):
+        """重新判定后批量更新 (run_dir, passed, 各判定结果的字典)"""
+        now = datetime.now().isoformat(timespec='seconds')
+
+        def write(conn: sqlite3.Connection):
+            conn.executemany('UPDATE runs SET passed=?, evaluated_at=? WHERE run_dir=?',
+                             [(int(passed), now, run_dir) for run_dir, passed, _ in verdicts])
+            for run_dir, _, results in verdicts:
+                conn.execute('DELETE FROM run_parts WHERE run_dir=?', (run_dir,))
+                conn.executemany('INSERT OR IGNORE INTO run_parts VALUES (?,?)',
+                                 [(run_dir, r['part_no']) for r in results if r.get('part_no')])
+                row = conn.execute('SELECT created_at FROM runs WHERE run_dir=?', (run_dir,)).fetchone()
+                self._save_run_results(conn, run_dir, row[0] if row and row[0] else now, results)
+        self._write(write)
+
+    def get_runs(self, run_dirs: List[str]) -> List[Dict]:
+        """按运行目录读取运行记录，payload 解析为字典"""
+        runs = []
+        with self._get_conn() as conn:
+            for i in range(0, len(run_dirs), 500):
+                chunk = run_dirs[i:i + 500]
+                rows = conn.execute(f'SELECT * FROM runs WHERE run_dir IN ({",".join("?" * len(chunk))})',
+                                    chunk).fetchall()
+                for row in rows:
+                    run = dict(row)
+                    run['payload'] = json.loads(run['payload'])
+                    runs.append(run)
+        return runs
+
+    @staticmethod
+    def _history_filter(part_no: Optional[str], passed: Optional[bool], since: Any, until: Any,
+                        min_ratio: Optional[float]) -> Tuple[str, list]:
+        """run_results 的查询条件；since/until 为日期时间或 ISO 字符串，until 不含"""
+        clauses, params = [], []
+        if part_no is not None:
+            clauses.append('part_no=?')
+            params.append(part_no)
+        if passed is not None:
+            clauses.append('passed=?')
+            params.append(int(passed))
+        for op, value in (('>=', since), ('<', until)):
+            if value is not None:
+                clauses.append(f'created_at{op}?')
+                params.append(value.isoformat(timespec='seconds') if isinstance(value, datetime) else str(value))
+        if min_ratio is not None:
+            clauses.append('ratio>=?')
+            params.append(min_ratio)
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def query_results(self, part_no: Optional[str] = None, passed: Optional[bool] = None, since: Any = None,
+                      until: Any = None, min_ratio: Optional[float] = None, order_by: str = 'date',
+                      limit: int = 100, offset: int = 0) -> Dict[str, Any]:
+        """分页查询历史判定结果 (每个热点/分组一行)
+
+        order_by: date 按时间倒序，ratio 按应力比倒序。返回 {'items', 'total', 'limit', 'offset'}。"""
+        where, params = self._history_filter(part_no, passed, since, until, min_ratio)
+        order = {'date': 'created_at DESC, id DESC', 'ratio': 'ratio DESC, id DESC'}[order_by]
+        with self._get_conn() as conn:
+            total = conn.execute(f'SELECT COUNT(*) FROM run_results{where}', params).fetchone()[0]
+            rows = conn.execute(f'''
+                SELECT r.*, runs.model_path, runs.result_path FROM
+                    (SELECT * FROM run_results{where} ORDER BY {order} LIMIT ? OFFSET ?) r
+                LEFT JOIN runs ON runs.run_dir = r.run_dir ORDER BY {order}
+            ''', params + [limit, offset]).fetchall()
+        items = []
+        for row in rows:
+            item = dict(row)
+            item['passed'] = bool(item['passed'])
+            item['tags'] = json.loads(item['tags'] or '{}')
+            items.append(item)
+        return {'items': items, 'total': total, 'limit': limit, 'offset': offset}
+
+    def query_runs(self, part_no: Optional[str] = None, passed: Optional[bool] = None, since: Any = None,
+                   until: Any = None, min_ratio: Optional[float] = None, limit: int = 100,
+                   offset: int = 0) -> Dict[str, Any]:
+        """分页查询有判定结果满足条件的运行，按时间倒序；如 part_no='X', passed=False, since=本月一日
+        即为本月零件 X 不通过的运行。每项附带运行内的最大应力比 max_ratio。"""
+        where, params = self._history_filter(part_no, passed, since, until, min_ratio)
+        with self._get_conn() as conn:
+            total = conn.execute(f'SELECT COUNT(DISTINCT run_dir) FROM run_results{where}', params).fetchone()[0]
+            rows = conn.execute(f'''
+                SELECT runs.run_dir, runs.model_path, runs.result_path, runs.passed, runs.created_at,
+                       runs.evaluated_at, runs.fingerprints, runs.timings, r.max_ratio
+                FROM (SELECT run_dir, MAX(created_at) AS created_at, MAX(ratio) AS max_ratio
+                      FROM run_results{where} GROUP BY run_dir ORDER BY created_at DESC, run_dir DESC
+                      LIMIT ? OFFSET ?) r
+                JOIN runs ON runs.run_dir = r.run_dir
+                ORDER BY r.created_at DESC, r.run_dir DESC
+            ''', params + [limit, offset]).fetchall()
+        items = []
+        for row in rows:
+            item = dict(row)
+            item['passed'] = None if item['passed'] is None else bool(item['passed'])
+            item['fingerprints'] = json.loads(item['fingerprints'] or '{}')
+            item['timings'] = json.loads(item['timings'] or '{}')
+            items.append(item)
+        return {'items': items, 'total': total, 'limit': limit, 'offset': offset}
+
+    def last_change_seq(self) -> int:
+        return self._change_seq(self._get_conn())
+
+    def changes_since(self, seq: int) -> Tuple[Set[str], Set[Tuple[str, str]]]:
+        """seq 之后变更过的零件编号和映射键；变更的规则展开为运行记录中被它命中的标签值"""
+        part_nos, mapping_keys = set(), set()
+        rules: Dict[str, List[Dict[str, Any]]] = {}
+        with self._get_conn() as conn:
+            rows = conn.execute('SELECT part_no, map_type, map_value, rule FROM standard_changes WHERE seq>?',
+                                (seq,)).fetchall()
+            for row in rows:
+                if row['part_no']:
+                    part_nos.add(row['part_no'])
+                if row['rule']:
+                    kind, pattern = row['rule'].split(':', 1)
+                    type_rules = rules.setdefault(row['map_type'], [])
+                    type_rules.append({'id': len(type_rules), 'kind': kind, 'pattern': pattern, 'priority': 0})
+                elif row['map_type']:
+                    mapping_keys.add((row['map_type'], row['map_value']))
+            for map_type, type_rules in rules.items():
+                matcher = TagRuleMatcher(type_rules)
+                values = conn.execute('SELECT DISTINCT map_value FROM run_tags WHERE map_type=?', (map_type,))
+                mapping_keys.update((map_type, r[0]) for r in values if matcher.match(r[0]) is not None)
+        return part_nos, mapping_keys
+
+    def affected_runs(self, part_nos: Iterable[str], mapping_keys: Iterable[Tuple[str, str]]) -> List[str]:
+        """判定结果可能受影响的运行：曾匹配到变更零件、含有变更映射的标签，或标签当前映射到变更零件"""
+        part_nos = sorted(set(part_nos))
+        by_type: Dict[str, List[str]] = {}
+        for map_type, map_value in set(mapping_keys):
+            by_type.setdefault(map_type, []).append(map_value)
+        run_dirs: Set[str] = set()
+        with self._get_conn() as conn:
+            for i in range(0, len(part_nos), 500):
+                chunk = part_nos[i:i + 500]
+                marks = ','.join('?' * len(chunk))
+                rows = conn.execute(f'''
+                    SELECT run_dir FROM run_parts WHERE part_no IN ({marks})
+                    UNION
+                    SELECT t.run_dir FROM run_tags t JOIN mapping m
+                        ON m.map_type = t.map_type AND m.map_value = t.map_value
+                    WHERE m.part_no IN ({marks})
+                ''', chunk + chunk).fetchall()
+                run_dirs.update(r[0] for r in rows)
+            for map_type, values in by_type.items():
+                for i in range(0, len(values), 500):
+                    chunk = values[i:i + 500]
+                    rows = conn.execute(f'''
+                        SELECT DISTINCT run_dir FROM run_tags WHERE map_type=? AND map_value IN ({','.join('?' * len(chunk))})
+                    ''', [map_type] + chunk).fetchall()
+                    run_dirs.update(r[0] for r in rows)
+        return sorted(run_dirs)
+
+    def get_meta(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        with self._get_conn() as conn:
+            row = conn.execute('SELECT value FROM meta WHERE key=?', (key,)).fetchone()
+            return row[0] if row else default
+
+    def set_meta(self, key: str, value: str):
+        self._write(lambda conn: conn.execute('INSERT OR REPLACE INTO meta VALUES (?,?)', (key, value)))
+
     def export_parts_csv(self, filepath: str):
-        import csv
         parts = self.get_all_parts()
         if not parts:
             return
@@ -129,19 +690,170 @@ class DBStore:
             writer.writeheader()
             writer.writerows(parts)
 
-    def import_parts_csv(self, filepath: str) -> int:
-        import csv
-        count = 0
-        with open(filepath, 'r', encoding='utf-8-sig') as f:
+    def import_parts_csv(self, filepath: str, mode: str = 'insert') -> int:
+        """导入零件标准 CSV，返回新增和更新的数量；逐行错误见 import_parts_bulk 的报告"""
+        report = self.import_parts_bulk(filepath, mode)
+        return report['inserted'] + report['updated']
+
+    @staticmethod
+    def _csv_chunks(filepath: str, parse: Callable[[Dict], tuple], report: Dict[str, Any],
+                    chunk_size: int) -> Iterator[List[Tuple[int, tuple]]]:
+        """逐块读取 CSV 并解析为 (行号, 参数元组)；解析失败的行记入报告后跳过"""
+        chunk = []
+        with open(filepath, 'r', encoding='utf-8-sig', newline='') as f:
             reader = csv.DictReader(f)
-            for row in reader:
-                if self.add_part(
-                    row['part_no'],
-                    float(row['allowable_vm']),
-                    float(row.get('safety_factor', 1.0)),
-                    row.get('units', 'MPa'),
-                    row.get('name', ''),
-                    row.get('notes', '')
-                ):
-                    count += 1
-        return count
+            try:
+                for row in reader:
+                    try:
+                        chunk.append((reader.line_num, parse(row)))
+                    except ValueError as e:
+                        report['errors'].append({'line': reader.line_num, 'error': str(e), 'row': row})
+                    if len(chunk) >= chunk_size:
+                        yield chunk
+                        chunk = []
+            except csv.Error as e:
+                report['errors'].append({'line': reader.line_num, 'error': f"CSV format error: {e}", 'row': None})
+        if chunk:
+            yield chunk
+
+    @staticmethod
+    def _parse_float(row: Dict, field: str, default: Optional[float] = None) -> float:
+        text = (row.get(field) or '').strip()
+        if not text:
+            if default is None:
+                raise ValueError(f"missing {field}")
+            return default
+        try:
+            value = float(text)
+        except ValueError:
+            raise ValueError(f"invalid {field}: {text!r}")
+        if not value > 0:
+            raise ValueError(f"{field} must be positive: {text!r}")
+        return value
+
+    def _parse_part_row(self, row: Dict) -> tuple:
+        part_no = (row.get('part_no') or '').strip()
+        if not part_no:
+            raise ValueError("missing part_no")
+        return (part_no, self._parse_float(row, 'allowable_vm'), self._parse_float(row, 'safety_factor', 1.0),
+                (row.get('units') or '').strip() or 'MPa', row.get('name') or '', row.get('notes') or '')
+
+    def import_parts_bulk(self, filepath: str, mode: str = 'insert', chunk_size: int = 5000) -> Dict[str, Any]:
+        """在一个事务中批量导入零件标准 CSV
+
+        mode: insert 跳过已存在的零件；upsert 更新已存在的零件；replace 先清空零件表再导入，
+        指向不在新零件表中的零件的映射和映射规则一并删除 (数量记入 orphans_removed)。
+        格式错误的行记入 errors (行号、原因、原始行) 后继续；数据库错误或文件无法读取时整体回滚，aborted=True。"""
+        if mode not in IMPORT_MODES:
+            raise ValueError(f"unknown import mode: {mode}")
+        sql = {
+            'insert': 'INSERT OR IGNORE INTO parts (part_no, allowable_vm, safety_factor, units, name, notes) '
+                      'VALUES (?,?,?,?,?,?)',
+            'upsert': 'INSERT INTO parts (part_no, allowable_vm, safety_factor, units, name, notes) VALUES (?,?,?,?,?,?) '
+                      'ON CONFLICT(part_no) DO UPDATE SET allowable_vm=excluded.allowable_vm, '
+                      'safety_factor=excluded.safety_factor, units=excluded.units, name=excluded.name, '
+                      'notes=excluded.notes',
+            'replace': 'INSERT OR REPLACE INTO parts (part_no, allowable_vm, safety_factor, units, name, notes) '
+                       'VALUES (?,?,?,?,?,?)',
+        }[mode]
+        return self._bulk_import(filepath, mode, chunk_size, self._parse_part_row, sql,
+                                 'SELECT part_no FROM parts', 'DELETE FROM parts',
+                                 key=lambda values: values[0],
+                                 change=lambda values: (values[0], None, None),
+                                 cleanup=self._delete_orphan_mappings)
+
+    def _delete_orphan_mappings(self, conn: sqlite3.Connection) -> int:
+        """删除指向不存在零件的映射和映射规则 (记录变更)，返回删除数量"""
+        mappings = conn.execute('SELECT map_type, map_value, part_no FROM mapping '
+                                'WHERE part_no NOT IN (SELECT part_no FROM parts)').fetchall()
+        for row in mappings:
+            self._record_change(conn, row['part_no'], row['map_type'], row['map_value'])
+        conn.execute('DELETE FROM mapping WHERE part_no NOT IN (SELECT part_no FROM parts)')
+        rules = conn.execute('SELECT map_type, kind, pattern, part_no FROM mapping_rules '
+                             'WHERE part_no NOT IN (SELECT part_no FROM parts)').fetchall()
+        for row in rules:
+            self._record_change(conn, row['part_no'], row['map_type'], rule=f"{row['kind']}:{row['pattern']}")
+        conn.execute('DELETE FROM mapping_rules WHERE part_no NOT IN (SELECT part_no FROM parts)')
+        return len(mappings) + len(rules)
+
+    def _parse_mapping_row(self, row: Dict) -> tuple:
+        map_type = (row.get('map_type') or '').strip()
+        if map_type not in MAP_TYPES:
+            raise ValueError(f"invalid map_type: {map_type!r}")
+        map_value = (row.get('map_value') or '').strip()
+        part_no = (row.get('part_no') or '').strip()
+        if not map_value or not part_no:
+            raise ValueError("missing map_value or part_no")
+        return map_type, map_value, part_no
+
+    def import_mappings_bulk(self, filepath: str, mode: str = 'insert', chunk_size: int = 5000) -> Dict[str, Any]:
+        """批量导入映射 CSV (map_type, map_value, part_no)，模式和报告与 import_parts_bulk 相同；
+        指向不存在零件的映射记为错误行"""
+        if mode not in IMPORT_MODES:
+            raise ValueError(f"unknown import mode: {mode}")
+        sql = {
+            'insert': 'INSERT OR IGNORE INTO mapping (map_type, map_value, part_no) VALUES (?,?,?)',
+            'upsert': 'INSERT INTO mapping (map_type, map_value, part_no) VALUES (?,?,?) '
+                      'ON CONFLICT(map_type, map_value) DO UPDATE SET part_no=excluded.part_no',
+            'replace': 'INSERT OR REPLACE INTO mapping (map_type, map_value, part_no) VALUES (?,?,?)',
+        }[mode]
+        with self._get_conn() as conn:
+            known_parts = {r[0] for r in conn.execute('SELECT part_no FROM parts')}
+
+        def parse(row: Dict) -> tuple:
+            values = self._parse_mapping_row(row)
+            if values[2] not in known_parts:
+                raise ValueError(f"unknown part_no: {values[2]!r}")
+            return values
+        return self._bulk_import(filepath, mode, chunk_size, parse, sql,
+                                 'SELECT map_type, map_value, part_no FROM mapping', 'DELETE FROM mapping',
+                                 key=lambda values: values[:2],
+                                 change=lambda values: (values[2], values[0], values[1]))
+
+    def _bulk_import(self, filepath: str, mode: str, chunk_size: int, parse: Callable[[Dict], tuple], sql: str,
+                     existing_sql: str, clear_sql: str, key: Callable[[tuple], Any],
+                     change: Callable[[tuple], tuple],
+                     cleanup: Optional[Callable[[sqlite3.Connection], int]] = None) -> Dict[str, Any]:
+        report: Dict[str, Any] = {'mode': mode, 'inserted': 0, 'updated': 0, 'skipped': 0, 'errors': [],
+                                  'aborted': False}
+
+        def write(conn: sqlite3.Connection):
+            now = datetime.now().isoformat(timespec='seconds')
+            rows = conn.execute(existing_sql).fetchall()
+            existing = {key(tuple(r)) for r in rows}
+            if mode == 'replace':
+                # 被清掉的记录同样计入变更日志，受影响的运行需要重新判定
+                conn.executemany('INSERT INTO standard_changes (part_no, map_type, map_value, changed_at) '
+                                 'VALUES (?,?,?,?)', [change(tuple(r)) + (now,) for r in rows])
+                conn.execute(clear_sql)
+                existing = set()
+            for chunk in self._csv_chunks(filepath, parse, report, chunk_size):
+                applied = []
+                for _, values in chunk:
+                    k = key(values)
+                    if k not in existing:
+                        report['inserted'] += 1
+                        existing.add(k)
+                    elif mode == 'insert':
+                        report['skipped'] += 1
+                        continue
+                    else:
+                        report['updated'] += 1
+                    applied.append(values)
+                conn.executemany(sql, applied)
+                conn.executemany('INSERT INTO standard_changes (part_no, map_type, map_value, changed_at) '
+                                 'VALUES (?,?,?,?)', [change(values) + (now,) for values in applied])
+            if mode == 'replace' and cleanup is not None:
+                # 同一事务中清理依赖被清掉记录的数据，避免留下孤立的映射
+                report['orphans_removed'] = cleanup(conn)
+        try:
+            self._write(write)
+        except (sqlite3.Error, OSError, ValueError) as e:
+            # ValueError 包括 UnicodeDecodeError (文件不是 UTF-8)
+            kind = "database error" if isinstance(e, sqlite3.Error) else "cannot read file"
+            report.update(inserted=0, updated=0, skipped=0, aborted=True)
+            report.pop('orphans_removed', None)
+            report['errors'].append({'line': None, 'error': f"{kind}, import rolled back: {e}", 'row': None})
+        finally:
+            self._invalidate_index()
+        return report
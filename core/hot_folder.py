@@ -0,0 +1,243 @@
+import os
+import json
+import time
+import fnmatch
+import threading
+from concurrent.futures import Future
+from typing import Optional, Callable, Dict, List, Tuple, Any
+from .logging_util import log_info, log_error
+from .hv_pool import TRANSIENT_ERRORS
+
+# 实例超时/断开或暂时没有可用实例：文件本身没有问题，之后重新提交
+RETRY_ERRORS = TRANSIENT_ERRORS + ('No HyperView worker available',)
+
+
+class HotFolder:
+    """热文件夹：监视求解器输出目录，文件写完 (大小稳定) 后自动匹配模型并交给实例池分析
+
+    共享目录上 inotify 不可靠，这里按 poll_interval 扫描目录。"""
+
+    def __init__(self, orchestrator, dirs: Optional[List[str]] = None, config: Optional[Dict[str, Any]] = None):
+        cfg = dict(orchestrator.config.get('hot_folder', {}))
+        cfg.update(config or {})
+        self.orchestrator = orchestrator
+        self.dirs = [os.path.abspath(d) for d in (dirs if dirs is not None else cfg.get('dirs', []))]
+        self.patterns = cfg.get('patterns', ['*.h3d', '*.op2', '*.rst', '*.d3plot'])
+        self.model_exts = [e.lower() for e in cfg.get('model_exts', ['.fem', '.bdf', '.nas', '.dat', '.h3m', '.k', '.key'])]
+        self.self_contained = [e.lower() for e in cfg.get('self_contained', ['.h3d'])]
+        self.model_dirs = [os.path.abspath(d) for d in cfg.get('model_dirs', [])]
+        self.recursive = cfg.get('recursive', False)
+        self.stable_seconds = cfg.get('stable_seconds', 5)
+        self.poll_interval = cfg.get('poll_interval', 2)
+        self.max_retries = cfg.get('max_retries', 3)
+        self.options = cfg.get('options', {})
+        state_file = cfg.get('state_file', 'workdir/hot_folder.json')
+        self.state_file = state_file if os.path.isabs(state_file) else os.path.join(orchestrator.base_dir, state_file)
+        # path -> (size, mtime_ns, 首次观察到该大小的时间)
+        self._observed: Dict[str, Tuple[int, int, float]] = {}
+        # path -> 已分析版本的指纹，持久化以便重启后不重复分析
+        self._done: Dict[str, str] = self._load_state()
+        self._in_flight: Dict[str, Future] = {}
+        # path -> 因瞬时错误已重新提交的次数
+        self._retries: Dict[str, int] = {}
+        self._unmatched: set = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.on_event: Optional[Callable[[Dict], None]] = None
+
+    def _load_state(self) -> Dict[str, str]:
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self):
+        tmp_file = self.state_file + '.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self._done, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.state_file)
+        except OSError as e:
+            log_error(f"保存热文件夹状态失败:{e}")
+
+    def _emit(self, event: str, **fields):
+        if self.on_event:
+            try:
+                self.on_event({'event': event, **fields})
+            except Exception as e:
+                log_error(f"热文件夹事件回调异常:{e}")
+
+    def _fingerprint(self, path: str, st: os.stat_result) -> str:
+        cache = self.orchestrator.cache
+        if cache is not None:
+            fp = cache.fingerprint(path)
+            if fp:
+                return fp
+        return f"{st.st_size}:{st.st_mtime_ns}"
+
+    def _candidates(self) -> List[str]:
+        paths = []
+        for directory in self.dirs:
+            if self.recursive:
+                walker = ((root, files) for root, _, files in os.walk(directory))
+            else:
+                try:
+                    walker = [(directory, [e.name for e in os.scandir(directory) if e.is_file()])]
+                except OSError as e:
+                    log_error(f"无法扫描目录 {directory}:{e}")
+                    continue
+            for root, files in walker:
+                for name in files:
+                    if any(fnmatch.fnmatch(name.lower(), p.lower()) for p in self.patterns):
+                        paths.append(os.path.join(root, name))
+        return paths
+
+    def _is_stable(self, path: str, st: os.stat_result, now: float) -> bool:
+        """大小和修改时间在 stable_seconds 内不再变化，视为求解器已写完"""
+        observed = self._observed.get(path)
+        if observed is None or observed[:2] != (st.st_size, st.st_mtime_ns):
+            self._observed[path] = (st.st_size, st.st_mtime_ns, now)
+            return False
+        return st.st_size > 0 and now - observed[2] >= self.stable_seconds
+
+    def match_model(self, result_path: str) -> Optional[Tuple[str, str]]:
+        """返回 (model_path, result_path)；h3d 等自带模型的文件直接作为模型加载"""
+        stem, ext = os.path.splitext(result_path)
+        if ext.lower() in self.self_contained:
+            return result_path, ""
+        base = os.path.basename(stem)
+        search_dirs = [os.path.dirname(result_path)] + self.model_dirs
+        for directory in search_dirs:
+            for model_ext in self.model_exts:
+                for candidate in (base + model_ext, base + model_ext.upper()):
+                    path = os.path.join(directory, candidate)
+                    if os.path.isfile(path):
+                        return path, result_path
+        # LS-DYNA 的 d3plot 没有同名模型，目录中只有一个关键字文件时使用它
+        directory = os.path.dirname(result_path)
+        try:
+            keyword_files = [n for n in os.listdir(directory) if os.path.splitext(n)[1].lower() in ('.k', '.key')]
+        except OSError:
+            keyword_files = []
+        if len(keyword_files) == 1:
+            return os.path.join(directory, keyword_files[0]), result_path
+        return None
+
+    def scan_once(self) -> List[str]:
+        """扫描一次，提交所有已写完且未分析过的新文件，返回本次提交的结果文件"""
+        now = time.time()
+        submitted = []
+        ready = []
+        candidates = self._candidates()
+        for path in candidates:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            with self._lock:
+                if path in self._in_flight:
+                    continue
+                done_fp = self._done.get(path)
+            # 已分析且未变化的文件不再跟踪大小变化
+            if done_fp is not None and path not in self._observed and self._fingerprint(path, st) == done_fp:
+                continue
+            if not self._is_stable(path, st, now):
+                continue
+            fp = self._fingerprint(path, st)
+            if done_fp == fp:
+                self._observed.pop(path, None)
+                continue
+            ready.append((st.st_mtime, path, fp))
+        self._prune(set(candidates))
+        # 先写完的先分析
+        for _, path, fp in sorted(ready):
+            pair = self.match_model(path)
+            if pair is None:
+                # 模型文件可能稍后才出现，每个文件只提示一次
+                if path not in self._unmatched:
+                    self._unmatched.add(path)
+                    log_info(f"热文件夹未找到匹配的模型文件:{path}")
+                    self._emit('unmatched', path=path)
+                continue
+            self._unmatched.discard(path)
+            self._submit(path, fp, pair)
+            submitted.append(path)
+        return submitted
+
+    def _prune(self, present: set):
+        """已删除或移走的文件不再占用内存；_done 保留，监视目录暂时不可访问时不会重新分析全部文件"""
+        for path in [p for p in self._observed if p not in present]:
+            del self._observed[path]
+        self._unmatched &= present
+        with self._lock:
+            for path in [p for p in self._retries if p not in present]:
+                del self._retries[path]
+
+    def _submit(self, path: str, fp: str, pair: Tuple[str, str]):
+        model_path, result_path = pair
+        log_info(f"热文件夹提交:{path}")
+        self._emit('queued', path=path, model_path=model_path, result_path=result_path)
+        future = self.orchestrator.submit_analysis(model_path, result_path, with_error=True, **self.options)
+        with self._lock:
+            self._in_flight[path] = future
+        future.add_done_callback(lambda f: self._on_done(path, fp, f))
+
+    def _on_done(self, path: str, fp: str, future: Future):
+        try:
+            output, error = future.result()
+        except Exception as e:
+            output, error = None, str(e)
+            log_error(f"热文件夹分析异常 {path}:{e}")
+        with self._lock:
+            self._in_flight.pop(path, None)
+            attempt = self._retries.get(path, 0) + 1
+            retry = output is None and error in RETRY_ERRORS and attempt <= self.max_retries
+            if retry:
+                # 瞬时错误不记录指纹，下次扫描重新提交
+                self._retries[path] = attempt
+            else:
+                # 成功、文件本身的错误或重试用尽时记录指纹，文件被重新写出后才会再次分析
+                self._retries.pop(path, None)
+                self._done[path] = fp
+                self._observed.pop(path, None)
+                self._save_state()
+        if retry:
+            log_info(f"热文件夹分析失败 ({error})，稍后重试 {attempt}/{self.max_retries}:{path}")
+            self._emit('retry', path=path, attempt=attempt, error=error)
+            return
+        analysis = output['analysis'] if output else None
+        self._emit('done' if output else 'failed', path=path, error=error,
+                   passed=analysis.passed if analysis else None,
+                   peak_value=analysis.peak_value if analysis else None,
+                   report_path=output['report_path'] if output else '')
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._in_flight)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.scan_once()
+            except Exception as e:
+                log_error(f"热文件夹扫描异常:{e}")
+            self._stop.wait(self.poll_interval)
+
+    def start(self):
+        if not self.dirs:
+            log_error("热文件夹未配置监视目录")
+            return
+        if self._thread is None:
+            log_info(f"热文件夹开始监视:{', '.join(self.dirs)}")
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="hot-folder", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval + 1)
+            self._thread = None
@@ -0,0 +1,41 @@
+import os
+import re
+import hashlib
+from typing import Tuple, Optional
+
+# HyperView 端 agent 脚本模板，@NAME@ 占位符在生成时替换为各实例的目录、端口等
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'agent.tcl')
+_PLACEHOLDER = re.compile(r'@([A-Z_]+)@')
+_template: Optional[str] = None
+
+
+def _load_template() -> str:
+    global _template
+    if _template is None:
+        with open(TEMPLATE_PATH, 'r', encoding='utf-8') as f:
+            _template = f.read()
+    return _template
+
+
+def render_agent(ready_file: str, inbox_dir: str, outbox_dir: str, socket_port: int = 0,
+                 max_models: int = 3, max_model_bytes: int = 0) -> Tuple[str, str]:
+    """返回 (脚本内容, 版本号)；socket_port 为 0 时 agent 使用文件传输"""
+    values = {
+        'READY_FILE': ready_file.replace('\\', '/'),
+        'INBOX_DIR': inbox_dir.replace('\\', '/'),
+        'OUTBOX_DIR': outbox_dir.replace('\\', '/'),
+        'SOCKET_PORT': str(socket_port),
+        'MAX_MODELS': str(max_models),
+        'MAX_MODEL_BYTES': str(max_model_bytes),
+    }
+    # 版本号占位符保留到最后：版本号为脚本内容的哈希，attach 时据此判断运行中的 agent 是否为当前版本
+    code = _PLACEHOLDER.sub(lambda m: values.get(m.group(1), m.group(0)), _load_template())
+    version = hashlib.sha1(code.encode('utf-8')).hexdigest()[:12]
+    return code.replace('@AGENT_VERSION@', version), version
+
+
+def write_agent(agent_path: str, code: str) -> str:
+    os.makedirs(os.path.dirname(agent_path), exist_ok=True)
+    with open(agent_path, 'w', encoding='utf-8') as f:
+        f.write(code)
+    return agent_path
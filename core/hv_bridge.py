@@ -2,77 +2,89 @@ import os
 import json
 import time
 import uuid
-import shutil
-from typing import Optional, Dict
-from .logging_util import log_info, log_error, log_debug
+import queue
+import asyncio
+from concurrent.futures import Future
+from typing import Dict, Tuple, List, Optional, Generator
+from .logging_util import log_info, log_error
+from .hv_transport import create_transport, ProgressCallback
+from .hv_watcher import create_dir_watcher
 
 
 class HVBridge:
-    def __init__(self, inbox_dir: str, outbox_dir: str, timeout: float = 300):
+    def __init__(self, inbox_dir: str, outbox_dir: str, timeout: float = 300, watcher: str = 'auto',
+                 transport: str = 'file', port: int = 47321):
         self.inbox_dir = inbox_dir
         self.outbox_dir = outbox_dir
         self.timeout = timeout
         os.makedirs(inbox_dir, exist_ok=True)
         os.makedirs(outbox_dir, exist_ok=True)
+        self._transport_args = (transport, inbox_dir, outbox_dir, watcher, port)
+        self.transport = create_transport(*self._transport_args)
+        self.closed = False
 
     def _generate_job_id(self) -> str:
         return f"{int(time.time()*1000)}_{uuid.uuid4().hex[:8]}"
 
-    def _write_job(self, job_id: str, job_data: Dict) -> str:
-        job_file = os.path.join(self.inbox_dir, f"job_{job_id}.json")
-        tmp_file = job_file + ".tmp"
-        with open(tmp_file, 'w', encoding='utf-8') as f:
-            json.dump(job_data, f, ensure_ascii=False, indent=2)
-        shutil.move(tmp_file, job_file)
-        log_debug(f"写入任务:{job_file}")
-        return job_file
-
-    def _wait_result(self, job_id: str) -> Optional[Dict]:
-        result_file = os.path.join(self.outbox_dir, f"job_{job_id}.result.json")
-        error_file = os.path.join(self.outbox_dir, f"job_{job_id}.error.json")
-        log_debug(f"等待结果文件: {result_file}")
-
-        deadline = time.time() + self.timeout
-        while time.time() < deadline:
-            # 列出outbox目录中的所有文件用于调试
-            try:
-                files = os.listdir(self.outbox_dir)
-                if files:
-                    log_debug(f"outbox目录文件: {files}")
-            except:
-                pass
-
-            if os.path.exists(result_file):
-                time.sleep(0.1)
-                with open(result_file, 'r', encoding='utf-8') as f:
-                    result = json.load(f)
-                log_info(f"收到结果:job_{job_id}")
-                return result
-            if os.path.exists(error_file):
-                time.sleep(0.1)
-                with open(error_file, 'r', encoding='utf-8') as f:
-                    error = json.load(f)
-                log_error(f"任务失败:{error.get('error', 'Unknown error')}")
-                return {'success': False, 'error': error.get('error', 'Unknown error')}
-
-            time.sleep(0.2)
-        log_error(f"任务超时：job_{job_id}")
-        return {'success': False, 'error': 'Timeout'}
-
-    def send_job(self, cmd: str, params: Dict = None) -> Dict:
-        job_id = self._generate_job_id()
+    def _build_job(self, cmd: str, params: Dict = None) -> Dict:
         job_data = {
-            'id': job_id,
+            'id': self._generate_job_id(),
             'cmd': cmd,
             'timestamp': time.time()
         }
         if params:
             job_data.update(params)
-        log_info(f"发送任务:{cmd} (job_{job_id})")
-        self._write_job(job_id, job_data)
-        log_info(f"等待结果:job_{job_id}")
-        result = self._wait_result(job_id)
-        log_debug(f"收到原始结果: {result}")
+        return job_data
+
+    def send_job_async(self, cmd: str, params: Dict = None, timeout: float = None,
+                       on_progress: Optional[ProgressCallback] = None) -> Future:
+        """发送任务后立即返回 Future，结果由传输层按 job id 填充"""
+        job_data = self._build_job(cmd, params)
+        if on_progress is not None:
+            # 告知 agent 逐条上报中间结果
+            job_data['progress'] = 1
+        log_info(f"发送任务:{cmd} (job_{job_data['id']})")
+        return self.transport.send_async(job_data, self.timeout if timeout is None else timeout, on_progress)
+
+    def stream_job(self, cmd: str, params: Dict = None, timeout: float = None) -> Generator[Dict, None, Dict]:
+        """逐条产出 agent 上报的中间结果；生成器结束时的返回值为最终结果"""
+        items: "queue.Queue[Optional[Dict]]" = queue.Queue()
+        future = self.send_job_async(cmd, params, timeout, on_progress=items.put)
+        # 最终结果到达后放入哨兵，保证之前的中间结果都已入队
+        future.add_done_callback(lambda _: items.put(None))
+        while True:
+            item = items.get()
+            if item is None:
+                break
+            # 去掉协议字段，只保留 agent 上报的内容
+            yield {k: v for k, v in item.items() if k not in ('id', 'progress')}
+        result = future.result()
+        return result if result else {'success': False, 'error': 'No response'}
+
+    def send_batch_async(self, jobs: List[Tuple[str, Dict]], timeout: float = None) -> Future:
+        """把多个 (cmd, params) 作为一个批次发送，Future 结果为按顺序排列的结果列表"""
+        job_id = self._generate_job_id()
+        sub_jobs = []
+        for i, (cmd, params) in enumerate(jobs):
+            sub = {'id': f"{job_id}_{i}", 'cmd': cmd}
+            if params:
+                sub.update(params)
+            sub_jobs.append(sub)
+        if timeout is None:
+            timeout = self.timeout * max(1, len(sub_jobs))
+        log_info(f"发送批量任务:{len(sub_jobs)} jobs (job_{job_id})")
+        return self.transport.send_batch_async(job_id, sub_jobs, timeout)
+
+    def send_batch(self, jobs: List[Tuple[str, Dict]], timeout: float = None) -> List[Dict]:
+        return self.send_batch_async(jobs, timeout).result()
+
+    async def send_job_aio(self, cmd: str, params: Dict = None, timeout: float = None) -> Dict:
+        return await asyncio.wrap_future(self.send_job_async(cmd, params, timeout))
+
+    def send_job(self, cmd: str, params: Dict = None, timeout: float = None) -> Dict:
+        future = self.send_job_async(cmd, params, timeout)
+        log_info(f"等待结果:job_{future.job_id}")
+        result = future.result()
         return result if result else {'success': False, 'error': 'No response'}
 
     def clear_inbox(self):
@@ -82,13 +94,26 @@ class HVBridge:
 
     def clear_outbox(self):
         for f in os.listdir(self.outbox_dir):
-            if f.endswith('.json'):
+            if f.endswith(('.json', '.jsonl')):
                 os.remove(os.path.join(self.outbox_dir, f))
 
+    def close(self):
+        self.closed = True
+        self.transport.close()
+
+    def reopen(self):
+        """close 之后重新建立传输层"""
+        if self.closed:
+            self.transport = create_transport(*self._transport_args)
+            self.closed = False
+
 
 class ReadySignal:
-    def __init__(self, ready_file: str):
+    """agent 就绪标志文件；agent 在 hwi 可用后写入启动时间信息"""
+
+    def __init__(self, ready_file: str, watcher: str = 'auto'):
         self.ready_file = ready_file
+        self.watcher = watcher
 
     def clear(self):
         if os.path.exists(self.ready_file):
@@ -97,15 +122,29 @@ class ReadySignal:
             except PermissionError:
                 pass
 
-    def wait(self, timeout: float = 120, interval: float = 0.5) -> bool:
-        deadline = time.time() + timeout
-        while time.time() < deadline:
-            if os.path.exists(self.ready_file):
-                log_info("Hyperview Agent Ready")
-                return True
-            time.sleep(interval)
+    def wait(self, timeout: float = 120, interval: float = 0.2) -> bool:
+        """等待 ready 文件出现；有 inotify 时由文件事件唤醒，否则按 interval 轮询"""
+        ready_dir = os.path.dirname(self.ready_file)
+        os.makedirs(ready_dir, exist_ok=True)
+        watcher = create_dir_watcher(ready_dir, self.watcher, interval)
+        try:
+            found = watcher.wait_for([self.ready_file], timeout)
+        finally:
+            watcher.stop()
+        if found:
+            log_info("Hyperview Agent Ready")
+            return True
         log_error("等待 HyperView Agent OverTime")
         return False
 
+    def info(self) -> Dict:
+        """读取 agent 写入的启动信息 (pid, 各阶段时间戳)；旧版本 agent 只写 ready，返回空字典"""
+        try:
+            with open(self.ready_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
     def is_ready(self) -> bool:
         return os.path.exists(self.ready_file)
@@ -0,0 +1,264 @@
+import os
+import time
+import threading
+from enum import Enum, auto
+from contextlib import contextmanager
+from typing import Optional, Callable, Dict, List, Iterator
+from .hv_process import HVProcess
+from .hv_bridge import HVBridge, ReadySignal
+from .logging_util import log_info, log_error
+
+
+class WorkerState(Enum):
+    IDLE = auto()
+    STARTING = auto()
+    READY = auto()
+    BUSY = auto()
+    FAILED = auto()
+    EXITED = auto()
+
+
+# 这些错误说明 agent 已失去响应，该实例不再参与调度；换一个实例重试可能成功
+TRANSIENT_ERRORS = ('Timeout', 'Connection lost', 'Bridge closed')
+
+
+class HVWorker:
+    """池中的单个 HyperView 实例：独立的 inbox/outbox/ready.flag/agent.tcl 和桥接"""
+
+    def __init__(self, index: int, root_dir: str, hv_config: dict):
+        self.index = index
+        self.name = f"w{index}"
+        self.root = os.path.join(root_dir, self.name)
+        self.inbox_dir = os.path.join(self.root, 'inbox')
+        self.outbox_dir = os.path.join(self.root, 'outbox')
+        self.agent_path = os.path.join(self.root, 'agent.tcl')
+        # socket 模式下每个实例使用基准端口之后的独立端口
+        self.socket_port = hv_config.get('socket_port', 47321) + 1 + index
+        self.process = HVProcess(hv_config)
+        self.bridge = HVBridge(self.inbox_dir, self.outbox_dir,
+                               hv_config.get('job_timeout', 300),
+                               hv_config.get('watcher', 'auto'),
+                               hv_config.get('transport', 'file'),
+                               self.socket_port)
+        self.ready_signal = ReadySignal(os.path.join(self.root, 'ready.flag'), hv_config.get('watcher', 'auto'))
+        self.startup_seconds = 0.0
+        # 已启动或连接过 HyperView：关闭时需要 agent 确认退出
+        self.launched = False
+        self.state = WorkerState.IDLE
+        self.jobs_done = 0
+        self.last_used = time.time()
+
+    def status(self) -> Dict:
+        return {
+            'name': self.name,
+            'state': self.state.name,
+            'jobs_done': self.jobs_done,
+            'startup_seconds': round(self.startup_seconds, 3),
+            'idle_seconds': round(time.time() - self.last_used, 1) if self.state == WorkerState.READY else 0.0
+        }
+
+
+class HVPool:
+    """HyperView 实例池：调度器把任务分给空闲实例，按需在上下限之间扩容/收缩"""
+
+    def __init__(self, root_dir: str, hv_config: dict, make_agent: Callable[[HVWorker], str],
+                 attach: Optional[Callable[[HVWorker], bool]] = None, max_workers: int = 4,
+                 min_workers: int = 1, idle_timeout: float = 600, auto_grow: bool = True):
+        self.root_dir = root_dir
+        self.hv_config = hv_config
+        self.make_agent = make_agent
+        self.attach = attach
+        self.max_workers = max(1, max_workers)
+        self.min_workers = max(0, min(min_workers, self.max_workers))
+        self.idle_timeout = idle_timeout
+        self.auto_grow = auto_grow
+        self.workers: List[HVWorker] = []
+        # 已移出调度但 agent 尚未确认退出的实例：index -> 实例，其目录不能给新实例使用
+        self._retired: Dict[int, HVWorker] = {}
+        self.stop_timeout = hv_config.get('stop_timeout', 10)
+        self._cond = threading.Condition()
+        self.on_worker_change: Optional[Callable[[HVWorker], None]] = None
+
+    def _set_worker_state(self, worker: HVWorker, state: WorkerState):
+        with self._cond:
+            old_state = worker.state
+            worker.state = state
+            self._cond.notify_all()
+        log_info(f"实例{worker.name}状态变更:{old_state.name}->{state.name}")
+        if self.on_worker_change:
+            self.on_worker_change(worker)
+
+    def _new_worker(self) -> HVWorker:
+        used = {w.index for w in self.workers} | set(self._retired)
+        index = next(i for i in range(len(used) + 1) if i not in used)
+        worker = HVWorker(index, self.root_dir, self.hv_config)
+        worker.state = WorkerState.STARTING
+        self.workers.append(worker)
+        return worker
+
+    def _start_worker(self, worker: HVWorker) -> bool:
+        # 上次运行留下的实例仍然存活时直接复用
+        if self.attach is not None and self.attach(worker):
+            worker.launched = True
+            worker.last_used = time.time()
+            self._set_worker_state(worker, WorkerState.READY)
+            return True
+        worker.ready_signal.clear()
+        worker.bridge.clear_inbox()
+        worker.bridge.clear_outbox()
+        self.make_agent(worker)
+        log_info(f"启动实例{worker.name}:{worker.agent_path}")
+        started = time.time()
+        if not worker.process.start(worker.agent_path):
+            self._set_worker_state(worker, WorkerState.FAILED)
+            return False
+        # 就绪超时的 HyperView 之后仍可能起来并轮询 inbox，同样需要确认退出
+        worker.launched = True
+        if not worker.ready_signal.wait(self.hv_config.get('startup_timeout', 120)):
+            self._set_worker_state(worker, WorkerState.FAILED)
+            return False
+        worker.startup_seconds = time.time() - started
+        hwi_ready = worker.ready_signal.info().get('hwi_ready')
+        log_info(f"实例{worker.name}启动耗时 {worker.startup_seconds:.2f}s"
+                 + (f" (hwi 可用 {hwi_ready / 1000.0 - started:.2f}s)" if hwi_ready else ""))
+        worker.last_used = time.time()
+        self._set_worker_state(worker, WorkerState.READY)
+        return True
+
+    def grow(self, count: int = 1, wait: bool = False) -> int:
+        """新增最多 count 个实例 (不超过上限)，返回实际新增数量；wait=False 时在后台等待就绪"""
+        with self._cond:
+            # 失去响应的实例由新实例 (使用新的目录) 替换，旧实例在后台等待 agent 确认退出
+            failed = [w for w in self.workers if w.state == WorkerState.FAILED]
+            for worker in failed:
+                self.workers.remove(worker)
+                self._retired[worker.index] = worker
+            count = max(0, min(count, self.max_workers - len(self.workers)))
+            new_workers = [self._new_worker() for _ in range(count)]
+        for worker in failed:
+            threading.Thread(target=self._stop_worker, args=(worker,), name=f"hv-stop-{worker.name}",
+                             daemon=True).start()
+        threads = []
+        for worker in new_workers:
+            t = threading.Thread(target=self._start_worker, args=(worker,), name=f"hv-start-{worker.name}", daemon=True)
+            t.start()
+            threads.append(t)
+        if wait:
+            for t in threads:
+                t.join()
+        return len(new_workers)
+
+    def start(self, count: Optional[int] = None, wait: bool = True) -> int:
+        """启动实例池，返回就绪实例数量"""
+        self.grow(self.min_workers if count is None else count, wait=wait)
+        return len(self.ready_workers())
+
+    def _stop_worker(self, worker: HVWorker):
+        """让 agent 退出 HyperView 并等待确认；未确认时保留其目录，不给新实例使用，避免两个 agent 争抢同一 inbox"""
+        with self._cond:
+            if worker in self.workers:
+                self.workers.remove(worker)
+            self._retired[worker.index] = worker
+        exited = not worker.launched
+        if not exited:
+            result = worker.bridge.send_job("shutdown", timeout=self.stop_timeout)
+            exited = result.get('success', False)
+            if not exited:
+                log_error(f"实例{worker.name}未确认退出 ({result.get('error', 'Unknown')})，"
+                          f"目录 {worker.root} 不再复用")
+        # process 只是启动 HyperView 的 cmd /c start，HyperView 本身由 agent 的 shutdown 命令退出
+        worker.process.terminate()
+        worker.bridge.close()
+        if exited:
+            worker.ready_signal.clear()
+            with self._cond:
+                self._retired.pop(worker.index, None)
+        self._set_worker_state(worker, WorkerState.EXITED)
+
+    def _stop_workers(self, workers: List[HVWorker]):
+        threads = [threading.Thread(target=self._stop_worker, args=(w,), name=f"hv-stop-{w.name}", daemon=True)
+                   for w in workers]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    def shrink(self, count: int = 1) -> int:
+        """关闭最久未用的空闲实例，保留 min_workers 个，返回关闭数量"""
+        with self._cond:
+            idle = sorted(self.ready_workers(), key=lambda w: w.last_used)
+            alive = [w for w in self.workers if w.state != WorkerState.FAILED]
+            victims = idle[:max(0, min(count, len(alive) - self.min_workers))]
+            # 先移出调度列表，避免关闭过程中被 acquire 取走
+            for worker in victims:
+                self.workers.remove(worker)
+                self._retired[worker.index] = worker
+        for worker in victims:
+            log_info(f"收缩实例池:关闭{worker.name}")
+        self._stop_workers(victims)
+        return len(victims)
+
+    def reap_idle(self) -> int:
+        """关闭空闲超过 idle_timeout 的实例"""
+        now = time.time()
+        stale = [w for w in self.ready_workers() if now - w.last_used > self.idle_timeout]
+        return self.shrink(len(stale)) if stale else 0
+
+    def ready_workers(self) -> List[HVWorker]:
+        with self._cond:
+            return [w for w in self.workers if w.state == WorkerState.READY]
+
+    def acquire(self, timeout: Optional[float] = None) -> Optional[HVWorker]:
+        """取一个空闲实例并标记为 BUSY；没有空闲实例且未达上限时自动扩容，超时返回 None"""
+        deadline = None if timeout is None else time.time() + timeout
+        grown = False
+        with self._cond:
+            while True:
+                ready = [w for w in self.workers if w.state == WorkerState.READY]
+                if ready:
+                    # 优先使用最近用过的实例，其模型缓存更可能命中；其余实例保持空闲以便收缩
+                    worker = max(ready, key=lambda w: w.last_used)
+                    worker.state = WorkerState.BUSY
+                    break
+                starting = any(w.state == WorkerState.STARTING for w in self.workers)
+                if self.auto_grow and not starting and not grown:
+                    grown = self.grow(1) > 0
+                    if grown:
+                        continue
+                if not starting and not any(w.state == WorkerState.BUSY for w in self.workers):
+                    log_error("实例池中没有可用的 HyperView 实例")
+                    return None
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+        if self.on_worker_change:
+            self.on_worker_change(worker)
+        return worker
+
+    def release(self, worker: HVWorker, result: Optional[Dict] = None):
+        """归还实例；结果显示 agent 已失去响应时标记为 FAILED"""
+        worker.jobs_done += 1
+        worker.last_used = time.time()
+        failed = result is not None and not result.get('success', False) and result.get('error') in TRANSIENT_ERRORS
+        if failed:
+            log_error(f"实例{worker.name}无响应:{result.get('error')}")
+        self._set_worker_state(worker, WorkerState.FAILED if failed else WorkerState.READY)
+
+    @contextmanager
+    def worker(self, timeout: Optional[float] = None) -> Iterator[Optional[HVWorker]]:
+        worker = self.acquire(timeout)
+        try:
+            yield worker
+        finally:
+            if worker is not None and worker.state == WorkerState.BUSY:
+                self.release(worker)
+
+    def status(self) -> List[Dict]:
+        with self._cond:
+            return [w.status() for w in self.workers]
+
+    def stop(self):
+        with self._cond:
+            workers = list(self.workers)
+        self._stop_workers(workers)
@@ -0,0 +1,425 @@
+import os
+import json
+import time
+import shutil
+import select
+import socket
+import threading
+from concurrent.futures import Future, InvalidStateError
+from typing import Optional, Dict, Tuple, List, Callable
+from .logging_util import log_info, log_error, log_debug
+from .hv_watcher import create_dir_watcher
+
+
+def _failed(error: str, count: Optional[int] = None):
+    result = {'success': False, 'error': error}
+    return result if count is None else [result] * count
+
+
+def _set_result(future: Future, value):
+    # 调用方可能同时取消该 Future，不能让异常终止分发/读线程
+    try:
+        if not future.done():
+            future.set_result(value)
+    except InvalidStateError:
+        pass
+
+
+ProgressCallback = Callable[[Dict], None]
+
+
+class Transport:
+    """HVBridge 与 agent 之间的传输层接口"""
+
+    def send_async(self, job: Dict, timeout: float, on_progress: Optional[ProgressCallback] = None) -> Future:
+        """on_progress 不为空时，agent 在任务执行过程中上报的中间结果会按顺序逐条回调"""
+        raise NotImplementedError
+
+    def send_batch_async(self, job_id: str, sub_jobs: List[Dict], timeout: float) -> Future:
+        """默认实现：逐个发送子任务，全部完成后按顺序汇总为一个列表"""
+        futures = [self.send_async(sub, timeout) for sub in sub_jobs]
+        combined = Future()
+        combined.job_id = job_id
+        remaining = [len(futures)]
+        lock = threading.Lock()
+
+        def _done(_):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0] > 0:
+                    return
+            _set_result(combined, [_failed('Cancelled') if f.cancelled() else f.result() for f in futures])
+
+        if not futures:
+            combined.set_result([])
+        for f in futures:
+            f.add_done_callback(_done)
+        return combined
+
+    def close(self):
+        pass
+
+
+class FileTransport(Transport):
+    """inbox/outbox 文件协议：写入任务文件，由单一分发线程监视 outbox 完成 Future"""
+
+    def __init__(self, inbox_dir: str, outbox_dir: str, watcher: str = 'auto'):
+        self.inbox_dir = inbox_dir
+        self.outbox_dir = outbox_dir
+        self.watcher = create_dir_watcher(outbox_dir, watcher)
+        self._pending: Dict[str, Tuple[Future, float, Optional[int]]] = {}
+        # 流式任务: job_id -> [回调, progress 文件已读偏移]
+        self._progress: Dict[str, list] = {}
+        self._pending_cond = threading.Condition()
+        self._dispatcher: Optional[threading.Thread] = None
+        self._closed = False
+
+    def _write_job(self, job_id: str, job_data: Dict) -> str:
+        job_file = os.path.join(self.inbox_dir, f"job_{job_id}.json")
+        tmp_file = job_file + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(job_data, f, ensure_ascii=False, indent=2)
+        shutil.move(tmp_file, job_file)
+        log_debug(f"写入任务:{job_file}")
+        return job_file
+
+    def _write_batch(self, job_id: str, sub_jobs: List[Dict]) -> str:
+        """批量信封：首行为信封头，其后每行一个子任务 (单行 JSON，便于 agent 逐行解析)"""
+        job_file = os.path.join(self.inbox_dir, f"job_{job_id}.json")
+        tmp_file = job_file + ".tmp"
+        header = {'id': job_id, 'cmd': 'batch', 'count': len(sub_jobs), 'timestamp': time.time()}
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            for job in [header] + sub_jobs:
+                f.write(json.dumps(job, ensure_ascii=False) + '\n')
+        shutil.move(tmp_file, job_file)
+        log_debug(f"写入批量任务:{job_file} ({len(sub_jobs)} jobs)")
+        return job_file
+
+    def _read_json(self, path: str) -> Optional[Dict]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # 文件尚未写完或正被替换，等待下一次变更通知
+            return None
+
+    def _collect_result(self, job_id: str) -> Optional[Dict]:
+        result_file = os.path.join(self.outbox_dir, f"job_{job_id}.result.json")
+        error_file = os.path.join(self.outbox_dir, f"job_{job_id}.error.json")
+        if os.path.exists(result_file):
+            result = self._read_json(result_file)
+            if result is not None:
+                log_info(f"收到结果:job_{job_id}")
+                return result
+        if os.path.exists(error_file):
+            error = self._read_json(error_file)
+            if error is not None:
+                log_error(f"任务失败:{error.get('error', 'Unknown error')}")
+                return {'success': False, 'error': error.get('error', 'Unknown error')}
+        return None
+
+    def _remove_results(self, job_id: str):
+        """结果已交给 Future 后删除结果文件，长期运行的 agent 的 outbox 不会无限增长"""
+        for suffix in ('.result.json', '.error.json', '.result.jsonl'):
+            try:
+                os.remove(os.path.join(self.outbox_dir, f"job_{job_id}{suffix}"))
+            except OSError:
+                pass
+
+    def _collect_batch(self, job_id: str, count: int) -> Optional[List[Dict]]:
+        stream_file = os.path.join(self.outbox_dir, f"job_{job_id}.result.jsonl")
+        if os.path.exists(stream_file):
+            results: List[Dict] = _failed('No response', count)
+            try:
+                with open(stream_file, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        if line.strip():
+                            item = json.loads(line)
+                            if 0 <= item.get('index', -1) < count:
+                                results[item['index']] = item
+            except (OSError, ValueError):
+                return None
+            log_info(f"收到批量结果:job_{job_id} ({count} jobs)")
+            return results
+        # 信封本身处理失败时 agent 写回单个错误结果
+        envelope = self._collect_result(job_id)
+        if envelope is not None:
+            return [envelope] * count
+        return None
+
+    def _drain_progress(self, job_id: str, final: bool = False):
+        """读取 agent 追加到 job_<id>.progress.jsonl 的完整行并回调；任务结束时删除该文件"""
+        entry = self._progress.get(job_id)
+        if entry is None:
+            return
+        callback, offset = entry
+        progress_file = os.path.join(self.outbox_dir, f"job_{job_id}.progress.jsonl")
+        try:
+            with open(progress_file, 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+        except OSError:
+            data = b''
+        # 只消费以换行结尾的完整行，半行留到下一次变更通知
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line.decode('utf-8'))
+            except ValueError as e:
+                log_error(f"无法解析中间结果:{e}")
+                continue
+            try:
+                callback(item)
+            except Exception as e:
+                log_error(f"中间结果回调异常:{e}")
+        entry[1] = offset + end
+        if final:
+            self._progress.pop(job_id, None)
+            try:
+                os.remove(progress_file)
+            except OSError:
+                pass
+
+    def _ensure_dispatcher(self):
+        if self._dispatcher is None or not self._dispatcher.is_alive():
+            self._dispatcher = threading.Thread(target=self._dispatch_loop, name="hv-dispatcher", daemon=True)
+            self._dispatcher.start()
+
+    def _dispatch_loop(self):
+        """单一分发线程：监视 outbox，按 job id 完成对应的 Future"""
+        while True:
+            seq = self.watcher.sequence
+            with self._pending_cond:
+                while not self._pending and not self._closed:
+                    self._pending_cond.wait()
+                if self._closed:
+                    pending = list(self._pending.items())
+                    self._pending.clear()
+                    for job_id, (future, _, count) in pending:
+                        _set_result(future, _failed('Bridge closed', count))
+                    return
+                pending = list(self._pending.items())
+            now = time.time()
+            next_deadline = None
+            for job_id, (future, deadline, count) in pending:
+                self._drain_progress(job_id)
+                if count is None:
+                    result = self._collect_result(job_id)
+                else:
+                    result = self._collect_batch(job_id, count)
+                if result is not None:
+                    # 结果文件出现前 agent 已写完全部中间结果
+                    self._drain_progress(job_id, final=True)
+                if result is None and now >= deadline:
+                    log_error(f"任务超时：job_{job_id}")
+                    result = _failed('Timeout', count)
+                if result is None:
+                    next_deadline = deadline if next_deadline is None else min(next_deadline, deadline)
+                    continue
+                with self._pending_cond:
+                    self._pending.pop(job_id, None)
+                    self._progress.pop(job_id, None)
+                log_debug(f"收到原始结果: {result}")
+                self._remove_results(job_id)
+                _set_result(future, result)
+            if next_deadline is not None:
+                self.watcher.wait_event(seq, next_deadline - time.time())
+
+    def _submit(self, job_id: str, write, timeout: float, count: Optional[int] = None,
+                on_progress: Optional[ProgressCallback] = None) -> Future:
+        future = Future()
+        future.job_id = job_id
+        deadline = time.time() + timeout
+        with self._pending_cond:
+            if self._closed:
+                _set_result(future, _failed('Bridge closed', count))
+                return future
+            self._pending[job_id] = (future, deadline, count)
+            if on_progress is not None:
+                self._progress[job_id] = [on_progress, 0]
+            self._pending_cond.notify_all()
+        try:
+            write()
+        except OSError as e:
+            with self._pending_cond:
+                self._pending.pop(job_id, None)
+                self._progress.pop(job_id, None)
+            log_error(f"写入任务失败:{e}")
+            _set_result(future, _failed(str(e), count))
+            return future
+        self._ensure_dispatcher()
+        # 唤醒分发线程，使新任务的截止时间立即生效
+        self.watcher.notify()
+        return future
+
+    def send_async(self, job: Dict, timeout: float, on_progress: Optional[ProgressCallback] = None) -> Future:
+        job_id = job['id']
+        return self._submit(job_id, lambda: self._write_job(job_id, job), timeout, on_progress=on_progress)
+
+    def send_batch_async(self, job_id: str, sub_jobs: List[Dict], timeout: float) -> Future:
+        return self._submit(job_id, lambda: self._write_batch(job_id, sub_jobs), timeout, len(sub_jobs))
+
+    def close(self):
+        with self._pending_cond:
+            self._closed = True
+            self._pending_cond.notify_all()
+        self.watcher.notify()
+        if self._dispatcher is not None:
+            self._dispatcher.join(timeout=2)
+        self.watcher.stop()
+
+
+class SocketTransport(Transport):
+    """localhost TCP 协议：每行一个 JSON 任务/结果，按 id 匹配，无需轮询目录"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 47321, connect_timeout: float = 5.0):
+        self.host = host
+        self.port = port
+        self.connect_timeout = connect_timeout
+        self._sock: Optional[socket.socket] = None
+        self._send_lock = threading.Lock()
+        self._pending: Dict[str, Tuple[Future, float]] = {}
+        self._progress: Dict[str, ProgressCallback] = {}
+        self._pending_lock = threading.Lock()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._closed = False
+
+    def _connect(self) -> socket.socket:
+        sock = socket.create_connection((self.host, self.port), timeout=self.connect_timeout)
+        sock.settimeout(None)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        threading.Thread(target=self._reader_loop, args=(sock,), name="hv-socket-reader", daemon=True).start()
+        log_info(f"已连接 agent socket:{self.host}:{self.port}")
+        return sock
+
+    def _wake(self):
+        try:
+            self._wake_w.send(b'x')
+        except OSError:
+            pass
+
+    def _fail_all(self, error: str):
+        with self._pending_lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+            self._progress.clear()
+        for future, _ in pending:
+            _set_result(future, _failed(error))
+
+    def _reader_loop(self, sock: socket.socket):
+        buf = b''
+        while not self._closed:
+            with self._pending_lock:
+                deadlines = [d for _, d in self._pending.values()]
+            timeout = max(0.0, min(deadlines) - time.time()) if deadlines else None
+            try:
+                readable, _, _ = select.select([sock, self._wake_r], [], [], timeout)
+            except (OSError, ValueError):
+                break
+            if self._wake_r in readable:
+                self._wake_r.recv(4096)
+            if sock in readable:
+                try:
+                    data = sock.recv(65536)
+                except OSError:
+                    data = b''
+                if not data:
+                    log_error("agent socket 连接已断开")
+                    break
+                buf += data
+                while b'\n' in buf:
+                    line, buf = buf.split(b'\n', 1)
+                    if line.strip():
+                        self._resolve(line)
+            now = time.time()
+            with self._pending_lock:
+                expired = [jid for jid, (_, d) in self._pending.items() if d <= now]
+                expired = [(jid, self._pending.pop(jid)[0]) for jid in expired]
+                for jid, _ in expired:
+                    self._progress.pop(jid, None)
+            for job_id, future in expired:
+                log_error(f"任务超时：job_{job_id}")
+                _set_result(future, _failed('Timeout'))
+        with self._send_lock:
+            if self._sock is sock:
+                self._sock = None
+        try:
+            sock.close()
+        except OSError:
+            pass
+        self._fail_all('Bridge closed' if self._closed else 'Connection lost')
+
+    def _resolve(self, line: bytes):
+        try:
+            result = json.loads(line.decode('utf-8'))
+        except ValueError as e:
+            log_error(f"无法解析 agent 结果:{e}")
+            return
+        job_id = result.get('id', '')
+        if result.get('progress'):
+            # 中间结果：回调后继续等待最终结果
+            with self._pending_lock:
+                callback = self._progress.get(job_id)
+            if callback is not None:
+                try:
+                    callback(result)
+                except Exception as e:
+                    log_error(f"中间结果回调异常:{e}")
+            return
+        with self._pending_lock:
+            entry = self._pending.pop(job_id, None)
+            self._progress.pop(job_id, None)
+        if entry is None:
+            log_debug(f"忽略未知结果:{job_id}")
+            return
+        log_info(f"收到结果:job_{job_id}")
+        log_debug(f"收到原始结果: {result}")
+        _set_result(entry[0], result)
+
+    def send_async(self, job: Dict, timeout: float, on_progress: Optional[ProgressCallback] = None) -> Future:
+        job_id = job['id']
+        future = Future()
+        future.job_id = job_id
+        if self._closed:
+            _set_result(future, _failed('Bridge closed'))
+            return future
+        with self._pending_lock:
+            self._pending[job_id] = (future, time.time() + timeout)
+            if on_progress is not None:
+                self._progress[job_id] = on_progress
+        line = (json.dumps(job, ensure_ascii=False) + '\n').encode('utf-8')
+        try:
+            with self._send_lock:
+                if self._sock is None:
+                    self._sock = self._connect()
+                self._sock.sendall(line)
+        except OSError as e:
+            with self._pending_lock:
+                self._pending.pop(job_id, None)
+                self._progress.pop(job_id, None)
+            log_error(f"发送任务失败:{e}")
+            _set_result(future, _failed(str(e)))
+            return future
+        # 唤醒读线程，使新任务的截止时间立即生效
+        self._wake()
+        return future
+
+    def close(self):
+        self._closed = True
+        self._wake()
+        with self._send_lock:
+            if self._sock is not None:
+                try:
+                    self._sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+        self._fail_all('Bridge closed')
+
+
+def create_transport(kind: str, inbox_dir: str, outbox_dir: str, watcher: str = 'auto',
+                     port: int = 47321) -> Transport:
+    if kind == 'socket':
+        return SocketTransport(port=port)
+    return FileTransport(inbox_dir, outbox_dir, watcher)
@@ -0,0 +1,131 @@
+import os
+import sys
+import time
+import select
+import threading
+from typing import Optional, List
+from .logging_util import log_info, log_error
+
+# inotify 事件掩码 (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+
+
+class DirWatcher:
+    """目录变更通知：默认实现为定时轮询，作为没有 inotify 时的回退"""
+
+    def __init__(self, directory: str, interval: float = 0.2):
+        self.directory = directory
+        self.interval = interval
+        self._cond = threading.Condition()
+        self._seq = 0
+
+    @property
+    def sequence(self) -> int:
+        with self._cond:
+            return self._seq
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def notify(self):
+        with self._cond:
+            self._seq += 1
+            self._cond.notify_all()
+
+    def wait_event(self, seq: int, timeout: float) -> int:
+        """阻塞到目录可能发生变化(或超时)，返回最新序号"""
+        with self._cond:
+            if self._seq == seq and timeout > 0:
+                self._cond.wait(min(timeout, self.interval))
+            return self._seq
+
+    def wait_for(self, paths: List[str], timeout: float) -> Optional[str]:
+        """等待任一文件出现，返回其路径；超时返回 None"""
+        deadline = time.time() + timeout
+        while True:
+            seq = self.sequence
+            for p in paths:
+                if os.path.exists(p):
+                    return p
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return None
+            self.wait_event(seq, remaining)
+
+
+class InotifyDirWatcher(DirWatcher):
+    """Linux inotify 实现：文件被 rename 到位或写完关闭时立即唤醒等待者"""
+
+    MASK = IN_MOVED_TO | IN_CLOSE_WRITE | IN_CREATE | IN_MODIFY
+
+    def __init__(self, directory: str):
+        super().__init__(directory, interval=float('inf'))
+        import ctypes
+        import ctypes.util
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), self.MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(err, f"inotify_add_watch failed: {directory}")
+        self._stop_r, self._stop_w = os.pipe()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="inotify-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        os.write(self._stop_w, b'x')
+        self._thread.join(timeout=2)
+        self._thread = None
+        for fd in (self._fd, self._stop_r, self._stop_w):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def _run(self):
+        while True:
+            try:
+                readable, _, _ = select.select([self._fd, self._stop_r], [], [])
+            except OSError as e:
+                log_error(f"inotify select error:{e}")
+                return
+            if self._stop_r in readable:
+                return
+            try:
+                # 等待者自行检查目标文件，这里只需排空事件队列并唤醒
+                os.read(self._fd, 65536)
+            except BlockingIOError:
+                continue
+            except OSError as e:
+                log_error(f"inotify read error:{e}")
+                return
+            self.notify()
+
+
+def create_dir_watcher(directory: str, kind: str = 'auto', interval: float = 0.2) -> DirWatcher:
+    """按配置创建目录监视器：auto/inotify/poll"""
+    if kind in ('auto', 'inotify') and sys.platform.startswith('linux'):
+        try:
+            watcher = InotifyDirWatcher(directory)
+            watcher.start()
+            return watcher
+        except (OSError, AttributeError) as e:
+            log_error(f"inotify unavailable, fallback to polling:{e}")
+    elif kind == 'inotify':
+        log_info("inotify only supported on Linux, fallback to polling")
+    return DirWatcher(directory, interval)
@@ -1,13 +1,25 @@
 import os
 import json
+import csv
+import time
+import threading
+from dataclasses import asdict
+from concurrent.futures import Future, ThreadPoolExecutor, InvalidStateError, CancelledError
+from contextlib import contextmanager
 from enum import Enum, auto
-from typing import Optional, Callable, Dict, Any
+from typing import Optional, Callable, Dict, Any, List, Tuple, Generator, Union, Iterator
 from datetime import datetime
 from .hv_process import HVProcess
 from .hv_bridge import HVBridge, ReadySignal
-from .db_store import DBStore
-from .analysis import Analyzer
+from .hv_agent import render_agent, write_agent
+from .hv_pool import HVPool, HVWorker, TRANSIENT_ERRORS
+from .db_store import DBStore, MAP_TYPES
+from .analysis import Analyzer, AnalysisResult
 from .report_html import HTMLReporter
+from .result_cache import ResultCache
+from .request_coalescer import RequestCoalescer
+from .hot_folder import HotFolder
+from .request_queue import RequestQueue, PRIORITY_INTERACTIVE, PRIORITY_NORMAL, PRIORITY_BATCH
 from .logging_util import log_info, log_error, setup_logger
 
 
@@ -37,11 +49,51 @@ class Orchestrator:
             os.makedirs(d, exist_ok=True)
         self.hv_process = HVProcess(self.config['hyperview'])
         self.bridge = HVBridge(self.inbox_dir, self.outbox_dir,
-                               self.config['hyperview'].get('job_timeout', 300))
-        self.ready_signal = ReadySignal(os.path.join(base_dir, 'workdir/ready.flag'))
-        self.db = DBStore(os.path.join(base_dir, self.config['database']['path']))
+                               self.config['hyperview'].get('job_timeout', 300),
+                               self.config['hyperview'].get('watcher', 'auto'),
+                               self.config['hyperview'].get('transport', 'file'),
+                               self.config['hyperview'].get('socket_port', 47321))
+        self.ready_signal = ReadySignal(os.path.join(base_dir, 'workdir/ready.flag'),
+                                        self.config['hyperview'].get('watcher', 'auto'))
+        self.startup_timings: Dict[str, float] = {}
+        self.db = DBStore(os.path.join(base_dir, self.config['database']['path']),
+                          busy_timeout=self.config['database'].get('busy_timeout', 10))
         self.analyzer = Analyzer(self.db)
-        self.reporter = HTMLReporter()
+        self.capture_cfg = self.config.get('capture', {})
+        self.reporter = HTMLReporter(self.capture_cfg.get('embed_images', True))
+        cache_cfg = self.config.get('cache', {})
+        self.cache: Optional[ResultCache] = None
+        if cache_cfg.get('enabled', True):
+            self.cache = ResultCache(os.path.join(base_dir, cache_cfg.get('dir', 'workdir/cache')),
+                                     cache_cfg.get('max_entries', 500),
+                                     int(cache_cfg.get('max_mb', 2048)) * 1024 * 1024, log=self._log)
+        pool_cfg = self.config.get('pool', {})
+        self.pool = HVPool(os.path.join(base_dir, pool_cfg.get('dir', 'workdir/workers')),
+                           self.config['hyperview'], self._generate_agent_tcl,
+                           lambda w: self._attach_agent(w.bridge, w.ready_signal, w),
+                           int(pool_cfg.get('max_workers', 4)),
+                           int(pool_cfg.get('min_workers', 1)),
+                           pool_cfg.get('idle_timeout', 600),
+                           pool_cfg.get('auto_grow', True))
+        self._pool_executor: Optional[ThreadPoolExecutor] = None
+        # 定期关闭空闲超过 pool.idle_timeout 的实例
+        self._reaper: Optional[threading.Thread] = None
+        self._reaper_stop = threading.Event()
+        # 后处理阶段 (标准对比 + 报告)，与下一个 HyperView 任务重叠执行
+        self.post_workers = max(1, int(self.config.get('pipeline', {}).get('post_workers', 2)))
+        self._post_executor: Optional[ThreadPoolExecutor] = None
+        self._post_lock = threading.Lock()
+        # 单实例模式下发给 agent 的请求统一排队，执行期间状态为 RUNNING
+        self.requests = RequestQueue()
+        self.requests.on_busy = lambda: self._set_state(State.RUNNING)
+        self.requests.on_idle = self._on_requests_idle
+        # 相同 (命令, 参数, 文件指纹) 的请求排队或执行中时合并为一个
+        self.coalesce = self.config.get('pipeline', {}).get('coalesce', True)
+        self.coalescer = RequestCoalescer(self.cache, self._log)
+        self.hot_folder: Optional[HotFolder] = None
+        self._run_dir_lock = threading.Lock()
+        # attach/start_hyperview 的状态检查与切换互斥，GUI 启动时的后台 attach 与用户点击 Start 不会同时连接或冷启动
+        self._start_lock = threading.Lock()
         self.state = State.IDLE
         self.current_job_id: Optional[str] = None
         self.on_state_change = None
@@ -55,551 +107,870 @@ class Orchestrator:
         if self.on_state_change:
             self.on_state_change(new_state)
 
-    def _log(self, msg: str):
-        log_info(msg)
-        if self.on_log:
-            self.on_log(msg)
+    def _on_requests_idle(self):
+        if self.state == State.RUNNING:
+            self._set_state(State.AGENT_READY)
 
-    def _generate_agent_tcl(self) -> str:
-        agent_dir = os.path.join(self.base_dir, 'hv_agent')
-        os.makedirs(agent_dir, exist_ok=True)
-        agent_path = os.path.join(agent_dir, 'agent.tcl')
-        ready_file = self.ready_signal.ready_file.replace('\\', '/')
-        inbox_dir = self.inbox_dir.replace('\\', '/')
-        outbox_dir = self.outbox_dir.replace('\\', '/')
-        tcl_code = '''\
-package require Tk
-set READY_FILE "''' + ready_file + '''"
-set INBOX_DIR "''' + inbox_dir + '''"
-set OUTBOX_DIR "''' + outbox_dir + '''"
-set MAX_VALUE 0.0
-set MAX_ID 0
-proc write_ready {} {
-    global READY_FILE
-    if { [catch {
-        hwi OpenStack
-        hwi GetSessionHandle sess
-        sess ReleaseHandle
-        hwi CloseStack
-    } err] } {
-        after 2000 write_ready
-        return
-    }
-
-    set f [open $READY_FILE w]
-    puts $f "ready"
-    close $f
-    puts "Agent Ready"
-}
-
-proc escape_json_string {str} {
-    set str [string map {\\ \\\\ \" \\" \n \\n \r \\r \t \\t} $str]
-    return $str
-}
-
-proc write_result {job_id result_json} {
-    global OUTBOX_DIR
-    set result_file [file join $OUTBOX_DIR "job_${job_id}.result.json"]
-    puts "Writing result to: $result_file"
-    set f [open $result_file w]
-    puts $f $result_json
-    close $f
-    puts "Result written successfully"
-}
-
-proc cmd_export_contour_and_peak_vm {model_path result_path output_dir } {
-    global MAX_VALUE MAX_ID
-    set MAX_VALUE 0.0
-    set MAX_ID 0
-    set image_path ""
-
-    if { [catch {
-        hwi OpenStack
-        hwi GetSessionHandle sess
-        sess GetProjectHandle proj
-        set pageId [proj GetActivePage]
-        proj GetPageHandle page1 $pageId
-        set winId [page1 GetActiveWindow]
-        page1 GetWindowHandle win1 $winId
-        win1 SetClientType animation
-        win1 GetClientHandle my_post
-
-        # 检查是否已有模型加载，如果没有才加载
-        set modelCount [my_post GetNumberOfModels]
-        if {$modelCount == 0} {
-            my_post AddModel $model_path
-            my_post Draw
-            set modelCount [my_post GetNumberOfModels]
-        }
+    def _agent_available(self) -> bool:
+        return self.state in (State.AGENT_READY, State.RUNNING)
 
-        # 获取模型句柄并设置云图
-        if {$modelCount > 0} {
-            my_post GetModelHandle model1 1
-
-            # 如果有结果文件，检查文件类型并加载
-            if {$result_path ne ""} {
-                set ext [string tolower [file extension $result_path]]
-                if {$ext eq ".h3d" || $ext eq ".op2" || $ext eq ".pch" || $ext eq ".rst" || $ext eq ".d3plot"} {
-                    puts "Loading result file for analysis: $result_path"
-                    if { [catch {
-                        model1 AddResult $result_path
-                    } addResultErr] } {
-                        puts "Warning: Could not load result file: $addResultErr"
-                    }
-                } else {
-                    puts "Note: Result file type '$ext' is not directly supported."
-                }
-            }
+    def _enqueue(self, fn: Callable, *args, priority: int = PRIORITY_NORMAL, label: str = "",
+                 default: Any = None) -> Future:
+        """把需要 agent 的操作放入请求队列；agent 未就绪时立即返回结果为 default 的 Future"""
+        def guarded():
+            # 排队期间 HyperView 可能已退出或失败
+            if not self._agent_available():
+                self._log(f"HyperView NOT Ready, skip {label}")
+                return default
+            return fn(*args)
+        if not self._agent_available():
+            self._log("HyperView NOT Ready,Start First")
+            future: Future = Future()
+            future.set_result(default)
+            return future
+        return self.requests.submit(guarded, priority=priority, label=label)
 
-            # 获取ResultCtrlHandle和ContourCtrlHandle来启用应力云图
-            if { [catch {
-                model1 GetResultCtrlHandle resultCtrl
-                resultCtrl GetContourCtrlHandle contourCtrl
-
-                # 设置数据类型为应力(Stress) von Mises
-                if { [catch {
-                    contourCtrl SetDataType "Stress"
-                    contourCtrl SetDataComponent "vonMises"
-                } setErr] } {
-                    puts "SetDataType/Component warning: $setErr"
-                }
-
-                # 启用云图显示
-                if { [catch {
-                    contourCtrl SetEnableState true
-                } enableErr] } {
-                    puts "SetEnableState warning: $enableErr"
-                }
-
-                # 应用更改
-                if { [catch {
-                    resultCtrl Apply
-                } applyErr] } {
-                    puts "Apply warning: $applyErr"
-                }
-
-                contourCtrl ReleaseHandle
-                resultCtrl ReleaseHandle
-            } resultErr] } {
-                puts "Result/Contour ctrl warning: $resultErr"
-            }
+    @contextmanager
+    def _exclusive(self, priority: int = PRIORITY_NORMAL, label: str = "") -> Iterator[bool]:
+        """在请求队列中占住 agent 直到 with 块结束，供逐条产出结果的生成器使用；返回是否拿到 agent"""
+        granted = threading.Event()
+        release = threading.Event()
 
-            model1 ReleaseHandle
-        }
+        def hold():
+            granted.set()
+            release.wait()
+            return True
+        future = self._enqueue(hold, priority=priority, label=label, default=False)
+        future.add_done_callback(lambda _: granted.set())
+        granted.wait()
+        try:
+            yield future.running() or (future.done() and not future.cancelled() and future.result())
+        finally:
+            release.set()
 
-        # 刷新显示
-        my_post Draw
-
-        # 获取最大值
-        if { [catch {
-            my_post GetQueryCtrlHandle qc
-            set MAX_VALUE [qc GetContourMaxValue]
-            set MAX_ID [qc GetContourMaxID]
-            qc ReleaseHandle
-        } qerr] } {
-            puts "Query error (using defaults): $qerr"
-            set MAX_VALUE 0.0
-            set MAX_ID 0
-        }
+    @staticmethod
+    def _resolve(future: Future, value: Any):
+        # 调用方可能已取消该 Future
+        try:
+            if not future.done():
+                future.set_result(value)
+        except InvalidStateError:
+            pass
 
-        file mkdir $output_dir
-        set image_path [file join $output_dir "vonmises.png"]
-        win1 CaptureImage $image_path 0 0 1920 1080
-
-        my_post ReleaseHandle
-        win1 ReleaseHandle
-        page1 ReleaseHandle
-        proj ReleaseHandle
-        sess ReleaseHandle
-        hwi CloseStack
-    } err] } {
-        puts "cmd_export_contour_and_peak_vm error: $err"
-        catch { hwi CloseStack }
-        # 返回默认值而不是抛出错误，避免错误传播问题
-        return [list 0.0 0 ""]
-    }
-
-    return [list $MAX_VALUE $MAX_ID $image_path]
-}
-
-proc cmd_display_contour {model_path result_path} {
-    if { [catch {
-        hwi OpenStack
-        hwi GetSessionHandle sess
-        sess GetProjectHandle proj
-        set pageId [proj GetActivePage]
-        proj GetPageHandle page1 $pageId
-        set winId [page1 GetActiveWindow]
-        page1 GetWindowHandle win1 $winId
-        win1 SetClientType animation
-        win1 GetClientHandle my_post
-
-        # 检查是否已有模型加载，如果没有才加载
-        set modelCount [my_post GetNumberOfModels]
-        if {$modelCount == 0} {
-            my_post AddModel $model_path
-            my_post Draw
-            set modelCount [my_post GetNumberOfModels]
-        }
+    @staticmethod
+    def _wait(future: Future, default: Any = None) -> Any:
+        """同步接口等待结果；请求被取消 (shutdown 或调用方取消) 时返回失败值 default"""
+        try:
+            return future.result()
+        except CancelledError:
+            return default
 
-        # 获取模型句柄并设置云图显示
-        if {$modelCount > 0} {
-            my_post GetModelHandle model1 1
-
-            # 如果有结果文件，检查文件类型并加载
-            if {$result_path ne ""} {
-                set ext [string tolower [file extension $result_path]]
-                if {$ext eq ".h3d" || $ext eq ".op2" || $ext eq ".pch" || $ext eq ".rst" || $ext eq ".d3plot"} {
-                    puts "Loading result file for contour: $result_path"
-                    if { [catch {
-                        model1 AddResult $result_path
-                    } addResultErr] } {
-                        puts "Warning: Could not load result file: $addResultErr"
-                    }
-                } else {
-                    puts "Note: Result file type '$ext' is not directly supported."
-                }
-            }
+    def _settled(self, request: Future, default: Any = None) -> Future:
+        """包装请求队列的 Future：请求被取消或执行异常时以 default 完成，回调中的 result() 不会抛出；
+        调用方 cancel() 返回的 Future 时一并撤销排队中的请求"""
+        output: Future = Future()
+        output.add_done_callback(lambda f: f.cancelled() and request.cancel())
 
-            # 获取ResultCtrlHandle和ContourCtrlHandle来启用云图
-            if { [catch {
-                model1 GetResultCtrlHandle resultCtrl
-                resultCtrl GetContourCtrlHandle contourCtrl
-
-                # 尝试设置数据类型为应力(Stress)并启用云图
-                # 常见的数据类型: Stress, Displacement, Strain等
-                if { [catch {
-                    contourCtrl SetDataType "Stress"
-                    contourCtrl SetDataComponent "vonMises"
-                } setErr] } {
-                    puts "SetDataType/Component warning: $setErr"
-                    # 如果设置失败，尝试使用默认数据类型
-                }
-
-                # 启用云图显示
-                if { [catch {
-                    contourCtrl SetEnableState true
-                } enableErr] } {
-                    puts "SetEnableState warning: $enableErr"
-                }
-
-                # 应用更改
-                if { [catch {
-                    resultCtrl Apply
-                } applyErr] } {
-                    puts "Apply warning: $applyErr"
-                }
-
-                contourCtrl ReleaseHandle
-                resultCtrl ReleaseHandle
-            } resultErr] } {
-                puts "Result/Contour ctrl warning: $resultErr"
-            }
+        def settle(f: Future):
+            value = default
+            if not f.cancelled():
+                try:
+                    value = f.result()
+                except Exception as e:
+                    self._log(f"Request error: {str(e)}")
+            self._resolve(output, value)
+        request.add_done_callback(settle)
+        return output
 
-            model1 ReleaseHandle
-        }
+    def pending_requests(self) -> int:
+        return self.requests.pending()
 
-        # 刷新显示
-        my_post Draw
-
-        my_post ReleaseHandle
-        win1 ReleaseHandle
-        page1 ReleaseHandle
-        proj ReleaseHandle
-        sess ReleaseHandle
-        hwi CloseStack
-    } err] } {
-        puts "cmd_display_contour error: $err"
-        catch { hwi CloseStack }
-        return 0
-    }
-
-    return 1
-}
-
-proc process_job {job_file} {
-    global MAX_VALUE MAX_ID
-    set f [open $job_file r]
-    set content [read $f]
-    close $f
-
-    # 初始化变量
-    set job_id ""
-    set cmd ""
-    set model_path ""
-    set result_path ""
-    set output_dir ""
-
-    # 使用string first和string range手动解析JSON
-    # 解析 "id": "value"
-    set idx [string first {"id"} $content]
-    if {$idx >= 0} {
-        set start [string first {\"} $content [expr {$idx + 4}]]
-        set end [string first {\"} $content [expr {$start + 1}]]
-        if {$start >= 0 && $end > $start} {
-            set job_id [string range $content [expr {$start + 1}] [expr {$end - 1}]]
-        }
-    }
-
-    # 解析 "cmd": "value"
-    set idx [string first {"cmd"} $content]
-    if {$idx >= 0} {
-        set start [string first {\"} $content [expr {$idx + 5}]]
-        set end [string first {\"} $content [expr {$start + 1}]]
-        if {$start >= 0 && $end > $start} {
-            set cmd [string range $content [expr {$start + 1}] [expr {$end - 1}]]
-        }
-    }
-
-    # 解析 "model_path": "value"
-    set idx [string first {"model_path"} $content]
-    if {$idx >= 0} {
-        set start [string first {\"} $content [expr {$idx + 12}]]
-        set end [string first {\"} $content [expr {$start + 1}]]
-        if {$start >= 0 && $end > $start} {
-            set model_path [string range $content [expr {$start + 1}] [expr {$end - 1}]]
-        }
-    }
-
-    # 解析 "result_path": "value"
-    set idx [string first {"result_path"} $content]
-    if {$idx >= 0} {
-        set start [string first {\"} $content [expr {$idx + 13}]]
-        set end [string first {\"} $content [expr {$start + 1}]]
-        if {$start >= 0 && $end > $start} {
-            set result_path [string range $content [expr {$start + 1}] [expr {$end - 1}]]
-        }
-    }
-
-    # 解析 "output_dir": "value"
-    set idx [string first {"output_dir"} $content]
-    if {$idx >= 0} {
-        set start [string first {\"} $content [expr {$idx + 12}]]
-        set end [string first {\"} $content [expr {$start + 1}]]
-        if {$start >= 0 && $end > $start} {
-            set output_dir [string range $content [expr {$start + 1}] [expr {$end - 1}]]
-        }
-    }
-
-    puts "DEBUG: job_id=$job_id cmd=$cmd"
-    puts "DEBUG: model_path=$model_path"
-    puts "Processing: $job_id $cmd"
-
-    if { [catch {
-        switch $cmd {
-            "export_contour_and_peak_vm" {
-                set res [cmd_export_contour_and_peak_vm $model_path $result_path $output_dir]
-                set pv [lindex $res 0]
-                set pi [lindex $res 1]
-                set ip [lindex $res 2]
-                # 检查结果是否有效
-                if {$ip eq "" || $pv == 0.0} {
-                    write_result $job_id {{"success":false,"error":"Analysis failed - no valid results"}}
-                } else {
-                    set json [format {{"success":true,"images":["%s"],"peak":{"value":%s,"entity_id":%s,"coords":[0,0,0],"tags":{"component":"","part":"","property":""}}}} $ip $pv $pi]
-                    write_result $job_id $json
-                }
-            }
-            "ping" {
-                write_result $job_id {{"success":true,"message":"pong"}}
-            }
-            "display_contour" {
-                puts "Executing display_contour command"
-                set res [cmd_display_contour $model_path $result_path]
-                if {$res == 1} {
-                    write_result $job_id {{"success":true,"message":"Contour displayed"}}
-                } else {
-                    write_result $job_id {{"success":false,"error":"Failed to display contour"}}
-                }
-            }
-            "load_model" {
-                puts "Executing load_model command"
-                puts "Model path: $model_path"
-                puts "Result path: $result_path"
-                if { [catch {
-                    hwi OpenStack
-                    hwi GetSessionHandle sess
-                    sess GetProjectHandle proj
-                    set pageId [proj GetActivePage]
-                    proj GetPageHandle page1 $pageId
-                    set winId [page1 GetActiveWindow]
-                    page1 GetWindowHandle win1 $winId
-                    win1 SetClientType animation
-                    win1 GetClientHandle my_post
-
-                    # 加载模型文件
-                    my_post AddModel $model_path
-                    my_post Draw
-
-                    # 如果有结果文件，检查文件类型
-                    if {$result_path ne ""} {
-                        set ext [string tolower [file extension $result_path]]
-                        # .h3d文件已包含结果，.op2/.pch/.rst等是支持的结果文件
-                        if {$ext eq ".h3d" || $ext eq ".op2" || $ext eq ".pch" || $ext eq ".rst" || $ext eq ".d3plot"} {
-                            puts "Loading result file: $result_path"
-                            set modelCount [my_post GetNumberOfModels]
-                            if {$modelCount > 0} {
-                                my_post GetModelHandle model1 1
-                                if { [catch {
-                                    model1 AddResult $result_path
-                                } resultErr] } {
-                                    puts "Warning: Could not load result file: $resultErr"
-                                }
-
-                                # 启用云图显示
-                                if { [catch {
-                                    model1 GetResultCtrlHandle resultCtrl
-                                    resultCtrl GetContourCtrlHandle contourCtrl
-                                    catch { contourCtrl SetDataType "Stress" }
-                                    catch { contourCtrl SetDataComponent "vonMises" }
-                                    catch { contourCtrl SetEnableState true }
-                                    catch { resultCtrl Apply }
-                                    contourCtrl ReleaseHandle
-                                    resultCtrl ReleaseHandle
-                                } contourErr] } {
-                                    puts "Contour setup warning: $contourErr"
-                                }
-
-                                model1 ReleaseHandle
-                            }
-                            my_post Draw
-                        } else {
-                            puts "Note: Result file type '$ext' is not directly supported. Model file should contain results."
-                        }
-                    }
-
-                    my_post ReleaseHandle
-                    win1 ReleaseHandle
-                    page1 ReleaseHandle
-                    proj ReleaseHandle
-                    sess ReleaseHandle
-                    hwi CloseStack
-                } err] } {
-                    puts "load_model error: $err"
-                    catch { hwi CloseStack }
-                    set escaped_err [escape_json_string $err]
-                    set err_json [format {{"success":false,"error":"%s"}} $escaped_err]
-                    write_result $job_id $err_json
-                    return
-                }
-                puts "load_model completed successfully"
-                write_result $job_id {{"success":true}}
-            }
-            default {
-                write_result $job_id [format {{"success":false,"error":"Unknown cmd: %s"}} $cmd]
-            }
-        }
-    } err] } {
-        puts "process_job error: $err"
-        set escaped_err [escape_json_string $err]
-        write_result $job_id [format {{"success":false,"error":"%s"}} $escaped_err]
-    }
-    catch { file delete $job_file }
-}
-
-proc listen {} {
-    global INBOX_DIR
-    if { [catch {
-        set files [glob -nocomplain -directory $INBOX_DIR "job_*.json"]
-        foreach f $files {
-            if {[string match "*.tmp" $f]} {continue}
-            if {[string match "*.processing" $f]} {continue}
-            # 重命名文件防止重复处理
-            set processing_file "${f}.processing"
-            if {[catch {file rename -force $f $processing_file}]} {
-                continue
-            }
-            process_job $processing_file
-        }
-    } err] } {
-        puts "Listen error : $err"
-    }
-    after 500 listen
-}
-puts "Starting Agent"
-after 3000 write_ready
-after 4000 listen
-'''
-        with open(agent_path, 'w', encoding='utf-8') as f:
-            f.write(tcl_code)
-        return agent_path
-
-    def start_hyperview(self) -> bool:
-        if self.state == State.AGENT_READY and not self.hv_process.is_running():
-            self._set_state(State.IDLE)
-        if self.state not in (State.IDLE, State.FAILED, State.EXITED):
-            self._log("Unable to Start Now")
+    def _log(self, msg: str):
+        log_info(msg)
+        if self.on_log:
+            self.on_log(msg)
+
+    def _agent_tcl_source(self, worker: Optional[HVWorker] = None) -> Tuple[str, str, str]:
+        """返回 (agent 路径, 脚本内容, 版本号)；指定 worker 时使用该池实例自己的目录、ready 文件和端口"""
+        hv_cfg = self.config['hyperview']
+        socket_port = hv_cfg.get('socket_port', 47321) if hv_cfg.get('transport', 'file') == 'socket' else 0
+        if worker is None:
+            agent_path = os.path.join(self.base_dir, 'hv_agent', 'agent.tcl')
+            ready_file, inbox_dir, outbox_dir = self.ready_signal.ready_file, self.inbox_dir, self.outbox_dir
+        else:
+            agent_path = worker.agent_path
+            ready_file, inbox_dir, outbox_dir = worker.ready_signal.ready_file, worker.inbox_dir, worker.outbox_dir
+            socket_port = worker.socket_port if socket_port else 0
+        max_models = max(1, int(hv_cfg.get('max_resident_models', 3)))
+        max_model_bytes = int(hv_cfg.get('max_resident_mb', 0)) * 1024 * 1024
+        tcl_code, version = render_agent(ready_file, inbox_dir, outbox_dir, socket_port, max_models, max_model_bytes)
+        return agent_path, tcl_code, version
+
+    def _generate_agent_tcl(self, worker: Optional[HVWorker] = None) -> str:
+        agent_path, tcl_code, _ = self._agent_tcl_source(worker)
+        return write_agent(agent_path, tcl_code)
+
+    def _attach_agent(self, bridge: HVBridge, ready_signal: ReadySignal, worker: Optional[HVWorker] = None) -> bool:
+        """ready 文件存在且 agent 在短时限内应答同版本的 ping 时直接复用，不重启 HyperView"""
+        if not ready_signal.is_ready():
+            return False
+        attach_timeout = self.config['hyperview'].get('attach_timeout', 3)
+        t = time.perf_counter()
+        result = bridge.send_job("ping", timeout=attach_timeout)
+        elapsed_ms = (time.perf_counter() - t) * 1000
+        if not result.get('success', False):
+            self._log(f"No live agent ({result.get('error', 'Unknown')}), checked in {elapsed_ms:.0f} ms")
+            return False
+        if result.get('agent') != self._agent_tcl_source(worker)[2]:
+            # 旧版本 agent 停止监听后再冷启动，避免两个 agent 争抢同一个 inbox
+            self._log(f"Live agent is outdated ({result.get('agent', 'unknown')}), detaching it")
+            bridge.send_job("detach", timeout=attach_timeout)
             return False
-        self._set_state(State.STARTING)
+        self._log(f"Attached to live agent in {elapsed_ms:.0f} ms")
+        return True
+
+    def _reopen(self):
+        """shutdown 之后再次连接/启动时恢复请求队列和桥接"""
+        self.requests.reopen()
+        self.bridge.reopen()
+
+    def attach(self) -> bool:
+        """仅尝试连接已运行的 agent，不启动 HyperView"""
+        with self._start_lock:
+            if self.state not in (State.IDLE, State.FAILED, State.EXITED):
+                return self.state == State.AGENT_READY
+            self._reopen()
+            if self._attach_agent(self.bridge, self.ready_signal):
+                self._set_state(State.AGENT_READY)
+                return True
+            return False
+
+    def start_hyperview(self, cold: bool = False) -> bool:
+        """优先连接已运行的 agent，失败 (或 cold=True) 时才冷启动 HyperView"""
+        # 进行中的 attach 结束后再检查状态；切换到 STARTING 后其他 attach/start 调用直接返回
+        with self._start_lock:
+            if self.state == State.AGENT_READY and not self.hv_process.is_running():
+                self._set_state(State.IDLE)
+            if self.state not in (State.IDLE, State.FAILED, State.EXITED):
+                self._log("Unable to Start Now")
+                return False
+            self._set_state(State.STARTING)
+            self._reopen()
+        if not cold and self._attach_agent(self.bridge, self.ready_signal):
+            self._set_state(State.AGENT_READY)
+            self._log("Hyperview is Ready")
+            return True
+        started = time.time()
         self.ready_signal.clear()
         self.bridge.clear_inbox()
         self.bridge.clear_outbox()
         agent_path = self._generate_agent_tcl()
         self._log(f"Generate Agent:{agent_path}")
         if not self.hv_process.start(agent_path):
+            self._set_state(State.FAILED)
             return False
+        spawned = time.time()
         self._log("Waiting HyperView Agent Ready...")
         timeout = self.config['hyperview'].get('startup_timeout')
         if self.ready_signal.wait(timeout):
+            ready = time.time()
+            self._record_startup(started, spawned, ready)
             self._set_state(State.AGENT_READY)
-            self._log("Hyperview is Ready")
+            self._log(f"Hyperview is Ready (cold start {ready - started:.1f} s)")
             return True
         else:
             self._set_state(State.FAILED)
             self._log("HyperView TimeOut")
             return False
 
-    def run_analysis(self, model_path: str, result_path: str = "") -> Optional[Dict[str, Any]]:
-        self._log(f"run_analysis called with model_path={model_path}")
-        if self.state != State.AGENT_READY:
-            self._log("HyperView NOT Ready,Start First")
+    def _record_startup(self, started: float, spawned: float, ready: float):
+        """记录冷启动各阶段耗时 (秒，均从发起启动算起) 并追加到 workdir/startup.jsonl"""
+        info = self.ready_signal.info()
+        timings = {'spawn': spawned - started}
+        # agent 时间戳为毫秒，与本进程在同一台机器上，可直接相减
+        for key in ('tcl_loaded', 'tk_loaded', 'hwi_ready'):
+            if key in info:
+                timings[key] = info[key] / 1000.0 - started
+        timings['ready_seen'] = ready - started
+        t = time.time()
+        ping = self.bridge.send_job("ping", timeout=self.config['hyperview'].get('attach_timeout', 3))
+        timings['first_ping'] = time.time() - started if ping.get('success', False) else -1.0
+        timings['ping_rtt'] = time.time() - t
+        self.startup_timings = {k: round(v, 3) for k, v in timings.items()}
+        self._log("Startup timings: " + ", ".join(f"{k}={v:.2f}s" for k, v in self.startup_timings.items()))
+        record = {'time': datetime.now().isoformat(timespec='seconds'), 'attempts': info.get('attempts'),
+                  **self.startup_timings}
+        try:
+            with open(os.path.join(self.base_dir, 'workdir', 'startup.jsonl'), 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + '\n')
+        except OSError as e:
+            self._log(f"Failed to record startup timings:{e}")
+
+    def _new_run_dir(self, prefix: str = "") -> str:
+        """按时间戳创建运行目录；同一秒内的多个运行追加序号，避免并发任务互相覆盖"""
+        run_id = prefix + datetime.now().strftime("%Y%m%d_%H%M%S")
+        with self._run_dir_lock:
+            i = 0
+            while True:
+                run_dir = os.path.join(self.runs_dir, run_id if i == 0 else f"{run_id}_{i:02d}")
+                try:
+                    os.makedirs(run_dir)
+                    return run_dir
+                except FileExistsError:
+                    i += 1
+
+    def _capture_mode(self, capture: Optional[str]) -> str:
+        return capture or self.capture_cfg.get('mode', 'full')
+
+    def _capture_params(self, capture: Optional[str]) -> Dict[str, Any]:
+        """截图模式: full 全分辨率 / reduced 降低分辨率 / none 不截图 / on_fail 判定不合格后再截图"""
+        mode = self._capture_mode(capture)
+        if mode in ('none', 'on_fail'):
+            return {"capture": "none"}
+        prefix = 'reduced_' if mode == 'reduced' else ''
+        return {
+            "capture_width": int(self.capture_cfg.get(prefix + 'width', 960 if prefix else 1920)),
+            "capture_height": int(self.capture_cfg.get(prefix + 'height', 540 if prefix else 1080)),
+            "capture_format": self.capture_cfg.get('format', 'png')
+        }
+
+    def _analysis_params(self, model_path: str, result_path: str, run_dir: str, top_k: int = 1,
+                         group_by: str = "", capture: Optional[str] = None) -> Dict[str, Any]:
+        params = {
+            "model_path": model_path.replace('\\', '/'),
+            "result_path": result_path.replace('\\', '/') if result_path else "",
+            "output_dir": run_dir.replace('\\', '/')
+        }
+        params.update(self._capture_params(capture))
+        if group_by:
+            params["group_by"] = group_by
+        elif top_k > 1:
+            params["top_k"] = top_k
+        return params
+
+    @staticmethod
+    def _analysis_cmd(top_k: int, group_by: str = "") -> str:
+        # group_by 时按分组各返回一个峰值；top_k > 1 时一次返回前 K 个热点及其坐标和标签
+        if group_by:
+            return "export_group_peaks"
+        return "export_hotspots" if top_k > 1 else "export_contour_and_peak_vm"
+
+    def _deferred_capture(self, model_path: str, result_path: str, run_dir: str, peak: Dict,
+                          bridge: HVBridge) -> List[str]:
+        """on_fail 模式下判定不合格后再截图，模型仍常驻在 agent 中，无需重新加载；调用方需占有该 agent"""
+        params = self._analysis_params(model_path, result_path, run_dir, capture='full')
+        # sweep 结果在包络所在工况截图
+        for key in ('subcase', 'simulation'):
+            if key in peak:
+                params[key] = str(peak[key])
+        result = bridge.send_job(cmd="capture", params=params)
+        if not result.get('success', False):
+            self._log(f"Deferred capture failed:{result.get('error', 'Unknown')}")
+            return []
+        return result.get('images', [])
+
+    def _capture_if_failed(self, bridge: HVBridge, result: Dict, model_path: str, result_path: str, run_dir: str,
+                           capture: Optional[str]):
+        """on_fail 模式：在请求队列中仍占有 agent 时先判定，不合格立即截图，后处理阶段不再需要 agent"""
+        if self._capture_mode(capture) != 'on_fail' or not result.get('success', False) or result.get('images'):
+            return
+        try:
+            passed = self._worst(self.analyzer.analyze_many(self._peaks_of(result))).passed
+        except Exception as e:
+            self._log(f"Deferred capture skipped: {str(e)}")
+            return
+        if not passed:
+            result['images'] = self._deferred_capture(model_path, result_path, run_dir, result.get('peak', {}), bridge)
+
+    def _finish_analysis(self, result: Dict, model_path: str, result_path: str, run_dir: str,
+                         capture: Optional[str] = None, bridge: Optional[HVBridge] = None) -> Optional[Dict[str, Any]]:
+        """根据 agent 返回的峰值结果进行标准对比并生成报告；bridge 为仍由调用方占有的 agent，用于 on_fail 截图"""
+        if not result.get('success', False):
+            self._log(f"Tasks Failed:{result.get('error', 'Unknown')}")
             return None
-        self._set_state(State.RUNNING)
+        started = time.time()
+        analyses = self.analyzer.analyze_many(self._peaks_of(result))
+        analysis_result = self._worst(analyses)
+        if bridge is not None and self._capture_mode(capture) == 'on_fail' and not analysis_result.passed \
+                and not result.get('images'):
+            result['images'] = self._deferred_capture(model_path, result_path, run_dir, result.get('peak', {}), bridge)
+        report_path = self._write_report(run_dir, analyses, result, model_path, result_path)
+        timings = dict(result.get('timings', {}), post_seconds=round(time.time() - started, 3))
+        self._save_run(run_dir, model_path, result_path, result, analyses, analysis_result.passed, timings)
+        self._log(f"Analyzing Complete,Report:{report_path}")
+        output = {
+            'success': True,
+            'analysis': analysis_result,
+            'analyses': analyses,
+            'report_path': report_path,
+            'run_dir': run_dir
+        }
+        if 'steps' in result:
+            output['steps'] = result['steps']
+            output['envelope'] = result.get('envelope')
+        return output
+
+    @staticmethod
+    def _peaks_of(result: Dict) -> List[Dict]:
+        if 'groups' in result or 'hotspots' in result:
+            return result.get('groups') or result['hotspots']
+        return [result.get('peak', {})]
+
+    @staticmethod
+    def _worst(analyses: List[AnalysisResult]) -> AnalysisResult:
+        # 以最不利的一项作为本次结论：未通过优先，其次比值最大
+        return max(analyses, key=lambda r: (not r.passed, r.ratio or 0.0))
+
+    def _write_report(self, run_dir: str, analyses: List[AnalysisResult], result: Dict, model_path: str,
+                      result_path: str) -> str:
+        report_path = os.path.join(run_dir, 'report.html')
+        self.reporter.generate(
+            results=analyses,
+            images=result.get('images', []),
+            model_path=model_path,
+            result_path=result_path,
+            output_path=report_path,
+            steps=result.get('steps')
+        )
+        return report_path
+
+    def _save_run(self, run_dir: str, model_path: str, result_path: str, result: Dict,
+                  analyses: List[AnalysisResult], passed: bool, timings: Optional[Dict[str, Any]] = None):
+        """保存原始峰值 (标准变更后由 reevaluate 直接重新判定) 和分析历史"""
+        payload = {k: v for k, v in result.items() if k not in ('success', 'id', 'timings')}
+        tags = {(t, p['tags'][t]) for p in self._peaks_of(result) for t in MAP_TYPES
+                if p.get('tags', {}).get(t)}
+        fingerprints = {name: self.coalescer.fingerprint(path) for name, path in
+                        (('model', model_path), ('result', result_path)) if path}
         try:
-            run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
-            run_dir = os.path.join(self.runs_dir, run_id)
-            os.makedirs(run_dir, exist_ok=True)
-            self._log(f"Begin Analysing:{model_path}")
-            self._log(f"Output dir:{run_dir}")
-            result = self.bridge.send_job(cmd="export_contour_and_peak_vm", params={
-                "model_path": model_path.replace('\\', '/'),
-                "result_path": result_path.replace('\\', '/') if result_path else "",
-                "output_dir": run_dir.replace('\\', '/')
-            })
-            if not result.get('success', False):
-                self._log(f"Tasks Failed:{result.get('error', 'Unknown')}")
+            self.db.save_run(run_dir, model_path, result_path, payload, tags,
+                             {a.part_no for a in analyses if a.part_no}, passed,
+                             [asdict(a) for a in analyses], fingerprints, timings)
+        except Exception as e:
+            self._log(f"Save run error: {str(e)}")
+
+    def reevaluate(self, run_dirs: Optional[List[str]] = None, regenerate_reports: bool = True) -> Dict[str, Any]:
+        """标准 (零件/映射) 变更后，用保存的原始峰值重新判定受影响的运行并重写其报告，不需要 HyperView
+
+        run_dirs 为空时根据上次重新判定之后的变更日志找出受影响的运行。"""
+        seq = self.db.last_change_seq()
+        from_changes = run_dirs is None
+        if from_changes:
+            since = int(self.db.get_meta('reevaluated_seq', '0'))
+            part_nos, mapping_keys = self.db.changes_since(since)
+            run_dirs = self.db.affected_runs(part_nos, mapping_keys) if part_nos or mapping_keys else []
+            self._log(f"Standards changed since #{since}: {len(part_nos)} parts, {len(mapping_keys)} mappings")
+        started = time.time()
+        runs = [r for r in self.db.get_runs(run_dirs) if r['payload']]
+        # 所有运行的峰值合并为一次批量标准查询
+        peaks = [self._peaks_of(r['payload']) for r in runs]
+        flat = self.analyzer.analyze_many([p for run_peaks in peaks for p in run_peaks])
+        verdicts = []
+        changed = []
+        reports = []
+        offset = 0
+        for run, run_peaks in zip(runs, peaks):
+            analyses = flat[offset:offset + len(run_peaks)]
+            offset += len(run_peaks)
+            passed = self._worst(analyses).passed
+            verdicts.append((run['run_dir'], passed, [asdict(a) for a in analyses]))
+            if run['passed'] is None or bool(run['passed']) != passed:
+                changed.append(run['run_dir'])
+            if regenerate_reports and os.path.isdir(run['run_dir']):
+                reports.append(self._post_stage().submit(self._write_report, run['run_dir'], analyses, run['payload'],
+                                                         run['model_path'], run['result_path']))
+        self.db.update_run_verdicts(verdicts)
+        report_paths = []
+        for future in reports:
+            try:
+                report_paths.append(future.result())
+            except Exception as e:
+                self._log(f"Report regeneration error: {str(e)}")
+        if from_changes:
+            self.db.set_meta('reevaluated_seq', str(seq))
+        self._log(f"Re-evaluated {len(runs)} runs in {time.time() - started:.1f} s, "
+                  f"{len(changed)} verdicts changed, {len(report_paths)} reports regenerated")
+        return {'runs': len(runs), 'changed': changed, 'reports': report_paths, 'seq': seq}
+
+    def _fetch_result(self, bridge: HVBridge, model_path: str, result_path: str, run_dir: str, use_cache: bool,
+                      top_k: int, group_by: str, capture: Optional[str]) -> Dict:
+        """先查结果缓存，未命中时通过指定的桥接发送任务"""
+        cmd = self._analysis_cmd(top_k, group_by)
+        params = self._analysis_params(model_path, result_path, run_dir, top_k, group_by, capture)
+        key = self.coalescer.cache_key(cmd, params)
+        started = time.time()
+        result = self.cache.restore(key, run_dir) if use_cache and key else None
+        cache_hit = result is not None
+        if result is None:
+            result = bridge.send_job(cmd=cmd, params=params)
+            if key:
+                self.cache.store(key, result)
+        result['timings'] = {'hv_seconds': round(time.time() - started, 3), 'cache_hit': cache_hit}
+        return result
+
+    def _post_stage(self) -> ThreadPoolExecutor:
+        with self._post_lock:
+            if self._post_executor is None:
+                self._post_executor = ThreadPoolExecutor(max_workers=self.post_workers, thread_name_prefix="post")
+            return self._post_executor
+
+    def _submit_finish(self, result: Dict, model_path: str, result_path: str, run_dir: str,
+                       capture: Optional[str] = None,
+                       on_done: Optional[Callable[[Optional[Dict[str, Any]]], None]] = None,
+                       shared: bool = False) -> Future:
+        """把 agent 返回的结果交给后处理阶段，Future 结果与 run_analysis 的返回值相同；
+        shared=True 表示结果来自合并的请求，在新的运行目录中使用其副本"""
+        def finish() -> Optional[Dict[str, Any]]:
+            nonlocal result, run_dir
+            try:
+                if shared and result.get('success', False):
+                    run_dir = self._new_run_dir()
+                    result = self.coalescer.share(result, run_dir)
+                output = self._finish_analysis(result, model_path, result_path, run_dir, capture)
+            except Exception as e:
+                self._log(f"Analysis error: {str(e)}")
+                output = None
+            if on_done:
+                try:
+                    on_done(output)
+                except Exception as e:
+                    self._log(f"Analysis callback error: {str(e)}")
+            return output
+        return self._post_stage().submit(finish)
+
+    def run_analysis_async(self, model_path: str, result_path: str = "", use_cache: bool = True,
+                           top_k: int = 1, group_by: str = "", capture: Optional[str] = None,
+                           on_done: Optional[Callable[[Optional[Dict[str, Any]]], None]] = None,
+                           priority: int = PRIORITY_NORMAL) -> Future:
+        """HyperView 往返在请求队列中执行，完成后立即释放 agent，标准对比和报告在后台进行
+
+        返回的 Future 在排队期间可以 cancel()；请求被 shutdown 取消时结果为 None。
+        on_done 总会在后台线程中以分析结果 (失败或取消为 None) 调用一次，GUI 需自行切回主线程。"""
+        self._log(f"run_analysis called with model_path={model_path}")
+
+        def fetch() -> Tuple[str, Dict]:
+            run_dir = ""
+            try:
+                run_dir = self._new_run_dir()
+                self._log(f"Begin Analysing:{model_path}")
+                self._log(f"Output dir:{run_dir}")
+                result = self._fetch_result(self.bridge, model_path, result_path, run_dir, use_cache, top_k,
+                                            group_by, capture)
+                self._capture_if_failed(self.bridge, result, model_path, result_path, run_dir, capture)
+                return run_dir, result
+            except Exception as e:
+                return run_dir, {'success': False, 'error': str(e)}
+
+        cmd = self._analysis_cmd(top_k, group_by)
+        key = self.coalescer.key(cmd, self._analysis_params(model_path, result_path, "", top_k, group_by, capture)) \
+            if self.coalesce else None
+        request, leader = self.coalescer.join(key, lambda: self._enqueue(
+            fetch, priority=priority, label=f"analysis {os.path.basename(model_path)}",
+            default=("", {'success': False, 'error': 'HyperView not ready'})))
+        output: Future = Future()
+        output.add_done_callback(lambda f: f.cancelled() and self.coalescer.withdraw(key, request))
+
+        def cancelled():
+            self._resolve(output, None)
+            if on_done:
+                try:
+                    on_done(None)
+                except Exception as e:
+                    self._log(f"Analysis callback error: {str(e)}")
+
+        def fetched(f: Future):
+            if f.cancelled() or output.cancelled():
+                cancelled()
+                return
+            run_dir, result = f.result()
+            post = self._submit_finish(result, model_path, result_path, run_dir, capture, on_done, shared=not leader)
+            post.add_done_callback(lambda p: self._resolve(output, p.result()))
+        request.add_done_callback(fetched)
+        return output
+
+    def run_analysis(self, model_path: str, result_path: str = "", use_cache: bool = True,
+                     top_k: int = 1, group_by: str = "", capture: Optional[str] = None,
+                     priority: int = PRIORITY_NORMAL) -> Optional[Dict[str, Any]]:
+        return self._wait(self.run_analysis_async(model_path, result_path, use_cache, top_k, group_by, capture,
+                                                  priority=priority))
+
+    def run_analysis_batch(self, pairs: List[Tuple[str, str]], use_cache: bool = True,
+                           top_k: int = 1, group_by: str = "",
+                           capture: Optional[str] = None,
+                           priority: int = PRIORITY_BATCH) -> List[Optional[Dict[str, Any]]]:
+        """把多组 (model_path, result_path) 打包进一个批量信封，agent 在一次 listen 中依次处理"""
+        self._log(f"run_analysis_batch called with {len(pairs)} items")
+        request = self._enqueue(self._fetch_batch, pairs, use_cache, top_k, group_by, capture, priority=priority,
+                                label=f"batch of {len(pairs)}")
+        fetched = self._wait(request)
+        if fetched is None:
+            return [None] * len(pairs)
+        run_dirs, results = fetched
+        futures = [self._submit_finish(result, model_path, result_path, run_dir, capture)
+                   for (model_path, result_path), run_dir, result in zip(pairs, run_dirs, results)]
+        return [f.result() for f in futures]
+
+    def _fetch_batch(self, pairs: List[Tuple[str, str]], use_cache: bool, top_k: int, group_by: str,
+                     capture: Optional[str]) -> Optional[Tuple[List[str], List[Dict]]]:
+        try:
+            cmd = self._analysis_cmd(top_k, group_by)
+            run_dirs = []
+            keys = []
+            results: List[Optional[Dict]] = []
+            for model_path, result_path in pairs:
+                run_dir = self._new_run_dir()
+                run_dirs.append(run_dir)
+                params = self._analysis_params(model_path, result_path, run_dir, top_k, group_by, capture)
+                key = self.coalescer.cache_key(cmd, params)
+                keys.append(key)
+                results.append(self.cache.restore(key, run_dir) if use_cache and key else None)
+            misses = [i for i, r in enumerate(results) if r is None]
+            if misses:
+                jobs = [(cmd, self._analysis_params(pairs[i][0], pairs[i][1], run_dirs[i], top_k, group_by, capture))
+                        for i in misses]
+                for i, result in zip(misses, self.bridge.send_batch(jobs)):
+                    if keys[i]:
+                        self.cache.store(keys[i], result)
+                    results[i] = result
+            for (model_path, result_path), run_dir, result in zip(pairs, run_dirs, results):
+                self._capture_if_failed(self.bridge, result, model_path, result_path, run_dir, capture)
+            return run_dirs, results
+        except Exception as e:
+            self._log(f"Batch analysis error: {str(e)}")
+            return None
+
+    def iter_sweep(self, model_path: str, result_path: str = "", subcases: Optional[List[int]] = None,
+                   simulations: str = "all", use_cache: bool = True,
+                   capture: Optional[str] = None,
+                   priority: int = PRIORITY_NORMAL) -> Generator[Dict, None, Optional[Dict[str, Any]]]:
+        """遍历全部 subcase/simulation，每完成一个工况产出一条峰值记录；
+        生成器的返回值与 run_analysis 相同，以包络最大值对比标准并生成报告"""
+        self._log(f"iter_sweep called with model_path={model_path}")
+        # 整个遍历期间占住 agent，排在它前面的请求先执行完
+        with self._exclusive(priority, f"sweep {os.path.basename(model_path)}") as granted:
+            if not granted:
                 return None
-            peak_data = result.get('peak', {})
-            analysis_result = self.analyzer.analyze(peak_data)
-            report_path = os.path.join(run_dir, 'report.html')
-            self.reporter.generate(
-                results=[analysis_result],
-                images=result.get('images', []),
-                model_path=model_path,
-                result_path=result_path,
-                output_path=report_path
-            )
-            self._log(f"Analyzing Complete,Report:{report_path}")
-            return {
-                'success': True,
-                'analysis': analysis_result,
-                'report_path': report_path,
-                'run_dir': run_dir
-            }
+            return (yield from self._sweep(model_path, result_path, subcases, simulations, use_cache, capture))
+
+    def _sweep(self, model_path: str, result_path: str, subcases: Optional[List[int]], simulations: str,
+               use_cache: bool, capture: Optional[str]) -> Generator[Dict, None, Optional[Dict[str, Any]]]:
+        try:
+            run_dir = self._new_run_dir()
+            self._log(f"Begin Sweep:{model_path}")
+            params = self._analysis_params(model_path, result_path, run_dir, capture=capture)
+            params["simulations"] = simulations
+            if subcases:
+                params["subcases"] = ",".join(str(sc) for sc in subcases)
+            key = self.coalescer.cache_key("export_sweep", params)
+            result = self.cache.restore(key, run_dir) if use_cache and key else None
+            if result is not None:
+                for step in result.get('steps', []):
+                    yield step
+            else:
+                timeout = self.config['hyperview'].get('sweep_timeout', 3600)
+                result = yield from self.bridge.stream_job("export_sweep", params, timeout)
+                if key:
+                    self.cache.store(key, result)
+            return self._finish_analysis(result, model_path, result_path, run_dir, capture, self.bridge)
         except Exception as e:
-            self._log(f"Analysis error: {str(e)}")
+            self._log(f"Sweep error: {str(e)}")
             return None
+
+    def run_sweep(self, model_path: str, result_path: str = "", subcases: Optional[List[int]] = None,
+                  simulations: str = "all", use_cache: bool = True, capture: Optional[str] = None,
+                  on_step: Optional[Callable[[Dict], None]] = None,
+                  priority: int = PRIORITY_NORMAL) -> Optional[Dict[str, Any]]:
+        """iter_sweep 的阻塞版本，每个工况完成时调用 on_step"""
+        sweep = self.iter_sweep(model_path, result_path, subcases, simulations, use_cache, capture, priority)
+        while True:
+            try:
+                step = next(sweep)
+            except StopIteration as stop:
+                return stop.value
+            if on_step:
+                on_step(step)
+
+    def run_component_analysis(self, model_path: str, result_path: str = "", group_by: str = "component",
+                               use_cache: bool = True) -> Optional[Dict[str, Any]]:
+        """整机检查：一次 HyperView 遍历得到每个 component/property 的峰值并逐组对比标准"""
+        return self.run_analysis(model_path, result_path, use_cache=use_cache, group_by=group_by)
+
+    def start_pool(self, count: Optional[int] = None) -> int:
+        """启动 HyperView 实例池，返回就绪实例数量"""
+        if self._pool_executor is None:
+            # 线程数多于实例数：一个线程做后处理时，已归还的实例可以立即接下一个任务
+            self._pool_executor = ThreadPoolExecutor(max_workers=self.pool.max_workers + self.post_workers,
+                                                     thread_name_prefix="hv-pool")
+        ready = self.pool.start(count)
+        self._log(f"Worker pool ready: {ready}/{self.pool.max_workers}")
+        if self._reaper is None:
+            self._reaper_stop.clear()
+            self._reaper = threading.Thread(target=self._reap_pool, name="hv-pool-reaper", daemon=True)
+            self._reaper.start()
+        return ready
+
+    def _reap_pool(self):
+        interval = min(60.0, max(1.0, self.pool.idle_timeout / 4))
+        while not self._reaper_stop.wait(interval):
+            try:
+                closed = self.pool.reap_idle()
+                if closed:
+                    self._log(f"Closed {closed} idle HyperView workers")
+            except Exception as e:
+                self._log(f"Pool reaper error: {str(e)}")
+
+    def stop_pool(self):
+        if self._reaper is not None:
+            self._reaper_stop.set()
+            self._reaper.join()
+            self._reaper = None
+        if self._pool_executor is not None:
+            self._pool_executor.shutdown(wait=False, cancel_futures=True)
+            self._pool_executor = None
+        self.pool.stop()
+
+    def pool_status(self) -> List[Dict]:
+        return self.pool.status()
+
+    def _analyze_on_pool(self, model_path: str, result_path: str, use_cache: bool, top_k: int, group_by: str,
+                         capture: Optional[str], run_dir: Optional[str] = None) -> Tuple[Optional[Dict[str, Any]], str]:
+        """在池中的一个实例上完成分析，返回 (分析结果, 错误信息)"""
+        # 延迟截图需要在同一实例上完成，此时标准对比结束后再归还实例；否则拿到结果就归还
+        hold = self._capture_mode(capture) == 'on_fail'
+        key = None
+        if self.coalesce and not hold:
+            key = self.coalescer.key(self._analysis_cmd(top_k, group_by),
+                                    self._analysis_params(model_path, result_path, "", top_k, group_by, capture))
+        mine: Future = Future()
+        request, leader = self.coalescer.join(key, lambda: mine)
+        if not leader:
+            joined = self._join_coalesced(request, model_path, result_path, capture, run_dir)
+            if joined is not None:
+                return joined
+        try:
+            return self._fetch_on_pool(model_path, result_path, use_cache, top_k, group_by, capture, run_dir, hold, mine)
         finally:
-            # 确保状态总是恢复到AGENT_READY
-            self._set_state(State.AGENT_READY)
+            if not mine.done():
+                mine.set_result((run_dir or "", {'success': False, 'error': 'No result'}))
 
-    def display_contour(self, model_path: str, result_path: str = "") -> Optional[Dict[str, Any]]:
-        """仅显示云图，不进行峰值分析"""
-        self._log(f"display_contour called with model_path={model_path}")
-        if self.state != State.AGENT_READY:
-            self._log("HyperView NOT Ready, Start First")
+    def _join_coalesced(self, request: Future, model_path: str, result_path: str, capture: Optional[str],
+                        run_dir: Optional[str]) -> Optional[Tuple[Optional[Dict[str, Any]], str]]:
+        """等待合并的请求并整理结果；共享的请求被取消或异常时返回 None，由调用方自己重新执行"""
+        # 相同的请求正在其他实例或请求队列中执行，等它的结果
+        try:
+            _, result = request.result()
+        except CancelledError:
+            self._log("Coalesced request cancelled, run it on the pool")
             return None
-        self._set_state(State.RUNNING)
+        except Exception as e:
+            self._log(f"Coalesced request failed: {str(e)}, run it on the pool")
+            return None
+        run_dir = run_dir or self._new_run_dir()
+        try:
+            if result.get('success', False):
+                result = self.coalescer.share(result, run_dir)
+            output = self._finish_analysis(result, model_path, result_path, run_dir, capture)
+        except Exception as e:
+            self._log(f"Analysis error: {str(e)}")
+            return None, str(e)
+        if output is None:
+            return None, result.get('error', 'Unknown')
+        output['worker'] = ''
+        output['coalesced'] = True
+        return output, ""
+
+    def _fetch_on_pool(self, model_path: str, result_path: str, use_cache: bool, top_k: int, group_by: str,
+                       capture: Optional[str], run_dir: Optional[str], hold: bool,
+                       fetched: Future) -> Tuple[Optional[Dict[str, Any]], str]:
+        worker = self.pool.acquire()
+        if worker is None:
+            self._log("No HyperView worker available")
+            fetched.set_result((run_dir or "", {'success': False, 'error': 'No HyperView worker available'}))
+            return None, "No HyperView worker available"
+        result = None
+        released = False
+        try:
+            run_dir = run_dir or self._new_run_dir()
+            self._log(f"Begin Analysing on {worker.name}:{model_path}")
+            result = self._fetch_result(worker.bridge, model_path, result_path, run_dir, use_cache, top_k, group_by,
+                                        capture)
+            fetched.set_result((run_dir, result))
+            if not hold:
+                self.pool.release(worker, result)
+                released = True
+            output = self._finish_analysis(result, model_path, result_path, run_dir, capture,
+                                           worker.bridge if hold else None)
+            if output is None:
+                return None, result.get('error', 'Unknown')
+            output['worker'] = worker.name
+            return output, ""
+        except Exception as e:
+            self._log(f"Analysis error on {worker.name}: {str(e)}")
+            return None, str(e)
+        finally:
+            if not released:
+                self.pool.release(worker, result)
+
+    def _run_on_pool(self, model_path: str, result_path: str, use_cache: bool, top_k: int, group_by: str,
+                     capture: Optional[str]) -> Optional[Dict[str, Any]]:
+        return self._analyze_on_pool(model_path, result_path, use_cache, top_k, group_by, capture)[0]
+
+    def submit_analysis(self, model_path: str, result_path: str = "", use_cache: bool = True, top_k: int = 1,
+                        group_by: str = "", capture: Optional[str] = None, with_error: bool = False) -> Future:
+        """把分析任务交给实例池调度，返回结果与 run_analysis 相同的 Future；with_error=True 时结果为 (分析结果, 错误信息)"""
+        if self._pool_executor is None:
+            self.start_pool()
+        fn = self._analyze_on_pool if with_error else self._run_on_pool
+        return self._pool_executor.submit(fn, model_path, result_path, use_cache, top_k, group_by, capture)
+
+    @staticmethod
+    def load_manifest(manifest: Union[str, List]) -> List[Tuple[str, str]]:
+        """清单可以是 (model, result) 列表、含 model_path/result_path 的字典列表，或同结构的 CSV 文件"""
+        if isinstance(manifest, str):
+            with open(manifest, 'r', encoding='utf-8-sig', newline='') as f:
+                rows = [r for r in csv.reader(f) if r and any(c.strip() for c in r)]
+            if rows and rows[0][0].strip().lower() in ('model_path', 'model'):
+                rows = rows[1:]
+            return [(r[0].strip(), r[1].strip() if len(r) > 1 else "") for r in rows]
+        items = []
+        for item in manifest:
+            if isinstance(item, dict):
+                items.append((item.get('model_path', ''), item.get('result_path', '') or ""))
+            elif isinstance(item, str):
+                items.append((item, ""))
+            else:
+                items.append((item[0], item[1] if len(item) > 1 else ""))
+        return items
+
+    def _run_batch_item(self, index: int, total: int, model_path: str, result_path: str, retries: int,
+                        options: Dict[str, Any], notify: Callable[[Dict], None]) -> Dict[str, Any]:
+        run_dir = self._new_run_dir()
+        started = time.time()
+        output, error = None, ""
+        attempt = 0
+        for attempt in range(1, retries + 2):
+            notify({'index': index, 'total': total, 'model_path': model_path, 'status': 'running', 'attempt': attempt})
+            output, error = self._analyze_on_pool(model_path, result_path, run_dir=run_dir, **options)
+            # 只重试超时/连接断开这类瞬时错误，模型本身的错误重试也无济于事
+            if output is not None or error not in TRANSIENT_ERRORS or attempt > retries:
+                break
+            self._log(f"Retry {attempt}/{retries} for {model_path}: {error}")
+            notify({'index': index, 'total': total, 'model_path': model_path, 'status': 'retry',
+                    'attempt': attempt, 'error': error})
+            time.sleep(min(30.0, 2.0 ** attempt))
+        analysis = output['analysis'] if output else None
+        row = {
+            'index': index,
+            'model_path': model_path,
+            'result_path': result_path,
+            'status': 'done' if output else 'failed',
+            'passed': analysis.passed if analysis else None,
+            'peak_value': analysis.peak_value if analysis else None,
+            'part_no': analysis.part_no if analysis else None,
+            'ratio': analysis.ratio if analysis else None,
+            'attempts': attempt,
+            'worker': output.get('worker', '') if output else '',
+            'report_path': output['report_path'] if output else '',
+            'run_dir': run_dir,
+            'error': error,
+            'seconds': round(time.time() - started, 3)
+        }
+        notify(dict(row, total=total, result=output))
+        return row
+
+    def run_batch(self, manifest: Union[str, List], concurrency: Optional[int] = None, retries: int = 2,
+                  on_progress: Optional[Callable[[Dict], None]] = None, use_cache: bool = True, top_k: int = 1,
+                  group_by: str = "", capture: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """按清单批量分析：并发数不超过 concurrency，瞬时错误自动重试，结束后写出汇总 summary.json/csv
+
+        on_progress 在工作线程中被调用，参数字典的 status 为 running/retry/done/failed"""
+        try:
+            items = self.load_manifest(manifest)
+        except (OSError, IndexError, TypeError) as e:
+            self._log(f"Invalid manifest: {str(e)}")
+            return None
+        concurrency = max(1, min(concurrency or self.pool.max_workers, self.pool.max_workers))
+        if items and not self.pool.ready_workers():
+            self.start_pool(min(concurrency, len(items)))
+        batch_dir = self._new_run_dir("batch_")
+        self._log(f"Batch started: {len(items)} items, concurrency {concurrency}, dir {batch_dir}")
+        options = {'use_cache': use_cache, 'top_k': top_k, 'group_by': group_by, 'capture': capture}
+        lock = threading.Lock()
+        completed = [0]
+
+        def notify(event: Dict):
+            if event['status'] in ('done', 'failed'):
+                with lock:
+                    completed[0] += 1
+                    event['completed'] = completed[0]
+            if on_progress:
+                try:
+                    on_progress(event)
+                except Exception as e:
+                    self._log(f"Progress callback error: {str(e)}")
+
+        started = time.time()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="hv-batch") as executor:
+            futures = [executor.submit(self._run_batch_item, i, len(items), model_path, result_path, retries,
+                                       options, notify)
+                       for i, (model_path, result_path) in enumerate(items)]
+            rows = [f.result() for f in futures]
+
+        summary = {
+            'total': len(rows),
+            'done': sum(1 for r in rows if r['status'] == 'done'),
+            'failed': sum(1 for r in rows if r['status'] == 'failed'),
+            'passed': sum(1 for r in rows if r['passed']),
+            'not_passed': sum(1 for r in rows if r['passed'] is False),
+            'seconds': round(time.time() - started, 3),
+            'batch_dir': batch_dir,
+            'items': rows
+        }
+        with open(os.path.join(batch_dir, 'summary.json'), 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        with open(os.path.join(batch_dir, 'summary.csv'), 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()) if rows else ['index'])
+            writer.writeheader()
+            writer.writerows(rows)
+        self._log(f"Batch complete: {summary['done']}/{summary['total']} done, {summary['failed']} failed, "
+                  f"{summary['not_passed']} not passed, summary in {batch_dir}")
+        return summary
+
+    def start_hot_folder(self, dirs: Optional[List[str]] = None,
+                         on_event: Optional[Callable[[Dict], None]] = None) -> Optional[HotFolder]:
+        """监视求解器输出目录，新结果文件写完后自动提交到实例池分析"""
+        if self.hot_folder is not None:
+            return self.hot_folder
+        hot_folder = HotFolder(self, dirs)
+        if not hot_folder.dirs:
+            self._log("Hot folder: no directories configured")
+            return None
+        hot_folder.on_event = on_event
+        if self._pool_executor is None:
+            self.start_pool()
+        hot_folder.start()
+        self.hot_folder = hot_folder
+        self._log(f"Hot folder watching: {', '.join(hot_folder.dirs)}")
+        return hot_folder
+
+    def stop_hot_folder(self):
+        if self.hot_folder is not None:
+            self.hot_folder.stop()
+            self.hot_folder = None
+
+    def display_contour_async(self, model_path: str, result_path: str = "",
+                              priority: int = PRIORITY_INTERACTIVE) -> Future:
+        """显示云图属于交互操作，默认插到排队的分析任务之前"""
+        self._log(f"display_contour called with model_path={model_path}")
+        return self._settled(self._enqueue(self._display_contour, model_path, result_path, priority=priority,
+                                           label=f"display {os.path.basename(model_path)}"))
+
+    def display_contour(self, model_path: str, result_path: str = "",
+                        priority: int = PRIORITY_INTERACTIVE) -> Optional[Dict[str, Any]]:
+        """仅显示云图，不进行峰值分析"""
+        return self._wait(self.display_contour_async(model_path, result_path, priority))
+
+    def _display_contour(self, model_path: str, result_path: str) -> Optional[Dict[str, Any]]:
         try:
             self._log(f"Displaying contour for: {model_path}")
             result = self.bridge.send_job(cmd="display_contour", params={
@@ -617,13 +988,16 @@ after 4000 listen
         except Exception as e:
             self._log(f"Display contour error: {str(e)}")
             return None
-        finally:
-            self._set_state(State.AGENT_READY)
 
-    def load_model(self, model_path: str, result_path: str = "") -> bool:
-        if self.state != State.AGENT_READY:
-            self._log("HyperView is not ready")
-            return False
+    def load_model_async(self, model_path: str, result_path: str = "",
+                         priority: int = PRIORITY_INTERACTIVE) -> Future:
+        return self._settled(self._enqueue(self._load_model, model_path, result_path, priority=priority,
+                                           label=f"load {os.path.basename(model_path)}", default=False), False)
+
+    def load_model(self, model_path: str, result_path: str = "", priority: int = PRIORITY_INTERACTIVE) -> bool:
+        return self._wait(self.load_model_async(model_path, result_path, priority), False)
+
+    def _load_model(self, model_path: str, result_path: str) -> bool:
         self._log(f"Loading Model:{model_path}")
         result = self.bridge.send_job(cmd="load_model", params={
             "model_path": model_path.replace('\\', '/'),
@@ -638,5 +1012,18 @@ after 4000 listen
 
     def shutdown(self):
         self._log("closing now")
+        cancelled = self.requests.cancel_all()
+        if cancelled:
+            self._log(f"Cancelled {cancelled} queued requests")
+        self.requests.close()
         self.hv_process.terminate()
+        self.bridge.close()
+        self.stop_hot_folder()
+        self.stop_pool()
+        with self._post_lock:
+            if self._post_executor is not None:
+                # 等待已交给后处理阶段的报告写完
+                self._post_executor.shutdown(wait=True)
+                self._post_executor = None
+        self.db.close()
         self._set_state(State.EXITED)
@@ -1,13 +1,15 @@
 import os
 import base64
+from html import escape
 from datetime import datetime
-from typing import List
+from typing import List, Dict, Optional
 from .analysis import AnalysisResult
 
 
 class HTMLReporter:
-    def __init__(self):
-        pass
+    def __init__(self, embed_images: bool = True):
+        # 不嵌入时报告以相对路径引用云图，省去 base64 编码和报告体积
+        self.embed_images = embed_images
 
     def _image_to_base64(self, image_path: str):
         if not os.path.exists(image_path):
@@ -15,6 +17,11 @@ class HTMLReporter:
         with open(image_path, 'rb') as f:
             return base64.b64encode(f.read()).decode('utf-8')
 
+    @staticmethod
+    def _esc(value) -> str:
+        """组件名、零件号、路径等来自模型/结果文件，写入报告前转义"""
+        return escape(str(value))
+
     def _get_status_style(self, passed: bool) -> tuple:
         if passed:
             return ("PASS", "#28a745", "\u2713")
@@ -27,19 +34,25 @@ class HTMLReporter:
                  model_path: str,
                  result_path: str,
                  output_path: str,
-                 title: str = "Von Mises 应力分析报告HTML版"):
+                 title: str = "Von Mises 应力分析报告HTML版",
+                 steps: Optional[List[Dict]] = None):
         total = len(results)
         passed_count = sum(1 for r in results if r.passed)
         failed_count = total - passed_count
         status_color = "#28a745" if failed_count == 0 else "#dc3545"
         overall_status = "PASS" if failed_count == 0 else "FAIL"
+        esc = self._esc
         images_html = ""
         for i, img_path in enumerate(images):
             if os.path.exists(img_path):
-                b64 = self._image_to_base64(img_path)
+                if self.embed_images:
+                    mime = 'jpeg' if img_path.lower().endswith(('.jpg', '.jpeg')) else 'png'
+                    src = f"data:image/{mime};base64,{self._image_to_base64(img_path)}"
+                else:
+                    src = os.path.relpath(img_path, os.path.dirname(os.path.abspath(output_path))).replace('\\', '/')
                 images_html += f'''
 <div class="image-item">
-    <img src ="data:image/png;base64,{b64}" alt="云图 {i+1}">
+    <img src ="{esc(src)}" alt="云图 {i+1}">
     <p>云图{i+1}</p>
 </div>'''
 
@@ -50,21 +63,59 @@ class HTMLReporter:
 <tr>
     <td>{i+1}</td>
     <td>{r.peak_value:.4f}</td>
-    <td>{r.peak_entity_id}</td>
-    <td>{r.part_no or '-'}</td>
-    <td>{r.allowable:.2f if r.allowable else '-'}</td>
-    <td>{r.margin:.2f if r.margin else '-'}</td>
-    <td>{r.ratio:.2% if r.ratio else '-'}</td>
+    <td>{esc(r.peak_entity_id)}</td>
+    <td>{esc(r.tags.get('component') or r.tags.get('property') or '-')}</td>
+    <td>{esc(r.part_no or '-')}</td>
+    <td>{f'{r.allowable:.2f}' if r.allowable is not None else '-'}</td>
+    <td>{f'{r.margin:.2f}' if r.margin is not None else '-'}</td>
+    <td>{f'{r.ratio:.2%}' if r.ratio is not None else '-'}</td>
     <td style="color:{status_color_row};font-weight:bold;">{status_icon} {status_text}</td>
 </tr>
 '''
 
+        # 工况扫描：每个 subcase/simulation 一行，包络最大值所在行加粗
+        steps_html = ""
+        if steps:
+            envelope = max(steps, key=lambda s: s.get('value', 0))
+            for s in steps:
+                weight = "bold" if s is envelope else "normal"
+                steps_html += f'''
+<tr style="font-weight:{weight};">
+    <td>{esc(s.get('subcase', '-'))}</td>
+    <td>{esc(s.get('subcase_label') or '-')}</td>
+    <td>{esc(s.get('simulation', '-'))}</td>
+    <td>{esc(s.get('simulation_label') or '-')}</td>
+    <td>{s.get('value', 0):.4f}</td>
+    <td>{esc(s.get('entity_id', '-'))}</td>
+</tr>
+'''
+            steps_html = f'''
+    <div class="section">
+        <h2 class="section-title">工况扫描 (包络峰值 {envelope.get('value', 0):.4f} MPa)</h2>
+        <table class="results-table">
+            <thead>
+                <tr>
+                    <th>Subcase</th>
+                    <th>名称</th>
+                    <th>Simulation</th>
+                    <th>步</th>
+                    <th>峰值(MPa)</th>
+                    <th>实体ID</th>
+                </tr>
+            </thead>
+            <tbody>
+                {steps_html}
+            </tbody>
+        </table>
+    </div>
+'''
+
         html = f'''<!DOCTYPE html>
 <html lang="zh-CN">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width,initial_scale=1.0">
-    <title>{title}</title>
+    <title>{esc(title)}</title>
     <style>
         *{{ margin : 0;padding :0; box-sizing:border-box;}}
         body{{
@@ -164,7 +215,7 @@ class HTMLReporter:
 </head>
 <body>
     <div class="container">
-        <h1>{title}</h1>
+        <h1>{esc(title)}</h1>
         <p class="report-time"> 生成时间：{datetime.now():%Y-%m-%d %H-%M-%S}</p>
 
         <div class="summary">
@@ -180,8 +231,8 @@ class HTMLReporter:
     <div class="section">
         <h2 class="section-title">文件信息</h2>
         <table class="info-table">
-            <tr><td>模型文件</td><td>{model_path}</td></tr>
-            <tr><td>结果文件</td><td>{result_path or '-'}</td></tr>
+            <tr><td>模型文件</td><td>{esc(model_path)}</td></tr>
+            <tr><td>结果文件</td><td>{esc(result_path or '-')}</td></tr>
         </table>
     </div>
 
@@ -199,6 +250,7 @@ class HTMLReporter:
                     <th>#</th>
                     <th>峰值(MPa)</th>
                     <th>实体ID</th>
+                    <th>组件</th>
                     <th>零件号</th>
                     <th>许用值(MPa)</th>
                     <th>裕度(MPa)</th>
@@ -207,11 +259,11 @@ class HTMLReporter:
                 </tr>
             </thead>
             <tbody>
-                {results_html if results_html else '<tr><td colspan="8">无数据</td></tr>'}
+                {results_html if results_html else '<tr><td colspan="9">无数据</td></tr>'}
             </tbody>
         </table>
     </div>
-
+{steps_html}
     <div class="footer">
         HyperView Post-Processing Tool
     </div>
@@ -0,0 +1,108 @@
+import os
+import copy
+import json
+import shutil
+import hashlib
+import threading
+from concurrent.futures import Future
+from typing import Optional, Callable, Dict, Any, List, Tuple
+from .result_cache import ResultCache
+from .logging_util import log_info
+
+
+class RequestCoalescer:
+    """相同 (命令, 参数, 文件指纹) 的请求排队或执行中时合并为一个，其他等待者共享发起者的结果"""
+
+    def __init__(self, cache: Optional[ResultCache] = None, log: Callable[[str], None] = log_info):
+        self.cache = cache
+        self.log = log
+        # key -> [Future, 等待者数量]
+        self._inflight: Dict[str, List] = {}
+        self._lock = threading.Lock()
+
+    def fingerprint(self, path: str) -> Optional[str]:
+        """有结果缓存时用其内容指纹，否则为 大小:mtime；文件不存在时返回 None"""
+        if self.cache is not None:
+            try:
+                return self.cache.fingerprint(path)
+            except OSError:
+                return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return f"{st.st_size}:{st.st_mtime_ns}"
+
+    def key(self, cmd: str, params: Dict[str, Any]) -> Optional[str]:
+        """命令 + 规范化参数 + 输入文件指纹；文件不存在时返回 None"""
+        # output_dir 每次运行都不同，不参与键；路径统一为绝对路径，避免同一文件的不同写法
+        key_params = {k: v for k, v in params.items() if k != 'output_dir'}
+        files = [params.get('model_path'), params.get('result_path')]
+        for k in ('model_path', 'result_path'):
+            if key_params.get(k):
+                key_params[k] = os.path.normcase(os.path.abspath(key_params[k])).replace('\\', '/')
+        if self.cache is not None:
+            try:
+                return self.cache.make_key(cmd, key_params, files)
+            except OSError as e:
+                self.log(f"Request key error: {str(e)}")
+                return None
+        prints = []
+        for path in files:
+            if path:
+                fp = self.fingerprint(path)
+                if fp is None:
+                    return None
+                prints.append(fp)
+        payload = json.dumps({'cmd': cmd, 'params': key_params, 'files': prints}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def cache_key(self, cmd: str, params: Dict[str, Any]) -> Optional[str]:
+        """结果缓存的键；未启用缓存时返回 None"""
+        return self.key(cmd, params) if self.cache is not None else None
+
+    def join(self, key: Optional[str], start: Callable[[], Future]) -> Tuple[Future, bool]:
+        """相同 key 的请求尚未完成时加入它，否则调用 start 发起新请求；返回 (Future, 是否为发起者)"""
+        if key is None:
+            return start(), True
+        with self._lock:
+            entry = self._inflight.get(key)
+            if entry is not None:
+                entry[1] += 1
+                self.log(f"Coalesced with in-flight request ({entry[1]} waiters)")
+                return entry[0], False
+            future = start()
+            self._inflight[key] = [future, 1]
+        future.add_done_callback(lambda f: self._done(key, f))
+        return future, True
+
+    def _done(self, key: str, future: Future):
+        with self._lock:
+            entry = self._inflight.get(key)
+            if entry is not None and entry[0] is future:
+                del self._inflight[key]
+
+    def withdraw(self, key: Optional[str], future: Future):
+        """一个等待者取消；所有等待者都取消后才真正取消共享的请求"""
+        with self._lock:
+            entry = self._inflight.get(key) if key is not None else None
+            if entry is not None and entry[0] is future:
+                entry[1] -= 1
+                if entry[1] > 0:
+                    return
+        future.cancel()
+
+    def share(self, result: Dict, run_dir: str) -> Dict:
+        """合并请求的其他等待者使用结果副本，云图复制到各自的运行目录"""
+        shared = copy.deepcopy(result)
+        images = []
+        for img in result.get('images', []):
+            target = os.path.join(run_dir, os.path.basename(img))
+            try:
+                shutil.copy2(img, target)
+                images.append(target.replace('\\', '/'))
+            except OSError as e:
+                self.log(f"Copy shared image failed: {str(e)}")
+        if 'images' in result:
+            shared['images'] = images
+        return shared
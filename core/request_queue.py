@@ -0,0 +1,116 @@
+import heapq
+import itertools
+import threading
+from concurrent.futures import Future
+from typing import Optional, Callable, List, Tuple, Any
+from .logging_util import log_info, log_error
+
+# 数值越小越先执行：交互操作 (显示云图、加载模型) 插到排队的批量分析之前
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 10
+PRIORITY_BATCH = 20
+
+
+class RequestQueue:
+    """单个 agent 的请求队列：一个调度线程按优先级逐个执行，同优先级先到先执行
+
+    submit 返回的 Future 在开始执行前可以 cancel()；已开始的请求会执行完毕。"""
+
+    def __init__(self, name: str = "hv-requests"):
+        self.name = name
+        self._heap: List[Tuple[int, int, Future, Callable, tuple, dict]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._busy = False
+        self._closed = False
+        # 队列从空闲转为执行 / 执行完全部请求时回调，均在调度线程中调用
+        self.on_busy: Optional[Callable[[], None]] = None
+        self.on_idle: Optional[Callable[[], None]] = None
+
+    def submit(self, fn: Callable, *args, priority: int = PRIORITY_NORMAL, label: str = "", **kwargs) -> Future:
+        future: Future = Future()
+        future.label = label or getattr(fn, '__name__', 'request')
+        future.priority = priority
+        with self._cond:
+            if self._closed:
+                future.cancel()
+                return future
+            heapq.heappush(self._heap, (priority, next(self._seq), future, fn, args, kwargs))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        log_info(f"请求入队:{future.label} (priority={priority}, pending={self.pending()})")
+        return future
+
+    def pending(self) -> int:
+        """排队中 (未开始、未取消) 的请求数量"""
+        with self._cond:
+            return sum(1 for item in self._heap if not item[2].cancelled())
+
+    def busy(self) -> bool:
+        with self._cond:
+            return self._busy
+
+    def cancel_all(self) -> int:
+        """取消所有尚未开始的请求，返回取消数量"""
+        with self._cond:
+            items, self._heap = self._heap, []
+        return sum(1 for item in items if item[2].cancel())
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self.cancel_all()
+
+    def reopen(self):
+        """close 之后重新接受请求，调度线程在下一次 submit 时启动"""
+        with self._cond:
+            self._closed = False
+
+    def _notify(self, callback: Optional[Callable[[], None]]):
+        if callback:
+            try:
+                callback()
+            except Exception as e:
+                log_error(f"请求队列回调异常:{e}")
+
+    def _next(self) -> Optional[Tuple[Future, Callable, tuple, dict]]:
+        """取出下一个请求；队列清空时先回调 on_idle，关闭后返回 None"""
+        with self._cond:
+            while not self._heap:
+                if self._closed:
+                    self._thread = None
+                    self._busy = False
+                    return None
+                if self._busy:
+                    self._busy = False
+                    break
+                self._cond.wait()
+            else:
+                return heapq.heappop(self._heap)[2:]
+        self._notify(self.on_idle)
+        return self._next()
+
+    def _run(self):
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            future, fn, args, kwargs = item
+            if not future.set_running_or_notify_cancel():
+                log_info(f"请求已取消:{future.label}")
+                continue
+            with self._cond:
+                start, self._busy = not self._busy, True
+            if start:
+                self._notify(self.on_busy)
+            try:
+                result: Any = fn(*args, **kwargs)
+            except BaseException as e:
+                log_error(f"请求执行异常 {future.label}:{e}")
+                future.set_exception(e)
+            else:
+                future.set_result(result)
@@ -0,0 +1,192 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+from typing import Optional, Callable, Dict, List, Any
+from .logging_util import log_info, log_error
+
+
+class ResultCache:
+    """按内容寻址的结果缓存：命令+参数+输入文件指纹相同时直接复用已存的峰值结果和云图"""
+
+    def __init__(self, cache_dir: str, max_entries: int = 500, max_bytes: int = 2 * 1024 ** 3,
+                 chunk_size: int = 1024 * 1024, log: Callable[[str], None] = log_info):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        # restore/store 的提示信息，编排器传入自己的日志函数以显示在界面上
+        self.log = log
+        self._fingerprints: Dict[tuple, str] = {}
+        # key -> [最近访问时间, 字节数]；首次写入时扫描一次目录建立，之后随读写维护
+        self._index: Optional[Dict[str, list]] = None
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def fingerprint(self, path: str) -> Optional[str]:
+        """文件指纹：大小 + mtime + 首/中/尾三个分块的哈希，避免整读 GB 级结果文件"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        stat_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+        with self._lock:
+            cached = self._fingerprints.get(stat_key)
+        if cached:
+            return cached
+        h = hashlib.blake2b(digest_size=16)
+        h.update(f"{st.st_size}:{st.st_mtime_ns}".encode())
+        with open(path, 'rb') as f:
+            for offset in sorted({0, max(0, st.st_size // 2 - self.chunk_size // 2),
+                                  max(0, st.st_size - self.chunk_size)}):
+                f.seek(offset)
+                h.update(f.read(self.chunk_size))
+        digest = h.hexdigest()
+        with self._lock:
+            self._fingerprints[stat_key] = digest
+        return digest
+
+    def make_key(self, cmd: str, params: Dict[str, Any], files: List[str]) -> Optional[str]:
+        prints = []
+        for path in files:
+            if not path:
+                continue
+            fp = self.fingerprint(path)
+            if fp is None:
+                return None
+            prints.append(fp)
+        payload = json.dumps({'cmd': cmd, 'params': params, 'files': prints}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def get(self, key: str) -> Optional[Dict]:
+        entry_file = os.path.join(self._entry_dir(key), 'entry.json')
+        try:
+            with open(entry_file, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self._forget(key)
+            return None
+        result = entry['result']
+        images = [os.path.join(self._entry_dir(key), name) for name in entry.get('images', [])]
+        if not all(os.path.exists(p) for p in images):
+            self._forget(key)
+            return None
+        result['images'] = images
+        # 用 mtime 记录最近访问时间，供 LRU 淘汰 (重建索引时使用)
+        try:
+            os.utime(entry_file, None)
+        except OSError:
+            pass
+        with self._lock:
+            if self._index is not None and key in self._index:
+                self._index[key][0] = time.time()
+        log_info(f"缓存命中:{key[:12]}")
+        return result
+
+    def put(self, key: str, result: Dict):
+        entry_dir = self._entry_dir(key)
+        os.makedirs(entry_dir, exist_ok=True)
+        names = []
+        for i, img in enumerate(result.get('images', [])):
+            if not os.path.exists(img):
+                continue
+            name = f"{i}_{os.path.basename(img)}"
+            shutil.copy2(img, os.path.join(entry_dir, name))
+            names.append(name)
+        stored = {k: v for k, v in result.items() if k != 'images'}
+        entry_file = os.path.join(entry_dir, 'entry.json')
+        with open(entry_file + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'result': stored, 'images': names, 'created': time.time()}, f, ensure_ascii=False)
+        os.replace(entry_file + '.tmp', entry_file)
+        size = sum(e.stat().st_size for e in os.scandir(entry_dir) if e.is_file())
+        with self._lock:
+            index = self._load_index()
+            index[key] = [time.time(), size]
+            over = len(index) > self.max_entries or sum(v[1] for v in index.values()) > self.max_bytes
+        # 只有超出上限时才淘汰
+        if over:
+            self._evict()
+
+    def restore(self, key: str, run_dir: str) -> Optional[Dict]:
+        """缓存命中时把云图复制到本次运行目录，返回与 agent 相同结构的结果"""
+        result = self.get(key)
+        if result is None:
+            return None
+        images = []
+        for img in result.get('images', []):
+            target = os.path.join(run_dir, os.path.basename(img).split('_', 1)[-1])
+            try:
+                shutil.copy2(img, target)
+            except OSError as e:
+                # 条目可能在 get 之后被其他写入淘汰，按未命中处理
+                self.log(f"Cache entry unavailable, fall back to HyperView: {str(e)}")
+                return None
+            images.append(target.replace('\\', '/'))
+        result['images'] = images
+        self.log("Cache hit, skip HyperView")
+        return result
+
+    def store(self, key: str, result: Dict):
+        """只缓存成功的结果；写入失败不影响本次分析"""
+        if not result.get('success', False):
+            return
+        try:
+            self.put(key, result)
+        except OSError as e:
+            self.log(f"Cache store error: {str(e)}")
+
+    def _forget(self, key: str):
+        with self._lock:
+            if self._index is not None:
+                self._index.pop(key, None)
+
+    def _load_index(self) -> Dict[str, list]:
+        """调用方需持有 _lock"""
+        if self._index is None:
+            self._index = {os.path.basename(d): [atime, size] for atime, size, d in self._entries()}
+        return self._index
+
+    def _entries(self) -> List[tuple]:
+        entries = []
+        for prefix in os.listdir(self.cache_dir):
+            prefix_dir = os.path.join(self.cache_dir, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for key in os.listdir(prefix_dir):
+                entry_dir = os.path.join(prefix_dir, key)
+                try:
+                    atime = os.path.getmtime(os.path.join(entry_dir, 'entry.json'))
+                    size = sum(e.stat().st_size for e in os.scandir(entry_dir) if e.is_file())
+                except OSError:
+                    continue
+                entries.append((atime, size, entry_dir))
+        return entries
+
+    def _evict(self):
+        with self._lock:
+            index = self._load_index()
+            entries = sorted((atime, size, key) for key, (atime, size) in index.items())
+            total = sum(size for _, size, _ in entries)
+            victims = []
+            while entries and (len(entries) > self.max_entries or total > self.max_bytes):
+                _, size, key = entries.pop(0)
+                del index[key]
+                victims.append(key)
+                total -= size
+        for key in victims:
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            log_info(f"缓存淘汰:{key[:12]}")
+
+    def clear(self):
+        with self._lock:
+            self._index = None
+        try:
+            shutil.rmtree(self.cache_dir)
+        except OSError as e:
+            log_error(f"清空缓存失败:{e}")
+        os.makedirs(self.cache_dir, exist_ok=True)
@@ -0,0 +1,121 @@
+import re
+import fnmatch
+from typing import Optional, List, Dict, Any
+
+RULE_KINDS = ('prefix', 'glob', 'regex')
+
+# 使用数字反向引用的正则合并后分组编号会错位，这类规则逐条匹配
+_BACKREF = re.compile(r'\\[1-9]|\(\?P=')
+
+
+def rule_regex(kind: str, pattern: str) -> Optional[str]:
+    """glob/regex 规则对应的正则 (整串匹配)，prefix 返回 None；正则非法时抛出 re.error"""
+    if kind == 'prefix':
+        return None
+    regex = fnmatch.translate(pattern) if kind == 'glob' else pattern
+    re.compile(regex)
+    return regex
+
+
+def rule_rank(rule: Dict[str, Any]) -> tuple:
+    """规则优先级，越小越优先：priority 小者先；同 priority 时 prefix > glob > regex，前缀长者先；最后按 id"""
+    kind = RULE_KINDS.index(rule['kind'])
+    return rule['priority'], kind, -len(rule['pattern']) if kind == 0 else 0, rule['id']
+
+
+def literal_prefix(kind: str, pattern: str) -> str:
+    """规则命中的值必然以之开头的固定前缀；无法确定时返回空串"""
+    if kind == 'prefix':
+        return pattern
+    if kind == 'glob':
+        return re.split(r'[*?\[]', pattern, 1)[0]
+    if '|' in pattern:
+        return ''
+    prefix = []
+    for ch in pattern:
+        if ch in '.^$*+?{}[]\\|()':
+            # 后面跟量词时前一个字符可有可无
+            if ch in '*+?{' and prefix:
+                prefix.pop()
+            break
+        prefix.append(ch)
+    return ''.join(prefix)
+
+
+class TagRuleMatcher:
+    """一种 map_type 下的前缀/通配/正则映射规则
+
+    每条规则按其固定前缀 (前缀规则本身、通配符之前的部分、正则开头的普通字符) 放进哈希表，
+    一个值只需按 "不同前缀长度数" 查表得到少量候选规则再逐一匹配；没有固定前缀的规则按优先级合并成一个正则，
+    每条规则一个外层分组，fullmatch 的 lastindex 就是命中的规则。匹配结果按值缓存。"""
+
+    def __init__(self, rules: List[Dict[str, Any]], cache_size: int = 100000):
+        # 固定前缀 -> [(规则, 编译后的正则或 None)]，按优先级排序；前缀规则不需要再匹配正则
+        self._buckets: Dict[str, List[tuple]] = {}
+        self._patterns = []
+        for rule in sorted(rules, key=rule_rank):
+            try:
+                regex = rule_regex(rule['kind'], rule['pattern'])
+            except re.error:
+                continue
+            prefix = literal_prefix(rule['kind'], rule['pattern'])
+            if prefix:
+                self._buckets.setdefault(prefix, []).append((rule, re.compile(regex) if regex else None))
+            else:
+                self._patterns.append((re.compile(regex), regex, rule))
+        self._lengths = sorted({len(p) for p in self._buckets}, reverse=True)
+        self._size = sum(len(b) for b in self._buckets.values()) + len(self._patterns)
+        self._combined, self._groups = self._combine()
+        self._cache: Dict[str, Optional[Dict[str, Any]]] = {}
+        self.cache_size = cache_size
+
+    def _combine(self):
+        if not self._patterns or any(_BACKREF.search(regex) for _, regex, _ in self._patterns):
+            return None, {}
+        groups, parts, index = {}, [], 1
+        for compiled, regex, rule in self._patterns:
+            groups[index] = rule
+            parts.append(f"({regex})")
+            index += 1 + compiled.groups
+        try:
+            return re.compile('|'.join(parts)), groups
+        except re.error:
+            # 例如不同规则里有同名分组
+            return None, {}
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _match_pattern(self, value: str) -> Optional[Dict[str, Any]]:
+        if self._combined is not None:
+            m = self._combined.fullmatch(value)
+            return self._groups[m.lastindex] if m else None
+        for compiled, _, rule in self._patterns:
+            if compiled.fullmatch(value):
+                return rule
+        return None
+
+    def match(self, value: str) -> Optional[Dict[str, Any]]:
+        """返回优先级最高的命中规则，没有命中返回 None"""
+        try:
+            return self._cache[value]
+        except KeyError:
+            pass
+        best, best_rank = None, None
+        for n in self._lengths:
+            if n > len(value):
+                continue
+            for rule, compiled in self._buckets.get(value[:n], ()):
+                if compiled is None or compiled.fullmatch(value):
+                    rank = rule_rank(rule)
+                    if best is None or rank < best_rank:
+                        best, best_rank = rule, rank
+                    break
+        if self._patterns:
+            rule = self._match_pattern(value)
+            if rule is not None and (best is None or rule_rank(rule) < best_rank):
+                best = rule
+        if len(self._cache) >= self.cache_size:
+            self._cache.clear()
+        self._cache[value] = best
+        return best
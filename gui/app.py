@@ -23,6 +23,8 @@ class Application(tk.Tk):
         self._create_ui()
         self.protocol("WM_DELETE_WINDOW", self._on_close)
         self.current_report_path = None
+        # 上次会话的 HyperView 仍在运行时直接接管
+        threading.Thread(target=self.orchestrator.attach, daemon=True).start()
 
     def _create_ui(self):
         self._create_status_bar()
@@ -80,6 +82,21 @@ class Application(tk.Tk):
         )
         self.auto_minimize_cb.pack(side=tk.LEFT, padx=20)
 
+        # 结果缓存选项，取消勾选时强制重新调用 HyperView
+        self.use_cache_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(btn_frame, text="Use Cache", variable=self.use_cache_var).pack(side=tk.LEFT, padx=10)
+
+        # 热点数量，大于1时一次返回前K个热点并逐个对比标准
+        ttk.Label(btn_frame, text="Top K:").pack(side=tk.LEFT)
+        self.top_k_var = tk.IntVar(value=1)
+        ttk.Spinbox(btn_frame, from_=1, to=50, width=4, textvariable=self.top_k_var).pack(side=tk.LEFT, padx=5)
+
+        # 分组峰值，选择后一次遍历返回每个 component/property 的峰值
+        ttk.Label(btn_frame, text="Group By:").pack(side=tk.LEFT)
+        self.group_by_var = tk.StringVar(value="")
+        ttk.Combobox(btn_frame, textvariable=self.group_by_var, values=["", "component", "property"],
+                     width=10, state="readonly").pack(side=tk.LEFT, padx=5)
+
         result_frame = ttk.LabelFrame(tab, text="Analysing Result", padding=10)
         result_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
 
@@ -130,7 +147,8 @@ class Application(tk.Tk):
         if not model_path:
             messagebox.showwarning(title="WARNING!", message="You Need to Select model files")
             return
-        if self.orchestrator.state != State.AGENT_READY:
+        # 运行中也可以提交，请求会在队列中排队
+        if self.orchestrator.state not in (State.AGENT_READY, State.RUNNING):
             messagebox.showwarning(title="WARNING!", message="Unable to Start HyperView")
             return
 
@@ -179,16 +197,14 @@ class Application(tk.Tk):
         if not model_path:
             messagebox.showwarning(title="WARNING!", message="You Need to Select model files")
             return
-        if self.orchestrator.state != State.AGENT_READY:
+        if self.orchestrator.state not in (State.AGENT_READY, State.RUNNING):
             messagebox.showwarning(title="WARNING!", message="HyperView is not ready")
             return
 
         self.load_btn.config(state=tk.DISABLED)
         self._start_progress()
-        def load():
-            success = self.orchestrator.load_model(model_path, result_path)
-            self.after(0, lambda: self._on_model_loaded(success))
-        threading.Thread(target=load, daemon=True).start()
+        future = self.orchestrator.load_model_async(model_path, result_path)
+        future.add_done_callback(lambda f: self.after(0, lambda: self._on_model_loaded(f.result())))
 
     def _on_model_loaded(self, success: bool):
         self._stop_progress(success)
@@ -211,6 +227,12 @@ class Application(tk.Tk):
         else:
             analysis = result['analysis']
             status = "Analysis Passed" if analysis.passed else "failed"
+            hotspots_text = ""
+            if len(result.get('analyses', [])) > 1:
+                hotspots_text = "\nHotspots:\n" + "\n".join(
+                    f"    #{i + 1} {r.peak_value:.4f} ID:{r.peak_entity_id} Part:{r.part_no or '-'} "
+                    f"{'PASS' if r.passed else 'FAIL'}"
+                    for i, r in enumerate(result['analyses']))
             text = f"""\
 Analysing Result:{status}
 
@@ -220,12 +242,12 @@ Peak Information:
 
 Deviation from Standard:
     -PartID:{analysis.part_no or 'Not Found'}
-    -Allowable:{analysis.allowable:.2f if analysis.allowable else '-' } MPa
-    -Margin:{analysis.margin:.2f if analysis.margin else '-'} MPa
-    -Ratio:{analysis.ratio:.2% if analysis.ratio else '-'}
+    -Allowable:{f'{analysis.allowable:.2f}' if analysis.allowable is not None else '-'} MPa
+    -Margin:{f'{analysis.margin:.2f}' if analysis.margin is not None else '-'} MPa
+    -Ratio:{f'{analysis.ratio:.2%}' if analysis.ratio is not None else '-'}
 
 Conclusion:{analysis.message}
-
+{hotspots_text}
 Report Path:{result['report_path']}
 """
             self.result_text.insert(tk.END, text)
@@ -249,6 +271,8 @@ Report Path:{result['report_path']}
         ttk.Separator(toolbar, orient=tk.VERTICAL).pack(side=tk.LEFT, fill=tk.Y, padx=10)
         ttk.Button(toolbar, text="Import CSV", command=self._import_parts_csv).pack(side=tk.LEFT, padx=2)
         ttk.Button(toolbar, text="Export CSV", command=self._export_parts_csv).pack(side=tk.RIGHT, padx=2)
+        self.reevaluate_btn = ttk.Button(toolbar, text="Re-evaluate Runs", command=self._reevaluate_runs)
+        self.reevaluate_btn.pack(side=tk.RIGHT, padx=2)
 
         columns = ('part_no', 'allowable_vm', 'safety_factor', 'units', 'name', 'notes')
         self.parts_tree = ttk.Treeview(tab, columns=columns, show='headings')
@@ -322,14 +346,62 @@ Report Path:{result['report_path']}
             self._refresh_parts()
 
     def _import_parts_csv(self):
+        self._import_csv(self.db.import_parts_bulk, "parts", self._refresh_parts)
+
+    def _import_mappings_csv(self):
+        self._import_csv(self.db.import_mappings_bulk, "mappings", self._refresh_mappings)
+
+    def _import_csv(self, importer, kind: str, refresh):
         path = filedialog.askopenfilename(
             title="Select CSV Files",
             filetypes=[("CSV Files", "*.csv"), ("All Files", "*.*")]
         )
-        if path:
-            count = self.db.import_parts_csv(path)
-            messagebox.showinfo(title="Complete", message=f"Import Files {count} Successfully")
-            self._refresh_parts()
+        if not path:
+            return
+        update = messagebox.askyesnocancel(title="Import", message=f"Update existing {kind} with the values in the file?\n"
+                                                                   f"Yes: update, No: skip existing {kind}")
+        if update is None:
+            return
+        try:
+            report = importer(path, 'upsert' if update else 'insert')
+        except (OSError, ValueError) as e:
+            messagebox.showerror(title="Error", message=f"Import failed: {e}")
+            return
+        errors = report['errors']
+        for error in errors:
+            self._on_log(f"Import {kind} line {error['line']}: {error['error']}")
+        message = (f"Inserted: {report['inserted']}\nUpdated: {report['updated']}\n"
+                   f"Skipped: {report['skipped']}\nErrors: {len(errors)}")
+        if errors:
+            message += "\n\n" + "\n".join(f"line {e['line']}: {e['error']}" for e in errors[:10])
+        if report['aborted']:
+            messagebox.showerror(title="Error", message="Import rolled back\n\n" + message)
+        else:
+            messagebox.showinfo(title="Complete", message=message)
+        refresh()
+
+    def _reevaluate_runs(self):
+        """按修改后的标准重新判定已保存的分析结果，不需要 HyperView"""
+        self.reevaluate_btn.config(state=tk.DISABLED)
+
+        def run():
+            summary, error = None, ""
+            try:
+                summary = self.orchestrator.reevaluate()
+            except Exception as e:
+                error = f"Re-evaluation failed: {e}"
+            self.after(0, lambda: self._on_reevaluated(summary, error))
+        threading.Thread(target=run, daemon=True).start()
+
+    def _on_reevaluated(self, summary, error: str = ""):
+        self.reevaluate_btn.config(state=tk.NORMAL)
+        if summary is None:
+            self._on_log(error)
+            messagebox.showerror(title="Error", message="Re-evaluation failed. Check the log for details.")
+            return
+        messagebox.showinfo(title="Complete", message=f"Re-evaluated {summary['runs']} runs\n"
+                                                      f"Verdicts changed: {len(summary['changed'])}\n"
+                                                      f"Reports regenerated: {len(summary['reports'])}")
 
     def _export_parts_csv(self):
         path = filedialog.asksaveasfilename(
@@ -348,17 +420,22 @@ Report Path:{result['report_path']}
         toolbar.pack(fill=tk.X, padx=10, pady=5)
         ttk.Button(toolbar, text="Add", command=self._add_mapping).pack(side=tk.LEFT, padx=2)
         ttk.Button(toolbar, text="Delete", command=self._delete_mapping).pack(side=tk.LEFT, padx=2)
+        ttk.Button(toolbar, text="Import CSV", command=self._import_mappings_csv).pack(side=tk.LEFT, padx=2)
         ttk.Button(toolbar, text="Refresh", command=self._refresh_mappings).pack(side=tk.RIGHT, padx=2)
 
-        columns = ('map_type', 'map_value', 'part_no')
+        columns = ('map_type', 'match', 'map_value', 'part_no', 'priority')
         self.mapping_tree = ttk.Treeview(tab, columns=columns, show='headings')
         self.mapping_tree.heading('map_type', text='Map Type')
+        self.mapping_tree.heading('match', text='Match')
         self.mapping_tree.heading('map_value', text='Map Value')
         self.mapping_tree.heading('part_no', text='Part Number')
+        self.mapping_tree.heading('priority', text='Priority')
 
         self.mapping_tree.column('map_type', width=100)
+        self.mapping_tree.column('match', width=70)
         self.mapping_tree.column('map_value', width=200)
         self.mapping_tree.column('part_no', width=150)
+        self.mapping_tree.column('priority', width=60)
 
         scrollbar = ttk.Scrollbar(tab, orient=tk.VERTICAL, command=self.mapping_tree.yview)
         self.mapping_tree.configure(yscrollcommand=scrollbar.set)
@@ -374,7 +451,12 @@ Report Path:{result['report_path']}
         mappings = self.db.get_all_mappings()
         for m in mappings:
             self.mapping_tree.insert('', tk.END, values=(
-                m['map_type'], m['map_value'], m['part_no']
+                m['map_type'], 'exact', m['map_value'], m['part_no'], ''
+            ))
+        # 规则行的 iid 记录规则 id，删除时使用
+        for r in self.db.get_mapping_rules():
+            self.mapping_tree.insert('', tk.END, iid=f"rule:{r['id']}", values=(
+                r['map_type'], r['kind'], r['pattern'], r['part_no'], r['priority']
             ))
 
     def _add_mapping(self):
@@ -385,7 +467,15 @@ Report Path:{result['report_path']}
         dialog = MappingDialog(self, title="Add Map", parts=parts)
 
         if dialog.result:
-            self.db.add_mapping(**dialog.result)
+            match = dialog.result.pop('match')
+            priority = dialog.result.pop('priority')
+            if match == 'exact':
+                ok = self.db.add_mapping(**dialog.result)
+            else:
+                ok = self.db.add_mapping_rule(dialog.result['map_type'], match, dialog.result['map_value'],
+                                              dialog.result['part_no'], priority)
+            if not ok:
+                messagebox.showerror(title="Error", message="Map already exists or the pattern is invalid")
             self._refresh_mappings()
 
     def _delete_mapping(self):
@@ -395,8 +485,11 @@ Report Path:{result['report_path']}
             return
         if messagebox.askyesno(title="Confirm", message="Are you sure you want to delete the selected parts?This action can not be undone"):
             for sel in selection:
+                if sel.startswith('rule:'):
+                    self.db.delete_mapping_rule(int(sel.split(':', 1)[1]))
+                    continue
                 values = self.mapping_tree.item(sel)['values']
-                self.db.delete_mapping(values[0], values[1])
+                self.db.delete_mapping(values[0], str(values[2]))
             self._refresh_mappings()
 
     def _create_log_tab(self):
@@ -538,7 +631,7 @@ class MappingDialog(tk.Toplevel):
     def __init__(self, parent, title, parts):
         super().__init__(parent)
         self.title(title)
-        self.geometry("400x200")
+        self.geometry("400x280")
         self.resizable(width=False, height=False)
         self.transient(parent)
         self.grab_set()
@@ -556,17 +649,27 @@ class MappingDialog(tk.Toplevel):
         self.type_combo.grid(row=0, column=1, pady=5)
         self.type_combo.current(0)
 
-        ttk.Label(frame, text="Mapping Value:").grid(row=1, column=0, sticky=tk.W, pady=5)
+        ttk.Label(frame, text="Match:").grid(row=1, column=0, sticky=tk.W, pady=5)
+        self.match_combo = ttk.Combobox(frame, values=['exact', 'prefix', 'glob', 'regex'], width=27, state='readonly')
+        self.match_combo.grid(row=1, column=1, pady=5)
+        self.match_combo.current(0)
+
+        ttk.Label(frame, text="Mapping Value:").grid(row=2, column=0, sticky=tk.W, pady=5)
         self.value_entry = ttk.Entry(frame, width=30)
-        self.value_entry.grid(row=1, column=1, pady=5)
+        self.value_entry.grid(row=2, column=1, pady=5)
 
-        ttk.Label(frame, text="Part Number:").grid(row=2, column=0, sticky=tk.W, pady=5)
+        ttk.Label(frame, text="Part Number:").grid(row=3, column=0, sticky=tk.W, pady=5)
         part_nos = [p['part_no'] for p in self.parts]
         self.part_combo = ttk.Combobox(frame, values=part_nos, width=27)
-        self.part_combo.grid(row=2, column=1, pady=5)
+        self.part_combo.grid(row=3, column=1, pady=5)
+
+        ttk.Label(frame, text="Priority:").grid(row=4, column=0, sticky=tk.W, pady=5)
+        self.priority_spin = ttk.Spinbox(frame, from_=0, to=1000, width=28)
+        self.priority_spin.grid(row=4, column=1, pady=5)
+        self.priority_spin.set(100)
 
         btn_frame = ttk.Frame(frame)
-        btn_frame.grid(row=3, column=0, columnspan=2, pady=20)
+        btn_frame.grid(row=5, column=0, columnspan=2, pady=20)
         ttk.Button(btn_frame, text="Confirm", command=self._ok).pack(side=tk.LEFT, padx=10)
         ttk.Button(btn_frame, text="Cancel", command=self.destroy).pack(side=tk.LEFT, padx=10)
 
@@ -577,10 +680,17 @@ class MappingDialog(tk.Toplevel):
         if not map_value or not part_no:
             messagebox.showerror(title="Error", message="Enter Full Details")
             return
+        try:
+            priority = int(self.priority_spin.get())
+        except ValueError:
+            messagebox.showerror(title="Error", message="Priority must be an integer")
+            return
         self.result = {
             'map_type': map_type,
             'map_value': map_value,
-            'part_no': part_no
+            'part_no': part_no,
+            'match': self.match_combo.get(),
+            'priority': priority
         }
         self.destroy()
 
@@ -705,33 +815,33 @@ class AnalysisDialog(tk.Toplevel):
         self._set_status("Displaying stress contour...")
         self._start_progress()
 
-        def run():
-            result = self.orchestrator.display_contour(self.model_path, self.result_path)
-            self.after(0, lambda: self._on_analysis_complete(result, "contour"))
-
-        threading.Thread(target=run, daemon=True).start()
+        future = self.orchestrator.display_contour_async(self.model_path, self.result_path)
+        future.add_done_callback(lambda f: self.after(0, lambda: self._on_analysis_complete(f.result(), "contour")))
 
     def _analyze_stress_peak(self):
         """分析应力峰值"""
         self._set_status("Analyzing stress peak...")
         self._start_progress()
+        use_cache = self.parent.use_cache_var.get()
+        top_k = self.parent.top_k_var.get()
+        group_by = self.parent.group_by_var.get()
 
-        def run():
-            result = self.orchestrator.run_analysis(self.model_path, self.result_path)
-            self.after(0, lambda: self._on_analysis_complete(result, "stress_peak"))
-
-        threading.Thread(target=run, daemon=True).start()
+        # 请求在队列中执行，HyperView 往返结束后 agent 即被释放，报告在后台生成，完成后切回主线程
+        self.orchestrator.run_analysis_async(
+            self.model_path, self.result_path, use_cache=use_cache, top_k=top_k, group_by=group_by,
+            on_done=lambda result: self.after(0, lambda: self._on_analysis_complete(result, "stress_peak")))
 
     def _compare_material(self):
         """与材料标准对比"""
         self._set_status("Comparing with material standards...")
         self._start_progress()
+        use_cache = self.parent.use_cache_var.get()
+        top_k = self.parent.top_k_var.get()
+        group_by = self.parent.group_by_var.get()
 
-        def run():
-            result = self.orchestrator.run_analysis(self.model_path, self.result_path)
-            self.after(0, lambda: self._on_analysis_complete(result, "compare"))
-
-        threading.Thread(target=run, daemon=True).start()
+        self.orchestrator.run_analysis_async(
+            self.model_path, self.result_path, use_cache=use_cache, top_k=top_k, group_by=group_by,
+            on_done=lambda result: self.after(0, lambda: self._on_analysis_complete(result, "compare")))
 
     def _on_analysis_complete(self, result, analysis_type):
         """分析完成回调"""
@@ -770,9 +880,9 @@ Location: {analysis.peak_coords}
 Status: {status}
 Peak Value: {analysis.peak_value:.4f} MPa
 Part No: {analysis.part_no or 'Not Found'}
-Allowable: {analysis.allowable:.2f if analysis.allowable else 'N/A'} MPa
-Margin: {analysis.margin:.2f if analysis.margin else 'N/A'} MPa
-Ratio: {analysis.ratio:.2% if analysis.ratio else 'N/A'}
+Allowable: {f'{analysis.allowable:.2f}' if analysis.allowable is not None else 'N/A'} MPa
+Margin: {f'{analysis.margin:.2f}' if analysis.margin is not None else 'N/A'} MPa
+Ratio: {f'{analysis.ratio:.2%}' if analysis.ratio is not None else 'N/A'}
 
 Report: {result['report_path']}"""
             messagebox.showinfo(title="Material Comparison", message=msg)